@@ -0,0 +1,97 @@
+"""Incident keys
+
+Revision ID: 3f8a6d15c2e7
+Revises: e4b07d2c9a15
+Create Date: 2026-10-19 14:22:09.184530
+
+"""
+
+from typing import Sequence, Union
+
+import alembic.op as op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3f8a6d15c2e7"
+down_revision: Union[str, Sequence[str], None] = "e4b07d2c9a15"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CHANNEL = "hospitopt_changes"
+TABLES = ("patients", "hospitals", "ambulances")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in TABLES:
+        op.add_column(table, sa.Column("incident", sa.String(), nullable=True))
+        op.create_index(op.f(f"ix_{table}_incident"), table, ["incident"], unique=False)
+    # Notify the incident of every changed row, so each shard only wakes up for its own incident. Postgres folds
+    # identical notifications of a transaction, so bulk writes still raise one per table and incident.
+    op.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION hospitopt_notify_change() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                PERFORM pg_notify('{CHANNEL}', json_build_object('table', TG_TABLE_NAME)::text);
+                RETURN NULL;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM pg_notify(
+                    '{CHANNEL}', json_build_object('table', TG_TABLE_NAME, 'incident', OLD.incident)::text
+                );
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                PERFORM pg_notify(
+                    '{CHANNEL}', json_build_object('table', TG_TABLE_NAME, 'incident', NEW.incident)::text
+                );
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    for table in TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_notify_change ON {table};")
+        op.execute(
+            f"""
+            CREATE TRIGGER {table}_notify_change
+            AFTER INSERT OR UPDATE OR DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION hospitopt_notify_change();
+            """
+        )
+        # TRUNCATE triggers are statement-level only; without an incident the change concerns every shard.
+        op.execute(
+            f"""
+            CREATE TRIGGER {table}_notify_truncate
+            AFTER TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION hospitopt_notify_change();
+            """
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION hospitopt_notify_change() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('{CHANNEL}', TG_TABLE_NAME);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    for table in TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_notify_truncate ON {table};")
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_notify_change ON {table};")
+        op.execute(
+            f"""
+            CREATE TRIGGER {table}_notify_change
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION hospitopt_notify_change();
+            """
+        )
+        op.drop_index(op.f(f"ix_{table}_incident"), table_name=table)
+        op.drop_column(table, "incident")
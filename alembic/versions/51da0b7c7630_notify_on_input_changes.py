@@ -0,0 +1,51 @@
+"""Notify on input changes
+
+Revision ID: 51da0b7c7630
+Revises: 5b456aca87c6
+Create Date: 2026-10-19 09:12:31.402118
+
+"""
+
+from typing import Sequence, Union
+
+import alembic.op as op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "51da0b7c7630"
+down_revision: Union[str, Sequence[str], None] = "5b456aca87c6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CHANNEL = "hospitopt_changes"
+TABLES = ("patients", "hospitals", "ambulances")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION hospitopt_notify_change() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('{CHANNEL}', TG_TABLE_NAME);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    for table in TABLES:
+        # Statement-level, so bulk writes raise a single notification per table; TRUNCATE clears the inputs too.
+        op.execute(
+            f"""
+            CREATE TRIGGER {table}_notify_change
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION hospitopt_notify_change();
+            """
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_notify_change ON {table};")
+    op.execute("DROP FUNCTION IF EXISTS hospitopt_notify_change();")
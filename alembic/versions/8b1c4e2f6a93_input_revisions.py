@@ -0,0 +1,60 @@
+"""Input revisions
+
+Revision ID: 8b1c4e2f6a93
+Revises: 3f8a6d15c2e7
+Create Date: 2026-10-19 16:05:41.502117
+
+"""
+
+from typing import Sequence, Union
+
+import alembic.op as op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8b1c4e2f6a93"
+down_revision: Union[str, Sequence[str], None] = "3f8a6d15c2e7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ("patients", "hospitals", "ambulances")
+CURRENT_TRANSACTION_ID = "pg_current_xact_id()::text::bigint"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Every row carries the 64-bit id of the transaction that last wrote it. Inserts take it from the column default
+    # and updates from a row trigger, so no shared row is written and concurrent writers never wait on each other.
+    op.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION hospitopt_touch_revision() RETURNS trigger AS $$
+        BEGIN
+            NEW.revision := {CURRENT_TRANSACTION_ID};
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    for table in TABLES:
+        op.add_column(
+            table,
+            sa.Column("revision", sa.BigInteger(), server_default=sa.text(CURRENT_TRANSACTION_ID), nullable=False),
+        )
+        op.create_index(op.f(f"ix_{table}_incident_revision"), table, ["incident", "revision"], unique=False)
+        op.execute(
+            f"""
+            CREATE TRIGGER {table}_touch_revision
+            BEFORE UPDATE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION hospitopt_touch_revision();
+            """
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_touch_revision ON {table};")
+        op.drop_index(op.f(f"ix_{table}_incident_revision"), table_name=table)
+        op.drop_column(table, "revision")
+    op.execute("DROP FUNCTION IF EXISTS hospitopt_touch_revision();")
@@ -0,0 +1,48 @@
+"""Optimization jobs
+
+Revision ID: e4b07d2c9a15
+Revises: 51da0b7c7630
+Create Date: 2026-10-19 13:05:52.730914
+
+"""
+
+from typing import Sequence, Union
+
+import alembic.op as op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e4b07d2c9a15"
+down_revision: Union[str, Sequence[str], None] = "51da0b7c7630"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "optimization_jobs",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("scope", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("requested_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("claimed_by", sa.String(), nullable=True),
+        sa.Column("lease_expires_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("error", sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_optimization_jobs_pending_scope",
+        "optimization_jobs",
+        ["scope"],
+        unique=True,
+        postgresql_where=sa.text("status = 'pending'"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_optimization_jobs_pending_scope", table_name="optimization_jobs")
+    op.drop_table("optimization_jobs")
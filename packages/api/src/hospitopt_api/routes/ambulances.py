@@ -17,16 +17,21 @@ async def get_ambulances(
     session: AsyncSession = Depends(get_session),
     limit: int = Query(1000, ge=1, le=5000),
     offset: int = Query(0, ge=0),
+    incident: str | None = Query(None, description="Only return entries of this incident or region key."),
 ) -> AmbulancesPage:
     """Get paginated list of ambulances."""
-    total = await session.scalar(select(func.count()).select_from(AmbulanceDB))
-    result = await session.execute(select(AmbulanceDB).offset(offset).limit(limit))
+    query = select(AmbulanceDB)
+    if incident is not None:
+        query = query.where(AmbulanceDB.incident == incident)
+    total = await session.scalar(select(func.count()).select_from(query.subquery()))
+    result = await session.execute(query.offset(offset).limit(limit))
     ambulances = [
         Ambulance(
             id=row.id,
             lat=row.lat,
             lon=row.lon,
             assigned_patient_id=row.assigned_patient_id,
+            incident=row.incident,
         )
         for row in result.scalars().all()
     ]
@@ -17,10 +17,14 @@ async def get_hospitals(
     session: AsyncSession = Depends(get_session),
     limit: int = Query(1000, ge=1, le=5000),
     offset: int = Query(0, ge=0),
+    incident: str | None = Query(None, description="Only return entries of this incident or region key."),
 ) -> HospitalsPage:
     """Get paginated list of hospitals."""
-    total = await session.scalar(select(func.count()).select_from(HospitalDB))
-    result = await session.execute(select(HospitalDB).offset(offset).limit(limit))
+    query = select(HospitalDB)
+    if incident is not None:
+        query = query.where(HospitalDB.incident == incident)
+    total = await session.scalar(select(func.count()).select_from(query.subquery()))
+    result = await session.execute(query.offset(offset).limit(limit))
     hospitals = [
         Hospital(
             id=row.id,
@@ -29,6 +33,7 @@ async def get_hospitals(
             used_beds=row.used_beds,
             lat=row.lat,
             lon=row.lon,
+            incident=row.incident,
         )
         for row in result.scalars().all()
     ]
@@ -17,10 +17,14 @@ async def get_patients(
     session: AsyncSession = Depends(get_session),
     limit: int = Query(1000, ge=1, le=5000),
     offset: int = Query(0, ge=0),
+    incident: str | None = Query(None, description="Only return entries of this incident or region key."),
 ) -> PatientsPage:
     """Get paginated list of patients."""
-    total = await session.scalar(select(func.count()).select_from(PatientDB))
-    result = await session.execute(select(PatientDB).offset(offset).limit(limit))
+    query = select(PatientDB)
+    if incident is not None:
+        query = query.where(PatientDB.incident == incident)
+    total = await session.scalar(select(func.count()).select_from(query.subquery()))
+    result = await session.execute(query.offset(offset).limit(limit))
     patients = [
         Patient(
             id=row.id,
@@ -28,6 +32,7 @@ async def get_patients(
             lon=row.lon,
             time_to_hospital_minutes=row.time_to_hospital_minutes,
             registered_at=row.registered_at,
+            incident=row.incident,
         )
         for row in result.scalars().all()
     ]
@@ -3,10 +3,15 @@
 from datetime import UTC, datetime
 from uuid import UUID, uuid4
 
-from sqlalchemy import Boolean, DateTime, Float, Integer, String, Uuid
+from sqlalchemy import BigInteger, Boolean, DateTime, Float, Index, Integer, String, Uuid, text
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 
+# Id of the current transaction as a 64-bit integer which, unlike ``xmin``, never wraps around. Input rows keep the
+# one that last wrote them as their ``revision``, indexed with the incident for the worker's change detection.
+CURRENT_TRANSACTION_ID = text("pg_current_xact_id()::text::bigint")
+
+
 class Base(DeclarativeBase):
     """Base declarative class for ORM models."""
 
@@ -15,6 +20,7 @@ class HospitalDB(Base):
     """Hospital ORM model."""
 
     __tablename__ = "hospitals"
+    __table_args__ = (Index("ix_hospitals_incident_revision", "incident", "revision"),)
 
     id: Mapped[UUID] = mapped_column(Uuid(), primary_key=True, default=uuid4)
     name: Mapped[str | None] = mapped_column(String, nullable=True)
@@ -22,12 +28,17 @@ class HospitalDB(Base):
     used_beds: Mapped[int] = mapped_column(Integer, nullable=False)
     lat: Mapped[float] = mapped_column(Float, nullable=False)
     lon: Mapped[float] = mapped_column(Float, nullable=False)
+    incident: Mapped[str | None] = mapped_column(String, nullable=True, index=True)
+    revision: Mapped[int] = mapped_column(
+        BigInteger, nullable=False, server_default=CURRENT_TRANSACTION_ID, onupdate=CURRENT_TRANSACTION_ID
+    )
 
 
 class PatientDB(Base):
     """Patient ORM model."""
 
     __tablename__ = "patients"
+    __table_args__ = (Index("ix_patients_incident_revision", "incident", "revision"),)
 
     id: Mapped[UUID] = mapped_column(Uuid(), primary_key=True, default=uuid4)
     lat: Mapped[float] = mapped_column(Float, nullable=False)
@@ -38,17 +49,26 @@ class PatientDB(Base):
         nullable=False,
         default=lambda: datetime.now(UTC),
     )
+    incident: Mapped[str | None] = mapped_column(String, nullable=True, index=True)
+    revision: Mapped[int] = mapped_column(
+        BigInteger, nullable=False, server_default=CURRENT_TRANSACTION_ID, onupdate=CURRENT_TRANSACTION_ID
+    )
 
 
 class AmbulanceDB(Base):
     """Ambulance ORM model."""
 
     __tablename__ = "ambulances"
+    __table_args__ = (Index("ix_ambulances_incident_revision", "incident", "revision"),)
 
     id: Mapped[UUID] = mapped_column(Uuid(), primary_key=True, default=uuid4)
     lat: Mapped[float] = mapped_column(Float, nullable=False)
     lon: Mapped[float] = mapped_column(Float, nullable=False)
     assigned_patient_id: Mapped[UUID | None] = mapped_column(Uuid(), nullable=True)
+    incident: Mapped[str | None] = mapped_column(String, nullable=True, index=True)
+    revision: Mapped[int] = mapped_column(
+        BigInteger, nullable=False, server_default=CURRENT_TRANSACTION_ID, onupdate=CURRENT_TRANSACTION_ID
+    )
 
 
 class PatientAssignmentDB(Base):
@@ -70,3 +90,31 @@ class PatientAssignmentDB(Base):
         nullable=False,
         default=lambda: datetime.now(UTC),
     )
+
+
+class OptimizationJobDB(Base):
+    """Optimization job claimed by one worker replica at a time with ``FOR UPDATE SKIP LOCKED``."""
+
+    __tablename__ = "optimization_jobs"
+    __table_args__ = (
+        # At most one pending job per scope, so bursts of enqueues coalesce into one job.
+        Index(
+            "ix_optimization_jobs_pending_scope",
+            "scope",
+            unique=True,
+            postgresql_where=text("status = 'pending'"),
+        ),
+    )
+
+    id: Mapped[UUID] = mapped_column(Uuid(), primary_key=True, default=uuid4)
+    scope: Mapped[str] = mapped_column(String, nullable=False, default="global")
+    status: Mapped[str] = mapped_column(String, nullable=False, default="pending")  # pending, running or failed
+    requested_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(UTC),
+    )
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    claimed_by: Mapped[str | None] = mapped_column(String, nullable=True)
+    lease_expires_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    error: Mapped[str | None] = mapped_column(String, nullable=True)
@@ -19,6 +19,7 @@ class Hospital(BaseModel):
     used_beds: NonNegativeInt = 0
     lat: Latitude
     lon: Longitude
+    incident: str | None = None  # incident or region key the worker shards optimization by
 
 
 class Patient(BaseModel):
@@ -29,6 +30,7 @@ class Patient(BaseModel):
     lon: Longitude
     time_to_hospital_minutes: PositiveInt
     registered_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+    incident: str | None = None
 
 
 class Ambulance(BaseModel):
@@ -38,6 +40,7 @@ class Ambulance(BaseModel):
     lat: Latitude
     lon: Longitude
     assigned_patient_id: UUID | None = None
+    incident: str | None = None
 
 
 class RouteMatrixEntry(BaseModel):
@@ -58,6 +61,7 @@ class MinutesTables(BaseModel):
 
     ambulance_to_patient: dict[tuple["AmbulanceIndex", "PatientIndex"], PositiveInt]
     patient_to_hospital: dict[tuple["PatientIndex", "HospitalIndex"], PositiveInt]
+    estimated: bool = False  # some durations are local estimates rather than live routes
 
 
 class PatientAssignment(BaseModel):
@@ -82,3 +86,4 @@ class OptimizationResult(BaseModel):
     max_lives_saved: NonNegativeInt = 0
     capacity_shortfall: NonNegativeInt = 0
     ambulance_shortfall: NonNegativeInt = 0
+    estimated: bool = False  # computed from estimated travel times, to be refreshed once live routes arrive
@@ -0,0 +1,110 @@
+"""Pair-level travel-time cache keyed by departure-time bucket."""
+
+import time
+from datetime import datetime
+from typing import Any
+
+from hospitopt_core.domain.models import RouteMatrixEntry
+
+Coordinate = tuple[float, float]
+_CacheKey = tuple[Coordinate, Coordinate, int]
+
+
+class MatrixCache:
+    """Routed minutes per (origin, destination) pair and departure-time bucket.
+
+    Traffic-aware durations depend on the departure time, so entries are kept per fixed-width bucket of absolute
+    time. Entries expire after ``max_age_seconds`` and the oldest entries are evicted beyond ``max_entries``.
+    """
+
+    def __init__(self, bucket_minutes: int = 15, max_age_seconds: float = 3600, max_entries: int = 200_000) -> None:
+        """Create an empty cache.
+
+        Args:
+            bucket_minutes: Width of the departure-time buckets in minutes. Defaults to 15.
+            max_age_seconds: Entries older than this are ignored. Defaults to 1 hour.
+            max_entries: Maximum number of cached pairs. Defaults to 200,000.
+        """
+        self.bucket_minutes = bucket_minutes
+        self.max_age_seconds = max_age_seconds
+        self.max_entries = max_entries
+        self._entries: dict[_CacheKey, tuple[int, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def bucket_for(self, departure: datetime) -> int:
+        """Return the departure-time bucket of a timestamp."""
+        return int(departure.timestamp() // (self.bucket_minutes * 60))
+
+    def next_bucket_start(self, moment: datetime) -> datetime:
+        """Return the start of the bucket following the one containing ``moment``."""
+        seconds = self.bucket_minutes * 60
+        return datetime.fromtimestamp((self.bucket_for(moment) + 1) * seconds, tz=moment.tzinfo)
+
+    def get(self, origin: Coordinate, destination: Coordinate, departure: datetime) -> int | None:
+        """Return cached minutes for a pair departing at ``departure``, or None when missing or expired."""
+        cached = self._entries.get((origin, destination, self.bucket_for(departure)))
+        if cached is None or time.monotonic() - cached[1] > self.max_age_seconds:
+            return None
+        return cached[0]
+
+    def put(self, origin: Coordinate, destination: Coordinate, departure: datetime, minutes: int) -> None:
+        """Store routed minutes for a pair departing at ``departure``."""
+        key = (origin, destination, self.bucket_for(departure))
+        self._entries.pop(key, None)
+        self._entries[key] = (minutes, time.monotonic())
+        while len(self._entries) > self.max_entries:
+            del self._entries[next(iter(self._entries))]
+
+    def dump_state(self) -> dict[str, Any]:
+        """Return the cached entries as JSON-serializable state, with wall-clock storage times."""
+        offset = time.time() - time.monotonic()
+        return {
+            "bucket_minutes": self.bucket_minutes,
+            "entries": [
+                [*origin, *destination, bucket, minutes, stored_at + offset]
+                for (origin, destination, bucket), (minutes, stored_at) in self._entries.items()
+            ],
+        }
+
+    def load_state(self, state: dict[str, Any]) -> None:
+        """Restore entries dumped by ``dump_state``, keeping their age; ignored if the bucket width changed."""
+        if state.get("bucket_minutes") != self.bucket_minutes:
+            return
+        offset = time.time() - time.monotonic()
+        for o_lat, o_lon, d_lat, d_lon, bucket, minutes, stored_at in state["entries"]:
+            if time.time() - stored_at <= self.max_age_seconds:
+                self._entries[((o_lat, o_lon), (d_lat, d_lon), bucket)] = (minutes, stored_at - offset)
+        while len(self._entries) > self.max_entries:
+            del self._entries[next(iter(self._entries))]
+
+    def split(
+        self, origins: list[Coordinate], destinations: list[Coordinate], departure: datetime
+    ) -> tuple[list[RouteMatrixEntry], set[tuple[int, int]]]:
+        """Split an origin x destination matrix into cached entries and the index pairs still to route."""
+        hits: list[RouteMatrixEntry] = []
+        missing: set[tuple[int, int]] = set()
+        for o_index, origin in enumerate(origins):
+            for d_index, destination in enumerate(destinations):
+                minutes = self.get(origin, destination, departure)
+                if minutes is None:
+                    missing.add((o_index, d_index))
+                else:
+                    hits.append(
+                        RouteMatrixEntry(origin_index=o_index, destination_index=d_index, duration_minutes=minutes)
+                    )
+        return hits, missing
+
+    def put_entries(
+        self,
+        origins: list[Coordinate],
+        destinations: list[Coordinate],
+        departure: datetime,
+        entries: list[RouteMatrixEntry],
+    ) -> None:
+        """Store routed entries indexed into ``origins`` and ``destinations``."""
+        for entry in entries:
+            self.put(
+                origins[entry.origin_index], destinations[entry.destination_index], departure, entry.duration_minutes
+            )
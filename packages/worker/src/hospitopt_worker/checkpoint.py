@@ -0,0 +1,102 @@
+"""On-disk checkpoints of the worker state, so a restarted worker starts warm."""
+
+import gzip
+import json
+import logging
+import os
+from collections.abc import MutableMapping
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import IO, Any, Literal
+from uuid import UUID
+
+from hospitopt_core.domain.models import PatientAssignment
+from hospitopt_worker.ingestion.tracking import InputTracker
+from hospitopt_worker.routes import RoutingContext
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+
+def _open(path: Path, mode: Literal["r", "w"]) -> IO[str]:
+    if path.suffix != ".gz":
+        return path.open(mode, encoding="utf-8")
+    if mode == "w":
+        return gzip.open(path, "wt", encoding="utf-8")
+    return gzip.open(path, "rt", encoding="utf-8")
+
+
+class WorkerCheckpoint:
+    """Latest inputs, last assignments and routing caches of a worker, saved to and restored from one file.
+
+    Files are JSON (gzip-compressed when the path ends in ``.gz``) and replaced atomically, so a crash while saving
+    leaves the previous checkpoint intact. Each component ignores state recorded under a different configuration.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    def collect(
+        self,
+        inputs: InputTracker,
+        previous_assignments: MutableMapping[UUID, PatientAssignment],
+        routing_context: RoutingContext | None = None,
+    ) -> dict[str, Any]:
+        """Capture the state to checkpoint; cheap enough to call on the event loop before ``save``."""
+        state: dict[str, Any] = {
+            "version": FORMAT_VERSION,
+            "saved_at": datetime.now(UTC).isoformat(),
+            "inputs": inputs.dump_state(),
+            "assignments": [assignment.model_dump(mode="json") for assignment in previous_assignments.values()],
+        }
+        if routing_context is not None:
+            if routing_context.matrix_cache is not None:
+                state["matrix_cache"] = routing_context.matrix_cache.dump_state()
+            if routing_context.grid_table is not None:
+                state["grid_table"] = routing_context.grid_table.dump_state()
+            if routing_context.estimator is not None:
+                state["estimator"] = routing_context.estimator.dump_state()
+        return state
+
+    def save(self, state: dict[str, Any]) -> None:
+        """Write collected state, replacing the previous checkpoint atomically. Blocking."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        partial = self.path.with_name(f".{self.path.name}")  # keeps the suffix, hence the compression
+        with _open(partial, "w") as handle:
+            json.dump(state, handle, separators=(",", ":"))
+        os.replace(partial, self.path)
+
+    def restore(
+        self,
+        inputs: InputTracker,
+        previous_assignments: MutableMapping[UUID, PatientAssignment],
+        routing_context: RoutingContext | None = None,
+    ) -> bool:
+        """Load the checkpoint into the given components; returns False when there is no usable checkpoint."""
+        try:
+            with _open(self.path, "r") as handle:
+                state = json.load(handle)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as exc:
+            logger.warning("Ignoring unreadable checkpoint %s: %s", self.path, exc)
+            return False
+        if state.get("version") != FORMAT_VERSION:
+            logger.warning("Ignoring checkpoint %s of format version %s.", self.path, state.get("version"))
+            return False
+
+        inputs.load_state(state["inputs"])
+        previous_assignments.update(
+            (assignment.patient_id, assignment)
+            for assignment in map(PatientAssignment.model_validate, state["assignments"])
+        )
+        if routing_context is not None:
+            if routing_context.matrix_cache is not None and "matrix_cache" in state:
+                routing_context.matrix_cache.load_state(state["matrix_cache"])
+            if routing_context.grid_table is not None and "grid_table" in state:
+                routing_context.grid_table.load_state(state["grid_table"])
+            if routing_context.estimator is not None and "estimator" in state:
+                routing_context.estimator.load_state(state["estimator"])
+        logger.info("Restored worker state checkpointed at %s from %s.", state["saved_at"], self.path)
+        return True
@@ -1,18 +1,24 @@
 """Database access for the worker."""
 
+from collections.abc import Mapping
 from datetime import UTC, datetime
 from typing import Callable
+from uuid import UUID
 
+from opentelemetry import trace
+from opentelemetry.util.types import AttributeValue
 from sqlalchemy import delete, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing_extensions import AsyncContextManager
 
-from hospitopt_core.db.models import PatientAssignmentDB
+from hospitopt_core.db.models import OptimizationJobDB, PatientAssignmentDB
 from hospitopt_core.domain.models import OptimizationResult
 
 
 SessionFactory = Callable[[], AsyncContextManager[AsyncSession, None]]
 
+tracer = trace.get_tracer(__name__)
+
 
 class DatabaseWriter:
     """Write optimization results back to the database."""
@@ -24,6 +30,43 @@ class DatabaseWriter:
         if not result.assignments:
             return
 
+        attributes = {"hospitopt.assignments": len(result.assignments)}
+        with tracer.start_as_current_span("db.write_result", attributes=attributes):
+            async with self._session_factory() as session:
+                await self._replace_assignments(session, result)
+                await session.commit()
+
+    async def write_job_result(self, result: OptimizationResult, job_id: UUID, worker_id: str) -> bool:
+        """Write the result of a queued job and remove the job, in one transaction.
+
+        The write is fenced by the job claim: when the lease was lost and another worker claimed the job, nothing
+        is written and False is returned. Writing the same result twice leaves the same assignments.
+        """
+        attributes: Mapping[str, AttributeValue] = {
+            "hospitopt.assignments": len(result.assignments),
+            "hospitopt.job_id": str(job_id),
+        }
+        with tracer.start_as_current_span("db.write_result", attributes=attributes) as span:
+            async with self._session_factory() as session:
+                owned = await session.execute(
+                    select(OptimizationJobDB.id)
+                    .where(
+                        OptimizationJobDB.id == job_id,
+                        OptimizationJobDB.status == "running",
+                        OptimizationJobDB.claimed_by == worker_id,
+                    )
+                    .with_for_update()
+                )
+                if owned.scalar_one_or_none() is None:
+                    span.set_attribute("hospitopt.lease_lost", True)
+                    return False
+                if result.assignments:
+                    await self._replace_assignments(session, result)
+                await session.execute(delete(OptimizationJobDB).where(OptimizationJobDB.id == job_id))
+                await session.commit()
+        return True
+
+    async def _replace_assignments(self, session: AsyncSession, result: OptimizationResult) -> None:
         patient_ids = [assignment.patient_id for assignment in result.assignments]
         now = datetime.now(UTC)
         insert_rows = [
@@ -41,10 +84,8 @@ class DatabaseWriter:
             for assignment in result.assignments
         ]
 
-        async with self._session_factory() as session:
-            await session.execute(delete(PatientAssignmentDB).where(PatientAssignmentDB.patient_id.in_(patient_ids)))
-            session.add_all(insert_rows)
-            await session.commit()
+        await session.execute(delete(PatientAssignmentDB).where(PatientAssignmentDB.patient_id.in_(patient_ids)))
+        session.add_all(insert_rows)
 
 
 async def check_connection(session_factory: SessionFactory) -> None:
@@ -0,0 +1,240 @@
+"""Fast local travel-time estimates learned from observed route matrix results."""
+
+import math
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+
+from hospitopt_worker.geo import EARTH_RADIUS_METERS, haversine_meters
+
+Coordinate = tuple[float, float]
+_ModelKey = tuple[int, int, int]
+
+
+def _haversine_km(origins: npt.NDArray[np.float64], destinations: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    """Great-circle distance in km between broadcastable (..., 2) arrays of (lat, lon) degrees."""
+    lat1, lon1 = np.radians(origins[..., 0]), np.radians(origins[..., 1])
+    lat2, lon2 = np.radians(destinations[..., 0]), np.radians(destinations[..., 1])
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    km: npt.NDArray[np.float64] = 2 * EARTH_RADIUS_METERS / 1000 * np.arcsin(np.sqrt(a))
+    return km
+
+
+class _LinearFit:
+    """Exponentially forgetting least-squares fit of minutes = intercept + slope * straight-line km."""
+
+    __slots__ = ("_coef", "count", "xtx", "xty")
+
+    def __init__(self) -> None:
+        self.xtx = np.zeros((2, 2))
+        self.xty = np.zeros(2)
+        self.count = 0.0
+        self._coef: tuple[float, float] | None = None
+
+    def update(self, km: npt.NDArray[np.float64], minutes: npt.NDArray[np.float64], decay: float) -> None:
+        forget = decay ** len(km)
+        features = np.column_stack([np.ones_like(km), km])
+        self.xtx = self.xtx * forget + features.T @ features
+        self.xty = self.xty * forget + features.T @ minutes
+        self.count = self.count * forget + len(km)
+        self._coef = None
+
+    def dump(self) -> list[Any]:
+        return [*self.xtx.ravel().tolist(), *self.xty.tolist(), self.count]
+
+    @classmethod
+    def load(cls, values: list[Any]) -> "_LinearFit":
+        fit = cls()
+        fit.xtx = np.array(values[:4], dtype=np.float64).reshape(2, 2)
+        fit.xty = np.array(values[4:6], dtype=np.float64)
+        fit.count = float(values[6])
+        return fit
+
+    def coef(self, prior: npt.NDArray[np.float64], prior_weight: float) -> tuple[float, float]:
+        """Ridge solution shrunk towards ``prior``, cached until the next update."""
+        if self._coef is None:
+            solved = np.linalg.solve(self.xtx + prior_weight * np.eye(2), self.xty + prior_weight * prior)
+            self._coef = (float(solved[0]), float(solved[1]))
+        return self._coef
+
+
+@dataclass(frozen=True)
+class EstimatorErrorSummary:
+    """Distribution of estimate errors measured against live routes before learning from them."""
+
+    count: int
+    mean_error_minutes: float
+    mean_absolute_error_minutes: float
+    p50_absolute_error_minutes: float
+    p90_absolute_error_minutes: float
+    p95_absolute_error_minutes: float
+    mean_absolute_percentage_error: float
+
+
+class TravelTimeEstimator:
+    """Road circuity and speed model per region and time-of-day bucket, learned from live routes.
+
+    Travel minutes are modelled as ``intercept + slope * straight-line km``: the slope captures road circuity over
+    speed, the intercept fixed overheads such as access roads. A model is fitted incrementally per origin region and
+    time-of-day bucket; estimates fall back to the bucket-wide model, then the global one, then the prior speed
+    while a model has fewer than ``min_observations`` recent observations.
+    """
+
+    def __init__(
+        self,
+        speed_kph: float = 30.0,
+        region_degrees: float = 0.1,
+        bucket_minutes: int = 60,
+        min_observations: int = 20,
+        decay: float = 0.999,
+        prior_weight: float = 5.0,
+        error_window: int = 1000,
+    ) -> None:
+        """Create an estimator.
+
+        Args:
+            speed_kph: Prior effective straight-line speed in km/h. Defaults to 30.
+            region_degrees: Size of the origin regions in degrees. Defaults to 0.1 (roughly 10 km).
+            bucket_minutes: Width of the time-of-day buckets in minutes. Defaults to 60.
+            min_observations: Effective observations a model needs before it is used. Defaults to 20.
+            decay: Per-observation forgetting factor, so models track changing conditions. Defaults to 0.999.
+            prior_weight: Strength of the shrinkage towards the prior speed. Defaults to 5.
+            error_window: Number of recent errors kept for the error distribution. Defaults to 1000.
+        """
+        self.speed_kph = speed_kph
+        self.region_degrees = region_degrees
+        self.bucket_minutes = bucket_minutes
+        self.min_observations = min_observations
+        self.decay = decay
+        self.prior_weight = prior_weight
+        self._prior = np.array([0.0, 60.0 / speed_kph])
+        self._regions: dict[_ModelKey, _LinearFit] = {}
+        self._buckets: dict[int, _LinearFit] = {}
+        self._global = _LinearFit()
+        self._errors = np.zeros(error_window)
+        self._relative_errors = np.zeros(error_window)
+        self._error_count = 0
+
+    def bucket_for(self, moment: datetime) -> int:
+        """Return the time-of-day bucket of a timestamp."""
+        return (moment.hour * 60 + moment.minute) // self.bucket_minutes
+
+    def _coef(self, lat: float, lon: float, bucket: int) -> tuple[float, float]:
+        key = (math.floor(lat / self.region_degrees), math.floor(lon / self.region_degrees), bucket)
+        for fit in (self._regions.get(key), self._buckets.get(bucket), self._global):
+            if fit is not None and fit.count >= self.min_observations:
+                return fit.coef(self._prior, self.prior_weight)
+        return (float(self._prior[0]), float(self._prior[1]))
+
+    def estimate_minutes(self, origin: Coordinate, destination: Coordinate, at: datetime | None = None) -> int:
+        """Return the estimated travel minutes between two (lat, lon) coordinates.
+
+        Args:
+            origin: Origin (lat, lon).
+            destination: Destination (lat, lon).
+            at: Departure time used to select the time-of-day bucket. Defaults to now.
+
+        Returns:
+            Estimated minutes, at least 1.
+        """
+        intercept, slope = self._coef(origin[0], origin[1], self.bucket_for(at or datetime.now(UTC)))
+        km = haversine_meters(origin, destination) / 1000
+        return max(1, math.ceil(intercept + slope * km))
+
+    def estimate_matrix(
+        self, origins: list[Coordinate], destinations: list[Coordinate], at: datetime | None = None
+    ) -> npt.NDArray[np.int64]:
+        """Return estimated minutes for every origin x destination pair as an (origins, destinations) array."""
+        if not origins or not destinations:
+            return np.zeros((len(origins), len(destinations)), dtype=np.int64)
+        bucket = self.bucket_for(at or datetime.now(UTC))
+        coef = np.array([self._coef(lat, lon, bucket) for lat, lon in origins])
+        km = _haversine_km(np.asarray(origins)[:, None, :], np.asarray(destinations)[None, :, :])
+        minutes = np.ceil(coef[:, 0:1] + coef[:, 1:2] * km)
+        return np.maximum(1, minutes).astype(np.int64)
+
+    def observe(self, origin: Coordinate, destination: Coordinate, minutes: int, at: datetime | None = None) -> None:
+        """Learn from a single live routed duration."""
+        self.observe_batch([origin], [destination], [minutes], at)
+
+    def observe_batch(
+        self,
+        origins: list[Coordinate],
+        destinations: list[Coordinate],
+        minutes: list[int],
+        at: datetime | None = None,
+    ) -> None:
+        """Learn from live routed durations, recording the error of the current estimates first.
+
+        Args:
+            origins: Origin (lat, lon) of every observation.
+            destinations: Destination (lat, lon) of every observation.
+            minutes: Routed minutes of every observation.
+            at: Departure time of the observations. Defaults to now.
+        """
+        if not minutes:
+            return
+        bucket = self.bucket_for(at or datetime.now(UTC))
+        origin_array = np.asarray(origins, dtype=np.float64)
+        km = _haversine_km(origin_array, np.asarray(destinations, dtype=np.float64))
+        observed = np.asarray(minutes, dtype=np.float64)
+
+        coef = np.array([self._coef(lat, lon, bucket) for lat, lon in origins])
+        self._record_errors(observed - np.maximum(1, np.ceil(coef[:, 0] + coef[:, 1] * km)), observed)
+
+        rows = np.floor(origin_array[:, 0] / self.region_degrees).astype(np.int64)
+        cols = np.floor(origin_array[:, 1] / self.region_degrees).astype(np.int64)
+        regions, inverse = np.unique(np.column_stack([rows, cols]), axis=0, return_inverse=True)
+        for region_index, (row, col) in enumerate(regions):
+            mask = inverse.ravel() == region_index
+            self._regions.setdefault((int(row), int(col), bucket), _LinearFit()).update(
+                km[mask], observed[mask], self.decay
+            )
+        self._buckets.setdefault(bucket, _LinearFit()).update(km, observed, self.decay)
+        self._global.update(km, observed, self.decay)
+
+    def _record_errors(self, errors: npt.NDArray[np.float64], observed: npt.NDArray[np.float64]) -> None:
+        window = len(self._errors)
+        positions = (self._error_count + np.arange(len(errors))) % window
+        self._errors[positions[-window:]] = errors[-window:]
+        self._relative_errors[positions[-window:]] = (errors / observed)[-window:]
+        self._error_count += len(errors)
+
+    def dump_state(self) -> dict[str, Any]:
+        """Return the fitted models as JSON-serializable state; the error window is not kept."""
+        return {
+            "region_degrees": self.region_degrees,
+            "bucket_minutes": self.bucket_minutes,
+            "regions": [[*key, *fit.dump()] for key, fit in self._regions.items()],
+            "buckets": [[bucket, *fit.dump()] for bucket, fit in self._buckets.items()],
+            "global": self._global.dump(),
+        }
+
+    def load_state(self, state: dict[str, Any]) -> None:
+        """Restore models dumped by ``dump_state``; ignored if the region or bucket geometry changed."""
+        if (state.get("region_degrees"), state.get("bucket_minutes")) != (self.region_degrees, self.bucket_minutes):
+            return
+        self._regions = {(row, col, bucket): _LinearFit.load(fit) for row, col, bucket, *fit in state["regions"]}
+        self._buckets = {bucket: _LinearFit.load(fit) for bucket, *fit in state["buckets"]}
+        self._global = _LinearFit.load(state["global"])
+
+    def error_summary(self) -> EstimatorErrorSummary:
+        """Return the distribution of recent estimate errors (observed minus estimated minutes)."""
+        size = min(self._error_count, len(self._errors))
+        if size == 0:
+            return EstimatorErrorSummary(0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+        errors = self._errors[:size]
+        absolute = np.abs(errors)
+        p50, p90, p95 = np.percentile(absolute, [50, 90, 95])
+        return EstimatorErrorSummary(
+            count=self._error_count,
+            mean_error_minutes=float(errors.mean()),
+            mean_absolute_error_minutes=float(absolute.mean()),
+            p50_absolute_error_minutes=float(p50),
+            p90_absolute_error_minutes=float(p90),
+            p95_absolute_error_minutes=float(p95),
+            mean_absolute_percentage_error=float(np.abs(self._relative_errors[:size]).mean()),
+        )
@@ -0,0 +1,13 @@
+"""Geographic helpers shared by routing components."""
+
+import math
+
+EARTH_RADIUS_METERS = 6_371_000.0
+
+
+def haversine_meters(origin: tuple[float, float], destination: tuple[float, float]) -> float:
+    """Great-circle distance in meters between two (lat, lon) coordinates."""
+    lat1, lon1 = map(math.radians, origin)
+    lat2, lon2 = map(math.radians, destination)
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(a))
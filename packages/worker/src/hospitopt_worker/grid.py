@@ -0,0 +1,187 @@
+"""Precomputed grid-to-hospital travel-time table."""
+
+import math
+from datetime import datetime
+from typing import Any
+from uuid import UUID
+
+from hospitopt_core.domain.models import Hospital
+
+GridCell = tuple[int, int]
+
+
+class _GridEntry:
+    """Travel minutes from one grid cell to the hospitals known at refresh time."""
+
+    __slots__ = ("hospital_ids", "minutes", "refreshed_at")
+
+    def __init__(self, hospital_ids: set[UUID], minutes: dict[UUID, int], refreshed_at: datetime) -> None:
+        self.hospital_ids = hospital_ids
+        self.minutes = minutes
+        self.refreshed_at = refreshed_at
+
+
+class HospitalGridTable:
+    """Travel minutes from fixed geographic grid cells to every hospital, per time-of-day bucket.
+
+    Hospitals are effectively static, so patient -> hospital durations can be answered by the grid cell the
+    patient falls in. Cells are refreshed in the background; lookups only fall back to live routing on misses
+    or for cells flagged as stale.
+    """
+
+    def __init__(
+        self,
+        resolution_degrees: float,
+        bucket_minutes: int = 60,
+        max_age_seconds: float = 6 * 3600,
+        bounds: tuple[float, float, float, float] | None = None,
+    ) -> None:
+        """Create an empty table.
+
+        Args:
+            resolution_degrees: Grid cell size in degrees.
+            bucket_minutes: Width of the time-of-day buckets in minutes. Defaults to 60.
+            max_age_seconds: Entries older than this are considered stale. Defaults to 6 hours.
+            bounds: Optional (min_lat, min_lon, max_lat, max_lon) service area whose cells are kept warm.
+        """
+        self.resolution_degrees = resolution_degrees
+        self.bucket_minutes = bucket_minutes
+        self.max_age_seconds = max_age_seconds
+        self.bounds = bounds
+        self._entries: dict[tuple[int, GridCell], _GridEntry] = {}
+        self._stale: set[GridCell] = set()
+        self._demand: dict[GridCell, datetime] = {}
+        self._hospitals: dict[UUID, Hospital] = {}
+
+    @property
+    def hospitals(self) -> list[Hospital]:
+        """Hospitals the table is currently tracking."""
+        return list(self._hospitals.values())
+
+    def cell_for(self, lat: float, lon: float) -> GridCell:
+        """Return the grid cell containing a coordinate."""
+        return (math.floor(lat / self.resolution_degrees), math.floor(lon / self.resolution_degrees))
+
+    def cell_center(self, cell: GridCell) -> tuple[float, float]:
+        """Return the (lat, lon) center of a grid cell."""
+        return ((cell[0] + 0.5) * self.resolution_degrees, (cell[1] + 0.5) * self.resolution_degrees)
+
+    def bucket_for(self, moment: datetime) -> int:
+        """Return the time-of-day bucket of a timestamp."""
+        return (moment.hour * 60 + moment.minute) // self.bucket_minutes
+
+    def sync_hospitals(self, hospitals: list[Hospital]) -> None:
+        """Track the current hospitals, dropping cached minutes for hospitals that moved or disappeared."""
+        current = {hospital.id: hospital for hospital in hospitals}
+        invalid = {
+            hospital_id
+            for hospital_id, known in self._hospitals.items()
+            if hospital_id not in current
+            or (current[hospital_id].lat, current[hospital_id].lon) != (known.lat, known.lon)
+        }
+        if invalid:
+            for entry in self._entries.values():
+                entry.hospital_ids -= invalid
+                for hospital_id in invalid:
+                    entry.minutes.pop(hospital_id, None)
+        self._hospitals = current
+
+    def mark_stale(self, cell: GridCell) -> None:
+        """Flag a cell so lookups miss until it is refreshed."""
+        self._stale.add(cell)
+
+    def lookup(self, lat: float, lon: float, hospitals: list[Hospital], now: datetime) -> dict[int, int] | None:
+        """Return minutes by hospital index for the cell containing a coordinate.
+
+        Args:
+            lat: Latitude of the origin.
+            lon: Longitude of the origin.
+            hospitals: Hospitals to look up, in index order.
+            now: Current time, used to select the time-of-day bucket and check staleness.
+
+        Returns:
+            Minutes keyed by hospital index (unreachable hospitals are omitted), or None on a miss.
+        """
+        cell = self.cell_for(lat, lon)
+        self._demand[cell] = now
+        entry = self._entries.get((self.bucket_for(now), cell))
+        if entry is None or not self._is_fresh(cell, entry, now):
+            return None
+        if any(hospital.id not in entry.hospital_ids for hospital in hospitals):
+            return None
+        return {
+            h_index: entry.minutes[hospital.id]
+            for h_index, hospital in enumerate(hospitals)
+            if hospital.id in entry.minutes
+        }
+
+    def store(self, cell: GridCell, minutes: dict[UUID, int], hospital_ids: set[UUID], now: datetime) -> None:
+        """Record freshly routed minutes for a cell in the bucket of ``now``."""
+        self._entries[(self.bucket_for(now), cell)] = _GridEntry(set(hospital_ids), dict(minutes), now)
+        self._stale.discard(cell)
+
+    def cells_to_refresh(self, now: datetime, limit: int) -> list[GridCell]:
+        """Return up to ``limit`` cells missing or stale in the current bucket, most recently requested first."""
+        self._demand = {
+            cell: seen_at
+            for cell, seen_at in self._demand.items()
+            if (now - seen_at).total_seconds() <= self.max_age_seconds
+        }
+        candidates = sorted(self._demand, key=lambda cell: self._demand[cell], reverse=True)
+        if self.bounds is not None:
+            min_lat, min_lon, max_lat, max_lon = self.bounds
+            low = self.cell_for(min_lat, min_lon)
+            high = self.cell_for(max_lat, max_lon)
+            known = set(candidates)
+            candidates.extend(
+                (row, col)
+                for row in range(low[0], high[0] + 1)
+                for col in range(low[1], high[1] + 1)
+                if (row, col) not in known
+            )
+
+        bucket = self.bucket_for(now)
+        selected: list[GridCell] = []
+        for cell in candidates:
+            entry = self._entries.get((bucket, cell))
+            if entry is None or not self._is_fresh(cell, entry, now) or entry.hospital_ids != set(self._hospitals):
+                selected.append(cell)
+                if len(selected) >= limit:
+                    break
+        return selected
+
+    def dump_state(self) -> dict[str, Any]:
+        """Return the tracked hospitals and cell entries as JSON-serializable state."""
+        return {
+            "resolution_degrees": self.resolution_degrees,
+            "bucket_minutes": self.bucket_minutes,
+            "hospitals": [hospital.model_dump(mode="json") for hospital in self._hospitals.values()],
+            "entries": [
+                [
+                    bucket,
+                    *cell,
+                    [str(hospital_id) for hospital_id in entry.hospital_ids],
+                    {str(hospital_id): minutes for hospital_id, minutes in entry.minutes.items()},
+                    entry.refreshed_at.isoformat(),
+                ]
+                for (bucket, cell), entry in self._entries.items()
+            ],
+        }
+
+    def load_state(self, state: dict[str, Any]) -> None:
+        """Restore state dumped by ``dump_state``; ignored if the grid or bucket geometry changed."""
+        if (state.get("resolution_degrees"), state.get("bucket_minutes")) != (
+            self.resolution_degrees,
+            self.bucket_minutes,
+        ):
+            return
+        self._hospitals = {hospital.id: hospital for hospital in map(Hospital.model_validate, state["hospitals"])}
+        for bucket, row, col, hospital_ids, minutes, refreshed_at in state["entries"]:
+            self._entries[(bucket, (row, col))] = _GridEntry(
+                {UUID(hospital_id) for hospital_id in hospital_ids},
+                {UUID(hospital_id): value for hospital_id, value in minutes.items()},
+                datetime.fromisoformat(refreshed_at),
+            )
+
+    def _is_fresh(self, cell: GridCell, entry: _GridEntry, now: datetime) -> bool:
+        return cell not in self._stale and (now - entry.refreshed_at).total_seconds() <= self.max_age_seconds
@@ -15,9 +15,17 @@ ModelT = TypeVar("ModelT")
 class APIIngestor(DataIngestor):
     """HTTP-based ingestor for domain data."""
 
-    def __init__(self, host_url: HttpUrl, api_key: SecretStr) -> None:
+    def __init__(self, host_url: HttpUrl, api_key: SecretStr, incident: str | None = None) -> None:
         headers = {"Authorization": f"Bearer {api_key.get_secret_value()}"}
-        self._httpx_async_client = AsyncClient(base_url=str(host_url).rstrip("/"), headers=headers)
+        params = {"incident": incident} if incident is not None else None
+        self._httpx_async_client = AsyncClient(base_url=str(host_url).rstrip("/"), headers=headers, params=params)
+        self._host_url = host_url
+        self._api_key = api_key
+
+    def for_incident(self, incident: str | None) -> "APIIngestor":
+        if incident is None:
+            raise ValueError("API ingestion can only be sharded by explicit incident keys.")
+        return APIIngestor(self._host_url, self._api_key, incident=incident)
 
     async def get_hospitals(self) -> Sequence[Hospital]:
         response = await self._httpx_async_client.get("/hospitals")
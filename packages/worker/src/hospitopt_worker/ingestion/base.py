@@ -1,10 +1,31 @@
 """Ingestion interfaces for the worker runtime."""
 
+import asyncio
 from abc import ABC, abstractmethod
-from collections.abc import Sequence
+from collections.abc import Collection, Mapping, Sequence
+from dataclasses import dataclass
 
 from hospitopt_core.domain.models import Ambulance, Hospital, Patient
 
+TABLES = ("hospitals", "patients", "ambulances")
+
+# Version of one input table, compared as a whole: equal revisions mean the table did not change.
+type Revision = tuple[int, ...]
+
+
+@dataclass(frozen=True)
+class InputSnapshot:
+    """Optimization inputs read together, with the table revisions they correspond to.
+
+    Tables that were not requested are None. ``revisions`` is the version of the snapshot, or None when the
+    source does not track changes.
+    """
+
+    hospitals: Sequence[Hospital] | None = None
+    patients: Sequence[Patient] | None = None
+    ambulances: Sequence[Ambulance] | None = None
+    revisions: Mapping[str, Revision] | None = None
+
 
 class DataIngestor(ABC):
     """Abstract interface for loading domain data."""
@@ -23,3 +44,43 @@ class DataIngestor(ABC):
     async def get_ambulances(self) -> Sequence[Ambulance]:
         """Return ambulances to be optimized."""
         ...
+
+    async def get_revisions(self) -> Mapping[str, Revision] | None:
+        """Return a revision per input table (``hospitals``, ``patients``, ``ambulances``).
+
+        A table whose revision did not move since the previous call is unchanged and need not be reloaded.
+        Returns None when the source does not track changes, in which case callers compare full snapshots.
+        """
+        return None
+
+    async def get_incidents(self) -> set[str | None] | None:
+        """Return the incident or region keys present in the inputs, None standing for entries without one.
+
+        Returns None when the source cannot list them, in which case shards have to be configured explicitly.
+        """
+        return None
+
+    def for_incident(self, incident: str | None) -> "DataIngestor":
+        """Return an ingestor limited to one incident or region key; None selects entries without a key."""
+        raise NotImplementedError(f"{type(self).__name__} cannot be sharded by incident.")
+
+    async def get_snapshot(self, tables: Collection[str] = TABLES) -> InputSnapshot:
+        """Return the requested input tables and the revisions they were read at.
+
+        The default implementation issues the reads concurrently. Sources that can read all tables at a single
+        point in time override it to rule out torn reads across tables.
+
+        Args:
+            tables: Tables to read, a subset of ``hospitals``, ``patients`` and ``ambulances``. Defaults to all.
+        """
+
+        async def _none() -> None:
+            return None
+
+        hospitals, patients, ambulances, revisions = await asyncio.gather(
+            self.get_hospitals() if "hospitals" in tables else _none(),
+            self.get_patients() if "patients" in tables else _none(),
+            self.get_ambulances() if "ambulances" in tables else _none(),
+            self.get_revisions(),
+        )
+        return InputSnapshot(hospitals=hospitals, patients=patients, ambulances=ambulances, revisions=revisions)
@@ -1,64 +1,180 @@
 """Database ingestion for the worker runtime."""
 
-from collections.abc import Sequence
+from collections.abc import Collection, Mapping, Sequence
 from typing import TypeVar
 
-from sqlalchemy import Select, select
+from opentelemetry import trace
+from sqlalchemy import (
+    BigInteger,
+    ColumnClause,
+    ColumnElement,
+    CompoundSelect,
+    Select,
+    func,
+    literal,
+    literal_column,
+    or_,
+    select,
+    union,
+    union_all,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from hospitopt_core.db.models import AmbulanceDB, HospitalDB, PatientDB
 from hospitopt_core.domain.models import Ambulance, Hospital, Patient
 from hospitopt_worker.db import SessionFactory
-from hospitopt_worker.ingestion.base import DataIngestor
+from hospitopt_worker.ingestion.base import TABLES, DataIngestor, InputSnapshot, Revision
 
 ModelT = TypeVar("ModelT")
 
+tracer = trace.get_tracer(__name__)
+
+# Oldest transaction still running; every transaction with a lower id has committed or aborted.
+SNAPSHOT_HORIZON: ColumnClause[int] = literal_column(
+    "pg_snapshot_xmin(pg_current_snapshot())::text::bigint", BigInteger
+)
+
+
+def _to_hospital(row: HospitalDB) -> Hospital:
+    return Hospital(
+        id=row.id,
+        name=row.name,
+        bed_capacity=row.bed_capacity,
+        used_beds=row.used_beds,
+        lat=row.lat,
+        lon=row.lon,
+        incident=row.incident,
+    )
+
+
+def _to_patient(row: PatientDB) -> Patient:
+    return Patient(
+        id=row.id,
+        lat=row.lat,
+        lon=row.lon,
+        time_to_hospital_minutes=row.time_to_hospital_minutes,
+        registered_at=row.registered_at,
+        incident=row.incident,
+    )
+
+
+def _to_ambulance(row: AmbulanceDB) -> Ambulance:
+    return Ambulance(
+        id=row.id,
+        lat=row.lat,
+        lon=row.lon,
+        assigned_patient_id=row.assigned_patient_id,
+        incident=row.incident,
+    )
+
+
+InputRowT = TypeVar("InputRowT", HospitalDB, PatientDB, AmbulanceDB)
+type InputModel = type[HospitalDB] | type[PatientDB] | type[AmbulanceDB]
+
+INPUT_MODELS: dict[str, InputModel] = {"hospitals": HospitalDB, "patients": PatientDB, "ambulances": AmbulanceDB}
+
 
 class SQLAlchemyIngestor(DataIngestor):
     """SQLAlchemy-backed ingestor for domain data."""
 
-    def __init__(self, session_factory: SessionFactory) -> None:
+    def __init__(self, session_factory: SessionFactory, incidents: Collection[str | None] | None = None) -> None:
+        """Create an ingestor.
+
+        Args:
+            session_factory: Sessions on the database holding the inputs.
+            incidents: Incident or region keys to limit the inputs to, None standing for entries without a key.
+                Defaults to None, which reads all inputs.
+        """
         self._session_factory = session_factory
+        self._incidents = incidents
+
+    def for_incident(self, incident: str | None) -> "SQLAlchemyIngestor":
+        return SQLAlchemyIngestor(self._session_factory, incidents=[incident])
+
+    async def get_incidents(self) -> set[str | None] | None:
+        query = union(select(HospitalDB.incident), select(PatientDB.incident), select(AmbulanceDB.incident))
+        async with self._session_factory() as session:
+            return set((await session.execute(query)).scalars().all())
+
+    def _select(self, model: type[InputRowT]) -> Select[InputRowT]:
+        return select(model).where(*self._incident_filter(model))
+
+    def _incident_filter(self, model: InputModel) -> list[ColumnElement[bool]]:
+        if self._incidents is None:
+            return []
+        keys = [key for key in self._incidents if key is not None]
+        conditions: list[ColumnElement[bool]] = [model.incident.in_(keys)] if keys else []
+        if None in self._incidents:
+            conditions.append(model.incident.is_(None))
+        return [or_(*conditions)]
 
     async def get_hospitals(self) -> Sequence[Hospital]:
-        rows: Sequence[HospitalDB] = await self._fetch_rows(select(HospitalDB))
-        return [
-            Hospital(
-                id=row.id,
-                name=row.name,
-                bed_capacity=row.bed_capacity,
-                used_beds=row.used_beds,
-                lat=row.lat,
-                lon=row.lon,
-            )
-            for row in rows
-        ]
+        rows: Sequence[HospitalDB] = await self._fetch_rows(self._select(HospitalDB))
+        return [_to_hospital(row) for row in rows]
 
     async def get_patients(self) -> Sequence[Patient]:
-        rows: Sequence[PatientDB] = await self._fetch_rows(select(PatientDB))
-        return [
-            Patient(
-                id=row.id,
-                lat=row.lat,
-                lon=row.lon,
-                time_to_hospital_minutes=row.time_to_hospital_minutes,
-                registered_at=row.registered_at,
-            )
-            for row in rows
-        ]
+        rows: Sequence[PatientDB] = await self._fetch_rows(self._select(PatientDB))
+        return [_to_patient(row) for row in rows]
 
     async def get_ambulances(self) -> Sequence[Ambulance]:
-        rows: Sequence[AmbulanceDB] = await self._fetch_rows(select(AmbulanceDB))
-        return [
-            Ambulance(
-                id=row.id,
-                lat=row.lat,
-                lon=row.lon,
-                assigned_patient_id=row.assigned_patient_id,
+        rows: Sequence[AmbulanceDB] = await self._fetch_rows(self._select(AmbulanceDB))
+        return [_to_ambulance(row) for row in rows]
+
+    async def get_revisions(self) -> Mapping[str, Revision] | None:
+        """Return a revision per input table from its row count and the transactions that wrote its rows.
+
+        Rows carry the id of the transaction that last wrote them in their indexed ``revision`` column. Inserts and
+        updates raise the highest id and deletes lower the count, both answered from the ``(incident, revision)``
+        index without touching a shared row. A writer whose id is below the highest one seen may still commit
+        later, so while a transaction that old is running the revision also holds the oldest running transaction
+        id, which moves once it ends. Only the rows of the ingestor's incidents count, so writes to other incidents
+        leave its revisions alone. The query is not traced, since workers poll it whether or not anything changed.
+        """
+        async with self._session_factory() as session:
+            return await self._query_revisions(session)
+
+    async def get_snapshot(self, tables: Collection[str] = TABLES) -> InputSnapshot:
+        """Read the requested tables and their revisions in one REPEATABLE READ transaction.
+
+        All queries share one connection and see the same database snapshot, so the tables are mutually
+        consistent and the revisions describe exactly the rows returned.
+        """
+        async with self._session_factory() as session:
+            await session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+            hospitals = patients = ambulances = None
+            if "hospitals" in tables:
+                hospitals = [_to_hospital(row) for row in await self._query(session, self._select(HospitalDB))]
+            if "patients" in tables:
+                patients = [_to_patient(row) for row in await self._query(session, self._select(PatientDB))]
+            if "ambulances" in tables:
+                ambulances = [_to_ambulance(row) for row in await self._query(session, self._select(AmbulanceDB))]
+            with tracer.start_as_current_span("SELECT revisions", attributes={"db.collection.name": list(TABLES)}):
+                revisions = await self._query_revisions(session)
+        return InputSnapshot(hospitals=hospitals, patients=patients, ambulances=ambulances, revisions=revisions)
+
+    def _revision_query(self) -> CompoundSelect[str, int, int, int]:
+        return union_all(
+            *(
+                select(literal(table), func.count(), func.coalesce(func.max(model.revision), 0), SNAPSHOT_HORIZON)
+                .select_from(model)
+                .where(*self._incident_filter(model))
+                for table, model in INPUT_MODELS.items()
             )
-            for row in rows
-        ]
+        )
+
+    async def _query_revisions(self, session: AsyncSession) -> dict[str, Revision]:
+        rows = (await session.execute(self._revision_query())).tuples().all()
+        # Once no transaction older than the latest write is running, the horizon stops mattering until the next one.
+        return {table: (count, latest, min(horizon, latest + 1)) for table, count, latest, horizon in rows}
 
     async def _fetch_rows(self, query: Select[ModelT]) -> Sequence[ModelT]:
         async with self._session_factory() as session:
-            result = await session.execute(query)
-            return list(result.scalars().all())
+            return await self._query(session, query)
+
+    @staticmethod
+    async def _query(session: AsyncSession, query: Select[ModelT]) -> list[ModelT]:
+        table = query.get_final_froms()[0].description
+        with tracer.start_as_current_span(f"SELECT {table}", attributes={"db.collection.name": table}) as span:
+            rows = list((await session.execute(query)).scalars().all())
+            span.set_attribute("db.response.returned_rows", len(rows))
+        return rows
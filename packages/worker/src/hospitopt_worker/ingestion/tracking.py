@@ -0,0 +1,193 @@
+"""Change tracking of the optimization inputs across worker cycles."""
+
+import time
+from collections.abc import Collection, Sequence
+from dataclasses import dataclass, field
+from typing import Any
+from uuid import UUID
+
+from opentelemetry import trace
+
+from hospitopt_core.domain.models import Ambulance, Hospital, Patient
+from hospitopt_worker.ingestion.base import TABLES, DataIngestor, InputSnapshot, Revision
+
+tracer = trace.get_tracer(__name__)
+
+Entity = Hospital | Patient | Ambulance
+
+# Fields that feed routing and optimization; changes to any other field do not mark an entity as changed.
+FINGERPRINT_FIELDS: dict[str, tuple[str, ...]] = {
+    "hospitals": ("bed_capacity", "used_beds", "lat", "lon"),
+    "patients": ("lat", "lon", "time_to_hospital_minutes", "registered_at"),
+    "ambulances": ("lat", "lon", "assigned_patient_id"),
+}
+
+
+# The values of the fingerprint fields themselves, so no collision can hide a change.
+type Fingerprint = tuple[Any, ...]
+
+
+def fingerprint(entity: Entity, fields: Sequence[str]) -> Fingerprint:
+    """Return the values of the given fields of an entity, compared as is across refreshes."""
+    return tuple(getattr(entity, name) for name in fields)
+
+
+@dataclass(frozen=True)
+class EntityDelta:
+    """Ids of entities added, removed and changed since the previous refresh."""
+
+    added: frozenset[UUID] = frozenset()
+    removed: frozenset[UUID] = frozenset()
+    changed: frozenset[UUID] = frozenset()
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+    def then(self, later: "EntityDelta") -> "EntityDelta":
+        """Return the changes of this delta followed by ``later``, as if both refreshes were one."""
+        added = (self.added - later.removed) | (later.added - self.removed)
+        removed = (self.removed - later.added) | (later.removed - self.added)
+        changed = (self.changed | later.changed | (self.removed & later.added)) - added - removed
+        return EntityDelta(added=frozenset(added), removed=frozenset(removed), changed=frozenset(changed))
+
+
+@dataclass(frozen=True)
+class InputDelta:
+    """Per-entity changes of the optimization inputs since the previous refresh."""
+
+    hospitals: EntityDelta = field(default_factory=EntityDelta)
+    patients: EntityDelta = field(default_factory=EntityDelta)
+    ambulances: EntityDelta = field(default_factory=EntityDelta)
+
+    def __bool__(self) -> bool:
+        return bool(self.hospitals or self.patients or self.ambulances)
+
+    def then(self, later: "InputDelta") -> "InputDelta":
+        """Return the changes of this delta followed by ``later``, e.g. across a cycle that was never routed."""
+        return InputDelta(
+            hospitals=self.hospitals.then(later.hospitals),
+            patients=self.patients.then(later.patients),
+            ambulances=self.ambulances.then(later.ambulances),
+        )
+
+    def touched(self) -> frozenset[UUID]:
+        """Return the ids of entities added or changed, whose travel times cannot be carried over."""
+        return frozenset().union(
+            *(delta.added | delta.changed for delta in (self.hospitals, self.patients, self.ambulances))
+        )
+
+
+def diff_fingerprints(previous: dict[UUID, Fingerprint], current: dict[UUID, Fingerprint]) -> EntityDelta:
+    """Compare two fingerprint indexes keyed by entity id."""
+    return EntityDelta(
+        added=frozenset(current.keys() - previous.keys()),
+        removed=frozenset(previous.keys() - current.keys()),
+        changed=frozenset(id for id in current.keys() & previous.keys() if current[id] != previous[id]),
+    )
+
+
+class InputTracker:
+    """Latest optimization inputs, reloaded only when the source reports a change.
+
+    Sources with per-table revisions are asked for them in a single query and only tables whose revision moved
+    are reloaded, as one consistent snapshot. Other sources are loaded in full. Reloaded tables are compared entity
+    by entity against a fingerprint index, and the resulting ``delta`` tells downstream stages what was added,
+    removed or changed.
+    """
+
+    def __init__(self, ingestor: DataIngestor) -> None:
+        self._ingestor = ingestor
+        self._revisions: dict[str, Revision] = {}
+        self._fingerprints: dict[str, dict[UUID, Fingerprint]] = {table: {} for table in TABLES}
+        self.hospitals: Sequence[Hospital] = []
+        self.patients: Sequence[Patient] = []
+        self.ambulances: Sequence[Ambulance] = []
+        self.delta = InputDelta()
+        self.hash_seconds = 0.0  # time spent fingerprinting during the latest refresh
+
+    async def poll(self) -> set[str]:
+        """Return the tables whose revision moved since the previous refresh, without reloading anything.
+
+        Polling is not traced: a worker polls far more often than its inputs change, and a trace per idle poll
+        would drown the traces of actual cycles. Sources without revisions always report every table.
+        """
+        revisions = await self._ingestor.get_revisions()
+        if revisions is None or any(table not in revisions for table in TABLES):
+            return set(TABLES)
+        return {table for table in TABLES if revisions[table] != self._revisions.get(table)}
+
+    async def refresh(self, stale: Collection[str] | None = None) -> bool:
+        """Reload changed inputs, update ``delta`` and return whether anything changed since the previous call.
+
+        Args:
+            stale: Tables to reload, as returned by ``poll``. Defaults to polling first.
+        """
+        if stale is None:
+            with tracer.start_as_current_span("ingestion.revisions"):
+                stale = await self.poll()
+        if not stale:
+            self.delta = InputDelta()
+            self.hash_seconds = 0.0
+            return False
+
+        with tracer.start_as_current_span("ingestion.snapshot", attributes={"hospitopt.tables": sorted(stale)}):
+            snapshot = await self._ingestor.get_snapshot(stale)
+        if snapshot.revisions is None or any(table not in snapshot.revisions for table in TABLES):
+            self._revisions = {}
+        else:
+            # Only reloaded tables take the snapshot revision; others keep theirs so later writes are not missed.
+            self._revisions = {
+                table: snapshot.revisions[table] if table in stale else self._revisions[table] for table in TABLES
+            }
+
+        started = time.monotonic()
+        with tracer.start_as_current_span("ingestion.hash") as span:
+            deltas: dict[str, EntityDelta] = {}
+            for table in TABLES:
+                if table not in stale:
+                    continue
+                entities = self._store(table, snapshot)
+                current = {entity.id: fingerprint(entity, FINGERPRINT_FIELDS[table]) for entity in entities}
+                deltas[table] = diff_fingerprints(self._fingerprints[table], current)
+                self._fingerprints[table] = current
+                span.set_attribute(f"hospitopt.{table}", len(entities))
+                delta = deltas[table]
+                span.set_attribute(f"hospitopt.{table}.changed", len(delta.added | delta.removed | delta.changed))
+        self.delta = InputDelta(**deltas)
+        self.hash_seconds = time.monotonic() - started
+        return bool(self.delta)
+
+    def dump_state(self) -> dict[str, Any]:
+        """Return the latest inputs and their revisions as JSON-serializable state."""
+        return {
+            "revisions": self._revisions,
+            "hospitals": [hospital.model_dump(mode="json") for hospital in self.hospitals],
+            "patients": [patient.model_dump(mode="json") for patient in self.patients],
+            "ambulances": [ambulance.model_dump(mode="json") for ambulance in self.ambulances],
+        }
+
+    def load_state(self, state: dict[str, Any]) -> None:
+        """Restore inputs dumped by ``dump_state``, so the next refresh only reports changes made since."""
+        self._revisions = {table: tuple(revision) for table, revision in state["revisions"].items()}  # JSON lists
+        self.hospitals = [Hospital.model_validate(item) for item in state["hospitals"]]
+        self.patients = [Patient.model_validate(item) for item in state["patients"]]
+        self.ambulances = [Ambulance.model_validate(item) for item in state["ambulances"]]
+        # Fingerprints are derived from the restored inputs, so they are recomputed rather than persisted.
+        for table, entities in (
+            ("hospitals", self.hospitals),
+            ("patients", self.patients),
+            ("ambulances", self.ambulances),
+        ):
+            self._fingerprints[table] = {
+                entity.id: fingerprint(entity, FINGERPRINT_FIELDS[table]) for entity in entities
+            }
+
+    def _store(self, table: str, snapshot: InputSnapshot) -> Sequence[Entity]:
+        if table == "hospitals":
+            self.hospitals = snapshot.hospitals or []
+            return self.hospitals
+        if table == "patients":
+            self.patients = snapshot.patients or []
+            return self.patients
+        self.ambulances = snapshot.ambulances or []
+        return self.ambulances
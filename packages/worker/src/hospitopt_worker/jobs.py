@@ -0,0 +1,181 @@
+"""Postgres-backed optimization job queue shared by worker replicas."""
+
+import asyncio
+import os
+import socket
+from dataclasses import dataclass
+from datetime import timedelta
+from uuid import UUID, uuid4
+
+from sqlalchemy import and_, delete, exists, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import aliased
+
+from hospitopt_core.db.models import OptimizationJobDB
+from hospitopt_worker.db import SessionFactory
+
+GLOBAL_SCOPE = "global"  # all inputs when not sharded, inputs without an incident key when sharded
+INCIDENT_SCOPE_PREFIX = "incident:"
+
+
+@dataclass(frozen=True)
+class ClaimedJob:
+    """A job this worker holds the lease of."""
+
+    id: UUID
+    scope: str
+    attempts: int
+
+
+def incident_scope(incident: str | None) -> str:
+    """Return the job scope of an incident's inputs; inputs without an incident key use ``GLOBAL_SCOPE``."""
+    return GLOBAL_SCOPE if incident is None else f"{INCIDENT_SCOPE_PREFIX}{incident}"
+
+
+def scope_incident(scope: str) -> str | None:
+    """Return the incident of a job scope, the inverse of ``incident_scope``."""
+    return scope.removeprefix(INCIDENT_SCOPE_PREFIX) if scope.startswith(INCIDENT_SCOPE_PREFIX) else None
+
+
+def default_worker_id() -> str:
+    """Return an id unique to this worker process, used to fence results of jobs whose lease was lost."""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid4().hex[:8]}"
+
+
+class JobQueue:
+    """Optimization jobs claimed with ``FOR UPDATE SKIP LOCKED``, so several worker replicas can share the load.
+
+    Workers enqueue a job per scope, e.g. per incident, whose inputs changed. A scope has at most one pending job,
+    which coalesces bursts, and at most one running job, while jobs of different scopes are claimed and run in
+    parallel. A claimed job is leased; a worker that dies lets its lease expire and the job is claimed again by
+    another replica, until it has used up ``max_attempts`` and is marked failed. Finished jobs are deleted together
+    with their result, failed ones once they are older than the retention.
+    """
+
+    def __init__(
+        self,
+        session_factory: SessionFactory,
+        worker_id: str | None = None,
+        lease_seconds: float = 300.0,
+        max_attempts: int = 3,
+        retention_seconds: float = 86400.0,
+    ) -> None:
+        """Create a queue client.
+
+        Args:
+            session_factory: Sessions on the database holding ``optimization_jobs``.
+            worker_id: Id recorded on claimed jobs. Defaults to host name, process id and a random suffix.
+            lease_seconds: How long a claim holds without renewal. Defaults to 300.
+            max_attempts: Attempts after which a failing or crashing job is not retried. Defaults to 3.
+            retention_seconds: Age after which failed jobs are deleted. Defaults to 86400.
+        """
+        self._session_factory = session_factory
+        self.worker_id = worker_id or default_worker_id()
+        self.lease = timedelta(seconds=lease_seconds)
+        self.max_attempts = max_attempts
+        self.retention = timedelta(seconds=retention_seconds)
+        self._enqueued = asyncio.Event()
+
+    async def enqueue(self, scope: str = GLOBAL_SCOPE, attempts: int = 0) -> None:
+        """Request an optimization of a scope; a no-op when one is already pending."""
+        statement = (
+            insert(OptimizationJobDB)
+            .values(id=uuid4(), scope=scope, status="pending", requested_at=func.now(), attempts=attempts)
+            .on_conflict_do_nothing(index_elements=["scope"], index_where=OptimizationJobDB.status == "pending")
+        )
+        async with self._session_factory() as session:
+            await session.execute(statement)
+            await session.commit()
+        self._enqueued.set()
+
+    async def wait_for_jobs(self, timeout: float) -> None:
+        """Wait up to ``timeout`` seconds, returning early once this client has enqueued a job."""
+        try:
+            await asyncio.wait_for(self._enqueued.wait(), timeout)
+        except TimeoutError:
+            return
+        self._enqueued.clear()
+
+    async def claim(self) -> ClaimedJob | None:
+        """Claim the oldest job of any scope without a live running job; None when there is none.
+
+        Jobs whose lease expired are claimed again while they have attempts left, and marked failed otherwise.
+        """
+        job = OptimizationJobDB
+        exhausted = (
+            update(job)
+            .where(job.status == "running", job.lease_expires_at <= func.now(), job.attempts >= self.max_attempts)
+            .values(status="failed", error="Lease expired on the last attempt.", lease_expires_at=None)
+        )
+        running = aliased(OptimizationJobDB)
+        busy = exists().where(
+            running.scope == job.scope,
+            running.id != job.id,
+            running.status == "running",
+            running.lease_expires_at > func.now(),
+        )
+        query = (
+            select(job)
+            .where(
+                or_(
+                    job.status == "pending",
+                    and_(
+                        job.status == "running",
+                        job.lease_expires_at <= func.now(),
+                        job.attempts < self.max_attempts,
+                    ),
+                ),
+                ~busy,
+            )
+            .order_by(job.requested_at)
+            .limit(1)
+            .with_for_update(skip_locked=True, of=job)
+        )
+        async with self._session_factory() as session:
+            await session.execute(exhausted)
+            row = (await session.execute(query)).scalar_one_or_none()
+            if row is None:
+                await session.commit()
+                return None
+            row.status = "running"
+            row.claimed_by = self.worker_id
+            row.lease_expires_at = func.now() + self.lease
+            row.attempts += 1
+            claimed = ClaimedJob(id=row.id, scope=row.scope, attempts=row.attempts)
+            await session.commit()
+        return claimed
+
+    async def depth(self) -> int:
+        """Return the number of pending jobs over all scopes."""
+        query = select(func.count()).select_from(OptimizationJobDB).where(OptimizationJobDB.status == "pending")
+        async with self._session_factory() as session:
+            return int((await session.execute(query)).scalar_one())
+
+    async def renew(self, job: ClaimedJob) -> bool:
+        """Extend the lease of a job; returns False when another worker has taken it over."""
+        statement = (
+            update(OptimizationJobDB)
+            .where(OptimizationJobDB.id == job.id, OptimizationJobDB.claimed_by == self.worker_id)
+            .values(lease_expires_at=func.now() + self.lease)
+        )
+        async with self._session_factory() as session:
+            result = await session.execute(statement)
+            await session.commit()
+        return bool(result.rowcount)  # type: ignore[attr-defined]
+
+    async def fail(self, job: ClaimedJob, error: str) -> None:
+        """Record a failed attempt, delete failed jobs past the retention and, below ``max_attempts``, retry."""
+        statement = (
+            update(OptimizationJobDB)
+            .where(OptimizationJobDB.id == job.id, OptimizationJobDB.claimed_by == self.worker_id)
+            .values(status="failed", error=error, lease_expires_at=None)
+        )
+        expired = delete(OptimizationJobDB).where(
+            OptimizationJobDB.status == "failed", OptimizationJobDB.requested_at < func.now() - self.retention
+        )
+        async with self._session_factory() as session:
+            await session.execute(statement)
+            await session.execute(expired)
+            await session.commit()
+        if job.attempts < self.max_attempts:
+            await self.enqueue(job.scope, attempts=job.attempts)
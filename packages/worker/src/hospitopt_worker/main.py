@@ -1,22 +1,57 @@
 """Polling worker that runs optimization when inputs change."""
 
 import asyncio
-import hashlib
-import json
 import logging
-from collections.abc import Sequence
+import time
+from collections.abc import AsyncIterator, Callable, Coroutine, Mapping
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any
+from uuid import UUID
 
 from google.maps import routing_v2
+from opentelemetry import trace
+from prometheus_client import CollectorRegistry
 
 from hospitopt_core.config.env import Environment
-from hospitopt_core.domain.models import Ambulance, Hospital, Patient
+from hospitopt_core.domain.models import OptimizationResult, PatientAssignment
+from hospitopt_worker.cache import MatrixCache
+from hospitopt_worker.checkpoint import WorkerCheckpoint
 from hospitopt_worker.db import DatabaseWriter, check_connection
+from hospitopt_worker.estimate import TravelTimeEstimator
+from hospitopt_worker.grid import HospitalGridTable
 from hospitopt_worker.ingestion import APIIngestor, SQLAlchemyIngestor
-from hospitopt_worker.ingestion.base import DataIngestor
-from hospitopt_worker.optimize import optimize_allocation
+from hospitopt_worker.ingestion.base import TABLES, DataIngestor, InputSnapshot, Revision
+from hospitopt_worker.ingestion.tracking import InputDelta, InputTracker
+from hospitopt_worker.jobs import GLOBAL_SCOPE, ClaimedJob, JobQueue, incident_scope, scope_incident
+from hospitopt_worker.metrics import IncidentMetrics, WorkerMetrics
+from hospitopt_worker.optimize import PreparedAllocation, SolveStats, prepare_allocation, solve_allocation
+from hospitopt_worker.pipeline import Cycle, LatestSlot, run_stages
+from hospitopt_worker.providers import (
+    FakeRouteMatrixProvider,
+    OfflineRouteMatrixProvider,
+    RecordingProvider,
+    ReplayProvider,
+    RoadGraph,
+    RoutingClient,
+)
+from hospitopt_worker.routes import (
+    CircuitBreaker,
+    MatrixPrefetcher,
+    PrecisionTiers,
+    RequestHedger,
+    RoutedLegs,
+    RouteMatrixScheduler,
+    RoutingContext,
+    RoutingFallback,
+    refresh_hospital_grid,
+)
 from hospitopt_worker.settings import WorkerConfig
+from hospitopt_worker.triggers import ChangeListener, ChangeSubscription
+from hospitopt_worker.usage import ElementUsage, RoutingUsage, UsageKey
 
 logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
 
 env = Environment()
 if not env.WORKER_CONFIG_FILE_PATH:  # pragma: no cover
@@ -26,18 +61,792 @@ if not env.WORKER_CONFIG_FILE_PATH:  # pragma: no cover
 config = WorkerConfig.from_yaml(env.WORKER_CONFIG_FILE_PATH)
 
 
-def _hash_inputs(
-    hospitals: Sequence[Hospital],
-    patients: Sequence[Patient],
-    ambulances: Sequence[Ambulance],
-) -> str:
-    payload = {
-        "hospitals": [h.model_dump(mode="json") for h in sorted(hospitals, key=lambda h: str(h.id))],
-        "patients": [p.model_dump(mode="json") for p in sorted(patients, key=lambda p: str(p.id))],
-        "ambulances": [a.model_dump(mode="json") for a in sorted(ambulances, key=lambda a: str(a.id))],
+def _build_routing_client() -> RoutingClient:
+    """Create the travel-time client selected in the routing configuration."""
+    client = _build_provider()
+    if config.routing.record_path is not None:
+        logger.info("Recording route matrices to %s.", config.routing.record_path)
+        return RecordingProvider(client, config.routing.record_path)
+    return client
+
+
+def _build_provider() -> RoutingClient:
+    provider = config.routing.provider
+    if provider.type == "replay":
+        return ReplayProvider(provider.path, latency_seconds=provider.latency_seconds)
+    if provider.type == "fake":
+        return FakeRouteMatrixProvider(
+            speed_kph=provider.speed_kph,
+            circuity=provider.circuity,
+            max_elements=provider.max_elements,
+            latency_seconds=provider.latency_seconds,
+            element_latency_seconds=provider.element_latency_seconds,
+            jitter_seconds=provider.jitter_seconds,
+            quota_error_rate=provider.quota_error_rate,
+            stream_error_rate=provider.stream_error_rate,
+            element_error_rate=provider.element_error_rate,
+            seed=provider.seed,
+        )
+    if provider.type == "offline":
+        graph = RoadGraph.load(provider.graph_path, default_speed_kph=provider.default_speed_kph)
+        logger.info("Loaded offline road graph with %s nodes from %s.", len(graph.coords), provider.graph_path)
+        return OfflineRouteMatrixProvider(
+            graph,
+            access_speed_kph=provider.access_speed_kph,
+            max_snap_distance_meters=provider.max_snap_distance_meters,
+        )
+    if provider.type == "google":
+        if config.google_maps_api_key is None:
+            raise ValueError("google_maps_api_key must be set when using the google routing provider.")
+        return routing_v2.RoutesAsyncClient(client_options={"api_key": config.google_maps_api_key.get_secret_value()})
+    raise ValueError(f"Unsupported routing provider: {provider.type}")
+
+
+def _build_scheduler() -> RouteMatrixScheduler | None:
+    """Create the route matrix scheduler, shared by all shards so they respect one provider quota."""
+    if not config.routing.scheduler.enabled:
+        return None
+    scheduler_config = config.routing.scheduler
+    hedging_config = scheduler_config.hedging
+    return RouteMatrixScheduler(
+        requests_per_minute=scheduler_config.requests_per_minute,
+        elements_per_minute=scheduler_config.elements_per_minute,
+        min_concurrency=scheduler_config.min_concurrency,
+        max_concurrency=scheduler_config.max_concurrency,
+        latency_target_seconds=scheduler_config.latency_target_seconds,
+        max_retries=scheduler_config.max_retries,
+        backoff_base_seconds=scheduler_config.backoff_base_seconds,
+        backoff_max_seconds=scheduler_config.backoff_max_seconds,
+        hedger=(
+            RequestHedger(
+                percentile=hedging_config.percentile,
+                min_samples=hedging_config.min_samples,
+                window=hedging_config.window,
+                max_hedge_fraction=hedging_config.max_hedge_fraction,
+                min_delay_seconds=hedging_config.min_delay_seconds,
+            )
+            if hedging_config.enabled
+            else None
+        ),
+    )
+
+
+def _build_routing_context(scheduler: RouteMatrixScheduler | None) -> RoutingContext:
+    """Create the long-lived routing state selected in the routing configuration."""
+    grid_table: HospitalGridTable | None = None
+    if config.routing.grid_table.enabled:
+        grid_table = HospitalGridTable(
+            resolution_degrees=config.routing.grid_table.resolution_degrees,
+            bucket_minutes=config.routing.grid_table.bucket_minutes,
+            max_age_seconds=config.routing.grid_table.max_age_seconds,
+            bounds=config.routing.grid_table.bounds,
+        )
+    estimator_config = config.routing.estimator
+    estimator = TravelTimeEstimator(
+        speed_kph=estimator_config.prior_speed_kph,
+        region_degrees=estimator_config.region_degrees,
+        bucket_minutes=estimator_config.bucket_minutes,
+        min_observations=estimator_config.min_observations,
+        decay=estimator_config.decay,
+        error_window=estimator_config.error_window,
+    )
+    fallback: RoutingFallback | None = None
+    if config.routing.fallback.enabled:
+        fallback_config = config.routing.fallback
+        fallback = RoutingFallback(
+            estimator,
+            deadline_seconds=fallback_config.deadline_seconds,
+            breaker=CircuitBreaker(
+                failure_threshold=fallback_config.failure_threshold,
+                reset_timeout_seconds=fallback_config.reset_timeout_seconds,
+            ),
+        )
+    matrix_cache: MatrixCache | None = None
+    if config.routing.prefetch.enabled:
+        matrix_cache = MatrixCache(
+            bucket_minutes=config.routing.prefetch.bucket_minutes,
+            max_age_seconds=config.routing.prefetch.max_age_seconds,
+            max_entries=config.routing.prefetch.max_entries,
+        )
+    precision_tiers: PrecisionTiers | None = None
+    if config.routing.precision_tiers.enabled:
+        precision_tiers = PrecisionTiers(
+            first_pass=config.routing.precision_tiers.first_pass,
+            band_minutes=config.routing.precision_tiers.band_minutes,
+            band_fraction=config.routing.precision_tiers.band_fraction,
+        )
+    return RoutingContext(
+        grid_table=grid_table,
+        scheduler=scheduler,
+        fallback=fallback,
+        estimator=estimator,
+        matrix_cache=matrix_cache,
+        precision_tiers=precision_tiers,
+        routed_legs=(
+            RoutedLegs(max_age_seconds=config.routing.reuse_max_age_seconds)
+            if config.routing.reuse_max_age_seconds
+            else None
+        ),
+    )
+
+
+def _build_prefetcher(matrix_cache: MatrixCache) -> MatrixPrefetcher:
+    """Create the background prefetcher with its own routing budget."""
+    prefetch_config = config.routing.prefetch
+    return MatrixPrefetcher(
+        matrix_cache,
+        scheduler=RouteMatrixScheduler(
+            requests_per_minute=prefetch_config.requests_per_minute,
+            elements_per_minute=prefetch_config.elements_per_minute,
+            max_concurrency=prefetch_config.max_concurrency,
+            max_retries=0,
+        ),
+        max_elements_per_run=prefetch_config.max_elements_per_run,
+        lead_minutes=prefetch_config.lead_minutes,
+    )
+
+
+def _log_routing_usage(counters: dict[UsageKey, ElementUsage]) -> None:
+    """Log the route matrix usage of a cycle, per matrix type and routing preference."""
+    for (matrix, preference), counter in counters.items():
+        logger.info(
+            "Routing usage %s/%s: requests=%s failed_requests=%s requested=%s skipped=%s cached=%s billed=%s "
+            "failed=%s unroutable=%s",
+            matrix,
+            preference,
+            counter.requests,
+            counter.failed_requests,
+            counter.requested,
+            counter.skipped,
+            counter.cached,
+            counter.billed,
+            counter.failed,
+            counter.unroutable,
+        )
+    total = RoutingUsage.total(counters)
+    logger.info(
+        "Routing cycle billed %s elements in %s requests; %s elements cached, %s skipped.",
+        total.billed,
+        total.requests,
+        total.cached,
+        total.skipped,
+    )
+
+
+async def _refresh_grid_forever(
+    routes_client: RoutingClient,
+    grid_table: HospitalGridTable,
+    scheduler: RouteMatrixScheduler | None,
+    metrics: IncidentMetrics,
+) -> None:
+    """Keep the grid-to-hospital table warm for the current time-of-day bucket."""
+    grid_config = config.routing.grid_table
+    usage = RoutingUsage()  # apart from the usage of cycles
+    while True:
+        try:
+            refreshed = await refresh_hospital_grid(
+                routes_client,
+                grid_table,
+                max_cells=grid_config.max_cells_per_refresh,
+                scheduler=scheduler,
+                usage=usage.counter("grid"),
+            )
+            if refreshed:
+                logger.debug("Refreshed %s grid table cells.", refreshed)
+        except Exception:
+            logger.exception("Grid table refresh failed.")
+        metrics.record_routing(usage.take())
+        await asyncio.sleep(grid_config.refresh_interval_seconds)
+
+
+async def _prefetch_forever(
+    routes_client: RoutingClient,
+    prefetcher: MatrixPrefetcher,
+    routing_context: RoutingContext,
+    metrics: IncidentMetrics,
+) -> None:
+    """Keep cached route matrices warm for the latest inputs, ahead of departure-time buckets."""
+    while True:
+        try:
+            routed = await prefetcher.run_once(routes_client, routing_context)
+            if routed:
+                logger.debug("Prefetched %s route matrix elements.", routed)
+        except Exception:
+            logger.exception("Route matrix prefetch failed.")
+        metrics.record_routing(prefetcher.usage.take())
+        await asyncio.sleep(config.routing.prefetch.interval_seconds)
+
+
+async def _wait_for_next_cycle(routing_context: RoutingContext, listener: ChangeSubscription | None) -> bool:
+    """Wait for input changes or the poll interval; return True when late live travel times warrant a re-solve."""
+    if listener is None:
+        if routing_context.fallback is None:
+            await asyncio.sleep(config.poll_interval_seconds)
+            return False
+        return await routing_context.fallback.wait_for_refresh(config.poll_interval_seconds)
+
+    timeout = config.trigger.safety_poll_interval_seconds
+    changes = asyncio.ensure_future(listener.wait(timeout))
+    waiters: set[asyncio.Future[Any]] = {changes}
+    if routing_context.fallback is not None:
+        waiters.add(asyncio.ensure_future(routing_context.fallback.wait_for_refresh(timeout)))
+    done, pending = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+    for waiter in pending:
+        waiter.cancel()
+    if changes in done and changes.result():
+        logger.debug("Input changes notified for %s.", ", ".join(sorted(changes.result())))
+    return any(waiter is not changes and waiter.result() is True for waiter in done)
+
+
+async def _ingest_stage(
+    inputs: InputTracker,
+    snapshots: LatestSlot[tuple[Cycle, InputSnapshot, InputDelta]],
+    prefetcher: MatrixPrefetcher | None,
+    routing_context: RoutingContext,
+    listener: ChangeSubscription | None,
+    metrics: IncidentMetrics,
+) -> None:
+    """Detect input changes and hand the latest complete snapshot, with the cycle it starts, to routing."""
+    resolve = False
+    unrouted = InputDelta()  # changes since the snapshot last handed to routing
+    while True:
+        started, polled = time.monotonic(), time.time_ns()
+        stale = await inputs.poll()
+        if not stale and not resolve:
+            cycle = None  # idle polls far outnumber changes, so they start no trace and record no ingest duration
+        else:
+            attributes = {"hospitopt.incident": metrics.incident}
+            cycle = Cycle(tracer.start_span("worker.cycle", attributes=attributes, start_time=polled), started)
+            with trace.use_span(cycle.span):
+                changed = await inputs.refresh(stale)
+            metrics.observe("ingest", time.monotonic() - started)
+        if cycle is None:
+            logger.debug("No input changes detected, skipping optimization.")
+            metrics.skipped("unchanged")
+        else:
+            if inputs.hash_seconds:
+                metrics.observe("hash", inputs.hash_seconds)
+            unrouted = unrouted.then(inputs.delta)
+            hospitals, patients, ambulances = inputs.hospitals, inputs.patients, inputs.ambulances
+            if changed:
+                logger.info(
+                    "Input changes: %s",
+                    ", ".join(
+                        f"{table} +{len(delta.added)} -{len(delta.removed)} ~{len(delta.changed)}"
+                        for table, delta in (
+                            ("hospitals", inputs.delta.hospitals),
+                            ("patients", inputs.delta.patients),
+                            ("ambulances", inputs.delta.ambulances),
+                        )
+                    ),
+                )
+            if changed and prefetcher is not None:
+                prefetcher.update(hospitals, patients, ambulances)
+
+            if changed or resolve:
+                resolve = False
+                if not hospitals or not patients or not ambulances:
+                    logger.info("Skipping optimization due to missing inputs.")
+                    _skip_cycle(cycle, "missing_inputs", metrics)
+                else:
+                    snapshot = InputSnapshot(hospitals=hospitals, patients=patients, ambulances=ambulances)
+                    if (superseded := snapshots.put((cycle, snapshot, unrouted))) is not None:
+                        _skip_cycle(superseded[0], "superseded", metrics)
+                    unrouted = InputDelta()
+            else:
+                logger.debug("No input changes detected, skipping optimization.")
+                _skip_cycle(cycle, "unchanged", metrics)
+
+        if await _wait_for_next_cycle(routing_context, listener):
+            logger.info("Re-solving with live travel times.")
+            resolve = True
+
+
+async def _route_stage(
+    routes_client: RoutingClient,
+    snapshots: LatestSlot[tuple[Cycle, InputSnapshot, InputDelta]],
+    allocations: LatestSlot[tuple[Cycle, PreparedAllocation]],
+    routing_context: RoutingContext,
+    previous_assignments: dict[UUID, PatientAssignment],
+    metrics: IncidentMetrics,
+) -> None:
+    """Route the freshest snapshot while the previous one is still being solved."""
+    while True:
+        cycle, snapshot, delta = await snapshots.get()
+        with trace.use_span(cycle.span), metrics.time("route"):
+            prepared = await prepare_allocation(
+                routes_client=routes_client,
+                hospitals=snapshot.hospitals or [],
+                patients=snapshot.patients or [],
+                ambulances=snapshot.ambulances or [],
+                snap_resolution_degrees=config.routing.snap_resolution_degrees,
+                routing_context=routing_context,
+                previous_assignments=previous_assignments,
+                reenter_committed=config.optimization.reenter_committed_ambulances,
+                delta=delta,
+            )
+        if (superseded := allocations.put((cycle, prepared))) is not None:
+            _skip_cycle(superseded[0], "superseded", metrics)
+            metrics.record_routing(superseded[1].usage.take())  # routed and billed all the same
+
+
+async def _solve_stage(
+    writer: DatabaseWriter,
+    allocations: LatestSlot[tuple[Cycle, PreparedAllocation]],
+    routing_context: RoutingContext,
+    previous_assignments: dict[UUID, PatientAssignment],
+    metrics: IncidentMetrics,
+) -> None:
+    """Solve and write the freshest prepared allocation; allocations superseded meanwhile are dropped."""
+    while True:
+        cycle, prepared = await allocations.get()
+        stats = SolveStats()
+        with trace.use_span(cycle.span, end_on_exit=True):
+            result = await asyncio.to_thread(
+                solve_allocation, prepared, stats
+            )  # keep routing the next snapshot meanwhile
+            with metrics.time("write"):
+                await writer.write_optimization_result(result)
+            _record_cycle(cycle, prepared, result, stats, metrics)
+        usage = prepared.usage.take()
+        metrics.record_routing(usage)
+        previous_assignments.clear()
+        previous_assignments.update((assignment.patient_id, assignment) for assignment in result.assignments)
+        _log_cycle(result, routing_context, usage)
+        if allocations.dropped:
+            logger.info("Coalesced %s stale snapshots so far.", allocations.dropped)
+
+
+def _skip_cycle(cycle: Cycle, reason: str, metrics: IncidentMetrics) -> None:
+    """End a cycle that does not reach the solver."""
+    metrics.skipped(reason)
+    cycle.span.set_attribute("hospitopt.skipped", reason)
+    cycle.span.end()
+
+
+def _record_cycle(
+    cycle: Cycle,
+    prepared: PreparedAllocation,
+    result: OptimizationResult,
+    stats: SolveStats,
+    metrics: IncidentMetrics,
+) -> None:
+    """Record the model size and outcome of a solved cycle as metrics and on its trace."""
+    metrics.record_solve(prepared, result, stats)
+    metrics.observe_cycle(time.monotonic() - cycle.started)
+    cycle.span.set_attributes(
+        {
+            "hospitopt.patients": len(prepared.incident.patients),
+            "hospitopt.ambulances": len(prepared.incident.ambulances),
+            "hospitopt.hospitals": len(prepared.incident.hospitals),
+            "hospitopt.feasible_triples": len(prepared.feasible),
+            "hospitopt.unassigned": len(result.unassigned_patient_ids),
+            "hospitopt.termination": stats.termination,
+        }
+    )
+
+
+def _log_cycle(
+    result: OptimizationResult,
+    routing_context: RoutingContext,
+    usage: dict[UsageKey, ElementUsage] | None = None,
+) -> None:
+    """Log the outcome of an optimization cycle and the routing statistics gathered during it."""
+    logger.info(
+        "Optimization complete. max_lives_saved=%s unassigned=%s estimated=%s",
+        result.max_lives_saved,
+        len(result.unassigned_patient_ids),
+        result.estimated,
+    )
+    if routing_context.estimator is not None:
+        errors = routing_context.estimator.error_summary()
+        if errors.count:
+            logger.info(
+                "Travel-time estimator error over %s routes: bias=%.1f mae=%.1f p90=%.1f p95=%.1f mape=%.0f%%",
+                errors.count,
+                errors.mean_error_minutes,
+                errors.mean_absolute_error_minutes,
+                errors.p90_absolute_error_minutes,
+                errors.p95_absolute_error_minutes,
+                errors.mean_absolute_percentage_error * 100,
+            )
+    if usage:
+        _log_routing_usage(usage)
+    hedger = routing_context.scheduler.hedger if routing_context.scheduler is not None else None
+    if hedger is not None:
+        logger.info(
+            "Route matrix hedging: requests=%s hedged=%s hedge_wins=%s hedge_rate=%.3f",
+            hedger.requests,
+            hedger.hedged,
+            hedger.hedge_wins,
+            hedger.hedge_rate,
+        )
+
+
+@dataclass
+class _PipelineState:
+    """Long-lived state of the optimization loop of one set of inputs."""
+
+    inputs: InputTracker
+    routing_context: RoutingContext
+    metrics: IncidentMetrics
+    prefetcher: MatrixPrefetcher | None
+    # Latest assignments, carried over for ambulances that have since been committed to their patient.
+    previous_assignments: dict[UUID, PatientAssignment] = field(default_factory=dict)
+    unrouted: InputDelta = field(default_factory=InputDelta)  # changes since the inputs were last routed
+
+
+@asynccontextmanager
+async def _pipeline_state(
+    ingestor: DataIngestor,
+    routes_client: RoutingClient,
+    routing_context: RoutingContext,
+    metrics: IncidentMetrics,
+    checkpoint: WorkerCheckpoint | None = None,
+) -> AsyncIterator[_PipelineState]:
+    """Start the background routing tasks of one set of inputs and restore its checkpoint, saved again on exit."""
+    background: list[asyncio.Task[None]] = []
+    if routing_context.grid_table is not None:
+        background.append(
+            asyncio.create_task(
+                _refresh_grid_forever(routes_client, routing_context.grid_table, routing_context.scheduler, metrics)
+            )
+        )
+    prefetcher: MatrixPrefetcher | None = None
+    if routing_context.matrix_cache is not None:
+        prefetcher = _build_prefetcher(routing_context.matrix_cache)
+        background.append(asyncio.create_task(_prefetch_forever(routes_client, prefetcher, routing_context, metrics)))
+
+    state = _PipelineState(InputTracker(ingestor), routing_context, metrics, prefetcher)
+    checkpointing: asyncio.Task[None] | None = None
+    try:
+        if checkpoint is not None:
+            restored = await asyncio.to_thread(
+                checkpoint.restore, state.inputs, state.previous_assignments, routing_context
+            )
+            if restored and prefetcher is not None:
+                prefetcher.update(state.inputs.hospitals, state.inputs.patients, state.inputs.ambulances)
+            checkpointing = asyncio.create_task(
+                _checkpoint_forever(checkpoint, state.inputs, state.previous_assignments, routing_context)
+            )
+        yield state
+    finally:
+        for task in background:
+            task.cancel()
+        if checkpoint is not None and checkpointing is not None:
+            checkpointing.cancel()
+            await asyncio.to_thread(
+                checkpoint.save, checkpoint.collect(state.inputs, state.previous_assignments, routing_context)
+            )
+
+
+async def _run_job(
+    queue: JobQueue,
+    job: ClaimedJob,
+    state: _PipelineState,
+    routes_client: RoutingClient,
+    writer: DatabaseWriter,
+) -> None:
+    """Refresh, route, solve and write one claimed job under a renewed lease; a failure is recorded on the job."""
+    inputs, routing_context, metrics = state.inputs, state.routing_context, state.metrics
+    attributes: dict[str, str | int] = {
+        "hospitopt.incident": metrics.incident,
+        "hospitopt.job_id": str(job.id),
+        "hospitopt.attempt": job.attempts,
     }
-    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
-    return hashlib.sha256(encoded).hexdigest()
+    cycle = Cycle(tracer.start_span("worker.cycle", attributes=attributes))
+    renewal = asyncio.create_task(_renew_lease_forever(queue, job))
+    try:
+        with trace.use_span(cycle.span, end_on_exit=True):
+            with metrics.time("ingest"):
+                changed = await inputs.refresh()
+            if inputs.hash_seconds:
+                metrics.observe("hash", inputs.hash_seconds)
+            state.unrouted = state.unrouted.then(inputs.delta)
+            hospitals, patients, ambulances = inputs.hospitals, inputs.patients, inputs.ambulances
+            if changed and state.prefetcher is not None:
+                state.prefetcher.update(hospitals, patients, ambulances)
+            prepared: PreparedAllocation | None = None
+            stats = SolveStats()
+            usage: dict[UsageKey, ElementUsage] = {}
+            if not hospitals or not patients or not ambulances:
+                logger.info("Skipping optimization due to missing inputs.")
+                metrics.skipped("missing_inputs")
+                cycle.span.set_attribute("hospitopt.skipped", "missing_inputs")
+                result = OptimizationResult(max_lives_saved=0, assignments=[], unassigned_patient_ids=[])
+            else:
+                with metrics.time("route"):
+                    prepared = await prepare_allocation(
+                        routes_client=routes_client,
+                        hospitals=hospitals,
+                        patients=patients,
+                        ambulances=ambulances,
+                        snap_resolution_degrees=config.routing.snap_resolution_degrees,
+                        routing_context=routing_context,
+                        previous_assignments=state.previous_assignments,
+                        reenter_committed=config.optimization.reenter_committed_ambulances,
+                        delta=state.unrouted,
+                    )
+                state.unrouted = InputDelta()
+                result = await asyncio.to_thread(solve_allocation, prepared, stats)
+                usage = prepared.usage.take()
+                metrics.record_routing(usage)
+            with metrics.time("write"):
+                written = await writer.write_job_result(result, job.id, queue.worker_id)
+            if not written:
+                logger.warning("Lost the lease of optimization job %s, discarding its result.", job.id)
+                return
+            if prepared is not None:
+                _record_cycle(cycle, prepared, result, stats, metrics)
+        if result.assignments:
+            state.previous_assignments.clear()
+            state.previous_assignments.update((assignment.patient_id, assignment) for assignment in result.assignments)
+            _log_cycle(result, routing_context, usage)
+    except Exception as exc:
+        logger.exception("Optimization job %s failed (attempt %s).", job.id, job.attempts)
+        await queue.fail(job, repr(exc))
+    finally:
+        renewal.cancel()
+
+
+async def _run_job_queue(
+    queue: JobQueue,
+    ingestor: DataIngestor,
+    routes_client: RoutingClient,
+    writer: DatabaseWriter,
+    scheduler: RouteMatrixScheduler | None,
+    metrics: WorkerMetrics,
+) -> None:
+    """Claim optimization jobs of any scope and run up to ``queue.concurrency`` of them at once.
+
+    Each scope keeps its own inputs, routing state and checkpoint in this worker, set up when its first job is
+    claimed, so jobs of different incidents run side by side while replicas split the pending jobs between them.
+    """
+    sharded = config.sharding.enabled
+    states: dict[str, _PipelineState] = {}
+    queue_metrics = metrics.for_incident()
+    async with AsyncExitStack() as stack:
+
+        async def _state(scope: str) -> _PipelineState:
+            if scope not in states:
+                incident = scope_incident(scope)
+                routing_context = _build_routing_context(scheduler)
+                states[scope] = await stack.enter_async_context(
+                    _pipeline_state(
+                        ingestor.for_incident(incident) if sharded else ingestor,
+                        routes_client,
+                        routing_context,
+                        metrics.for_incident(incident),
+                        _build_checkpoint(incident, sharded),
+                    )
+                )
+                if routing_context.fallback is not None:
+                    resolves = asyncio.create_task(_enqueue_resolves_forever(queue, scope, routing_context.fallback))
+                    stack.callback(resolves.cancel)
+            return states[scope]
+
+        async def _slot() -> None:
+            while True:
+                job = await queue.claim()
+                queue_metrics.set_queue_depth("jobs", await queue.depth())
+                if job is None:
+                    await queue.wait_for_jobs(config.poll_interval_seconds)
+                    continue
+                await _run_job(queue, job, await _state(job.scope), routes_client, writer)
+
+        await run_stages(*(_slot() for _ in range(config.queue.concurrency)))
+
+
+async def _enqueue_changes_forever(
+    queue: JobQueue, ingestor: DataIngestor, scope: str, listener: ChangeSubscription | None
+) -> None:
+    """Enqueue a job of a scope whenever its inputs change.
+
+    Every replica watches every scope and their jobs coalesce into the one pending job of the scope. Sources with
+    revisions are only asked for them; others are reloaded and compared entity by entity.
+    """
+    inputs = InputTracker(ingestor)  # only used by sources without revisions
+    seen: Mapping[str, Revision] | None = None
+    while True:
+        revisions = await ingestor.get_revisions()
+        if revisions is None:
+            changed = await inputs.refresh(TABLES)
+        else:
+            changed, seen = revisions != seen, revisions
+        if changed:
+            logger.debug("Input changes detected, enqueueing an optimization of %s.", scope)
+            await queue.enqueue(scope)
+        if listener is None:
+            await asyncio.sleep(config.poll_interval_seconds)
+        else:
+            await listener.wait(config.trigger.safety_poll_interval_seconds)
+
+
+async def _enqueue_resolves_forever(queue: JobQueue, scope: str, fallback: RoutingFallback) -> None:
+    """Enqueue a re-solve of a scope whenever late live travel times arrive for it."""
+    while True:
+        if await fallback.wait_for_refresh(config.poll_interval_seconds):
+            logger.info("Re-solving %s with live travel times.", scope)
+            await queue.enqueue(scope)
+
+
+async def _watch_incident(
+    queue: JobQueue, ingestor: DataIngestor, incident: str | None, listener: ChangeListener | None
+) -> None:
+    """Enqueue jobs of one incident of a sharded worker whenever its inputs change."""
+    subscription = listener.for_incident(incident) if listener is not None else None
+    try:
+        await _enqueue_changes_forever(queue, ingestor.for_incident(incident), incident_scope(incident), subscription)
+    finally:
+        if subscription is not None:
+            await subscription.close()
+
+
+async def _renew_lease_forever(queue: JobQueue, job: ClaimedJob) -> None:
+    """Renew the lease of a running job at a third of its duration."""
+    while True:
+        await asyncio.sleep(queue.lease.total_seconds() / 3)
+        if not await queue.renew(job):
+            logger.warning("Optimization job %s was taken over by another worker.", job.id)
+            return
+
+
+def _build_listener() -> ChangeListener | None:
+    """Create the change listener of notify mode, to be started by the caller."""
+    if config.trigger.mode != "notify":
+        return None
+    if config.ingestion.type != "db":
+        raise ValueError("trigger.mode notify requires db ingestion.")
+    return ChangeListener(
+        config.ingestion.connection_string(scheme="postgresql"),
+        channel=config.trigger.channel,
+        debounce_seconds=config.trigger.debounce_seconds,
+        max_delay_seconds=config.trigger.max_delay_seconds,
+    )
+
+
+async def _run_pipeline(
+    ingestor: DataIngestor,
+    routes_client: RoutingClient,
+    writer: DatabaseWriter,
+    routing_context: RoutingContext,
+    listener: ChangeSubscription | None,
+    metrics: IncidentMetrics,
+    checkpoint: WorkerCheckpoint | None = None,
+) -> None:
+    """Run the optimization loop of one set of inputs, with its background routing tasks."""
+    # A snapshot dropped before routing hands its changes on, so carried travel times never skip one.
+    snapshots: LatestSlot[tuple[Cycle, InputSnapshot, InputDelta]] = LatestSlot(
+        lambda dropped, item: (item[0], item[1], dropped[2].then(item[2]))
+    )
+    allocations: LatestSlot[tuple[Cycle, PreparedAllocation]] = LatestSlot()
+    async with _pipeline_state(ingestor, routes_client, routing_context, metrics, checkpoint) as state:
+        metrics.watch_queue_depth("snapshots", snapshots.__len__)
+        metrics.watch_queue_depth("allocations", allocations.__len__)
+        await run_stages(
+            _ingest_stage(state.inputs, snapshots, state.prefetcher, routing_context, listener, metrics),
+            _route_stage(routes_client, snapshots, allocations, routing_context, state.previous_assignments, metrics),
+            _solve_stage(writer, allocations, routing_context, state.previous_assignments, metrics),
+        )
+
+
+async def _checkpoint_forever(
+    checkpoint: WorkerCheckpoint,
+    inputs: InputTracker,
+    previous_assignments: dict[UUID, PatientAssignment],
+    routing_context: RoutingContext,
+) -> None:
+    """Save the worker state periodically; the state is captured on the loop and written from a thread."""
+    while True:
+        await asyncio.sleep(config.checkpoint.interval_seconds)
+        try:
+            state = checkpoint.collect(inputs, previous_assignments, routing_context)
+            await asyncio.to_thread(checkpoint.save, state)
+        except Exception:
+            logger.exception("Saving the worker checkpoint failed.")
+
+
+def _build_checkpoint(incident: str | None = None, sharded: bool = False) -> WorkerCheckpoint | None:
+    """Create the checkpoint of the whole worker or, when sharded, of one incident."""
+    if not config.checkpoint.enabled:
+        return None
+    path = config.checkpoint.path
+    if sharded:
+        name, dot, suffixes = path.name.partition(".")
+        path = path.with_name(f"{name}-{incident or 'default'}{dot}{suffixes}")
+    return WorkerCheckpoint(path)
+
+
+async def _run_shard(
+    incident: str | None,
+    ingestor: DataIngestor,
+    routes_client: RoutingClient,
+    writer: DatabaseWriter,
+    scheduler: RouteMatrixScheduler | None,
+    metrics: WorkerMetrics,
+    listener: ChangeListener | None,
+) -> None:
+    """Optimize the inputs of one incident independently, with its own change detection and caches."""
+    logger.info("Starting shard for incident %s.", incident)
+    subscription = listener.for_incident(incident) if listener is not None else None
+    shard_metrics = metrics.for_incident(incident)
+    try:
+        await _run_pipeline(
+            ingestor.for_incident(incident),
+            routes_client,
+            writer,
+            _build_routing_context(scheduler),
+            subscription,
+            shard_metrics,
+            checkpoint=_build_checkpoint(incident, sharded=True),
+        )
+    finally:
+        shard_metrics.clear()
+        if subscription is not None:
+            await subscription.close()
+        logger.info("Stopped shard for incident %s.", incident)
+
+
+async def _run_shards(
+    ingestor: DataIngestor,
+    run_shard: Callable[[str | None, ChangeListener | None], Coroutine[Any, Any, None]],
+) -> None:
+    """Keep one shard running per incident, starting and stopping shards as incidents come and go.
+
+    Shards share one change listener, whose notifications carry the incident of the changed rows, so a write to
+    one incident only wakes up its own shard.
+
+    Args:
+        ingestor: Source of the inputs, listing the incidents unless ``sharding.incidents`` is set.
+        run_shard: Runs the shard of an incident, e.g. its optimization loop or, with the queue, its job enqueuer.
+    """
+    shards: dict[str | None, asyncio.Task[None]] = {}
+    listener = _build_listener()
+    try:
+        if listener is not None:
+            await listener.start()
+        while True:
+            incidents: set[str | None] | None
+            if config.sharding.incidents is not None:
+                incidents = set(config.sharding.incidents)
+            else:
+                incidents = await ingestor.get_incidents()
+                if incidents is None:
+                    raise ValueError("The ingestion source cannot list incidents, set sharding.incidents.")
+            for incident in incidents - shards.keys():
+                shards[incident] = asyncio.create_task(run_shard(incident, listener))
+            for incident in shards.keys() - incidents:
+                shards.pop(incident).cancel()
+            for task in shards.values():
+                if task.done():
+                    task.result()  # a failing shard stops the worker, like the single loop does
+            await asyncio.sleep(config.sharding.discovery_interval_seconds)
+    finally:
+        for task in shards.values():
+            task.cancel()
+        await asyncio.gather(*shards.values(), return_exceptions=True)
+        if listener is not None:
+            await listener.close()
 
 
 async def run_worker() -> None:
@@ -56,41 +865,62 @@ async def run_worker() -> None:
     await check_connection(worker_sessions)
 
     writer = DatabaseWriter(worker_sessions)
+    routes_client = _build_routing_client()
+    scheduler = _build_scheduler()
+    if config.metrics.enabled:
+        metrics = WorkerMetrics()
+        metrics.serve(config.metrics.port, config.metrics.host)
+        logger.info("Serving metrics on %s:%s.", config.metrics.host, config.metrics.port)
+    else:
+        metrics = WorkerMetrics(CollectorRegistry())  # recorded but never served
+    if scheduler is not None and scheduler.hedger is not None:
+        metrics.watch_hedger(scheduler.hedger)
 
-    routes_client = routing_v2.RoutesAsyncClient(
-        client_options={"api_key": config.google_maps_api_key.get_secret_value()}
-    )
-
-    last_hash: str | None = None
+    listener: ChangeListener | None = None
     try:
-        while True:
-            hospitals = await ingestor.get_hospitals()
-            patients = await ingestor.get_patients()
-            ambulances = await ingestor.get_ambulances()
-
-            current_hash = _hash_inputs(hospitals, patients, ambulances)
-            if current_hash != last_hash:
-                if not hospitals or not patients or not ambulances:
-                    logger.info("Skipping optimization due to missing inputs.")
-                else:
-                    result = await optimize_allocation(
-                        routes_client=routes_client,
-                        hospitals=hospitals,
-                        patients=patients,
-                        ambulances=ambulances,
-                    )
-                    await writer.write_optimization_result(result)
-                    logger.info(
-                        "Optimization complete. max_lives_saved=%s unassigned=%s",
-                        result.max_lives_saved,
-                        len(result.unassigned_patient_ids),
-                    )
-                last_hash = current_hash
+        if config.queue.enabled:
+            queue = JobQueue(
+                worker_sessions,
+                lease_seconds=config.queue.lease_seconds,
+                max_attempts=config.queue.max_attempts,
+                retention_seconds=config.queue.retention_seconds,
+            )
+            logger.info("Claiming optimization jobs as worker %s.", queue.worker_id)
+            watch: Coroutine[Any, Any, None]
+            if config.sharding.enabled:
+                watch = _run_shards(
+                    ingestor,
+                    lambda incident, shard_listener: _watch_incident(queue, ingestor, incident, shard_listener),
+                )
             else:
-                logger.debug("No input changes detected, skipping optimization.")
-
-            await asyncio.sleep(config.poll_interval_seconds)
+                listener = _build_listener()
+                if listener is not None:
+                    await listener.start()
+                watch = _enqueue_changes_forever(queue, ingestor, GLOBAL_SCOPE, listener)
+            await run_stages(watch, _run_job_queue(queue, ingestor, routes_client, writer, scheduler, metrics))
+        elif config.sharding.enabled:
+            await _run_shards(
+                ingestor,
+                lambda incident, shard_listener: _run_shard(
+                    incident, ingestor, routes_client, writer, scheduler, metrics, shard_listener
+                ),
+            )
+        else:
+            listener = _build_listener()
+            if listener is not None:
+                await listener.start()
+            await _run_pipeline(
+                ingestor,
+                routes_client,
+                writer,
+                _build_routing_context(scheduler),
+                listener,
+                metrics.for_incident(),
+                checkpoint=_build_checkpoint(),
+            )
     finally:
+        if listener is not None:
+            await listener.close()
         await ingestion_engine.dispose()
         await worker_engine.dispose()
 
@@ -98,7 +928,12 @@ async def run_worker() -> None:
 def run_worker_forever() -> None:
     """Run the polling worker."""
     config.logging.setup_logging(level=env.LOG_LEVEL)
-    asyncio.run(run_worker())
+    tracer_provider = config.tracing.setup_tracing()
+    try:
+        asyncio.run(run_worker())
+    finally:
+        if tracer_provider is not None:
+            tracer_provider.shutdown()  # flush the spans of the last cycles
 
 
 if __name__ == "__main__":
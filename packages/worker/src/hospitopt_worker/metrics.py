@@ -0,0 +1,206 @@
+"""Prometheus metrics of the optimization cycle, served over HTTP."""
+
+from collections.abc import Callable, Iterator, Mapping
+from contextlib import AbstractContextManager, suppress
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, Metric, start_http_server
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+from hospitopt_core.domain.models import OptimizationResult
+from hospitopt_worker.optimize import PreparedAllocation, SolveStats
+from hospitopt_worker.routes import RequestHedger
+from hospitopt_worker.usage import ElementUsage, UsageKey
+
+# From sub-second replayed cycles up to minutes of live routing and solving.
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+# Element counters of ``ElementUsage`` exported as the ``kind`` label of the route matrix element metric.
+ELEMENT_KINDS = ("requested", "skipped", "cached", "billed", "failed", "unroutable")
+
+
+class WorkerMetrics:
+    """Metric families of the worker, labelled by incident so that shards report side by side."""
+
+    def __init__(self, registry: CollectorRegistry = REGISTRY) -> None:
+        """Register the metric families.
+
+        Args:
+            registry: Registry to register with and serve. Defaults to the global registry, which also carries
+                the process and garbage collector metrics of ``prometheus_client``.
+        """
+        self.registry = registry
+        self.cycle_seconds = Histogram(
+            "hospitopt_worker_cycle_seconds",
+            "Time from detecting an input change to writing its assignments.",
+            ["incident"],
+            buckets=BUCKETS,
+            registry=registry,
+        )
+        self.stage_seconds = Histogram(
+            "hospitopt_worker_stage_seconds",
+            "Duration of each stage of an optimization cycle: ingest (only of polls that found a change, with hash, "
+            "its fingerprinting part), route, build (the solver model), solve and write.",
+            ["incident", "stage"],
+            buckets=BUCKETS,
+            registry=registry,
+        )
+        self.patients = Gauge(
+            "hospitopt_worker_patients", "Patients P of the latest model.", ["incident"], registry=registry
+        )
+        self.ambulances = Gauge(
+            "hospitopt_worker_ambulances", "Ambulances A of the latest model.", ["incident"], registry=registry
+        )
+        self.hospitals = Gauge(
+            "hospitopt_worker_hospitals", "Hospitals H of the latest model.", ["incident"], registry=registry
+        )
+        self.feasible = Gauge(
+            "hospitopt_worker_feasible_triples",
+            "Candidate (patient, ambulance, hospital) triples |F| of the latest model.",
+            ["incident"],
+            registry=registry,
+        )
+        self.unassigned = Gauge(
+            "hospitopt_worker_unassigned_patients",
+            "Patients left without an assignment by the latest cycle.",
+            ["incident"],
+            registry=registry,
+        )
+        self.queue_depth = Gauge(
+            "hospitopt_worker_queue_depth",
+            "Work waiting to be processed: pipeline snapshots and allocations, or pending jobs of the job queue.",
+            ["incident", "queue"],
+            registry=registry,
+        )
+        self.skipped_cycles = Counter(
+            "hospitopt_worker_skipped_cycles",
+            "Cycles that did not reach the solver, by reason.",
+            ["incident", "reason"],
+            registry=registry,
+        )
+        self.solver_terminations = Counter(
+            "hospitopt_worker_solver_terminations",
+            "Solver runs by termination condition.",
+            ["incident", "termination"],
+            registry=registry,
+        )
+        self.route_matrix_requests = Counter(
+            "hospitopt_worker_route_matrix_requests",
+            "Route matrix requests by matrix type and routing preference: sent (including retries and hedged "
+            "duplicates) and failed.",
+            ["incident", "matrix", "preference", "kind"],
+            registry=registry,
+        )
+        self.route_matrix_elements = Counter(
+            "hospitopt_worker_route_matrix_elements",
+            "Route matrix elements by matrix type and routing preference: requested, skipped (deduplicated or "
+            "pruned), cached, billed, failed and unroutable.",
+            ["incident", "matrix", "preference", "kind"],
+            registry=registry,
+        )
+
+    def watch_hedger(self, hedger: RequestHedger) -> None:
+        """Export the counters of the route matrix request hedger, shared by all incidents."""
+        self.registry.register(_HedgerCollector(hedger))
+
+    def serve(self, port: int, host: str) -> None:
+        """Serve the registry for scraping from a background thread."""
+        start_http_server(port, addr=host, registry=self.registry)
+
+    def for_incident(self, incident: str | None = None) -> "IncidentMetrics":
+        """Return the metrics of one incident, or of the whole worker when it is not sharded."""
+        return IncidentMetrics(self, incident or "")
+
+
+class _HedgerCollector(Collector):
+    """Read the counters of a request hedger whenever the metrics are scraped."""
+
+    def __init__(self, hedger: RequestHedger) -> None:
+        self._hedger = hedger
+
+    def collect(self) -> Iterator[Metric]:
+        hedger = self._hedger
+        yield CounterMetricFamily(
+            "hospitopt_worker_hedge_requests", "Route matrix requests sent through the hedger.", value=hedger.requests
+        )
+        yield CounterMetricFamily(
+            "hospitopt_worker_hedged_requests", "Route matrix requests that were duplicated.", value=hedger.hedged
+        )
+        yield CounterMetricFamily(
+            "hospitopt_worker_hedge_wins", "Hedged requests answered first by the duplicate.", value=hedger.hedge_wins
+        )
+        yield GaugeMetricFamily(
+            "hospitopt_worker_hedge_rate",
+            "Share of route matrix requests that were duplicated.",
+            value=hedger.hedge_rate,
+        )
+        yield GaugeMetricFamily(
+            "hospitopt_worker_hedge_rate_limit",
+            "Maximum share of route matrix requests that may be duplicated.",
+            value=hedger.max_hedge_fraction,
+        )
+
+
+class IncidentMetrics:
+    """Metrics of the optimization loop of one incident."""
+
+    def __init__(self, metrics: WorkerMetrics, incident: str) -> None:
+        self._metrics = metrics
+        self.incident = incident
+
+    def time(self, stage: str) -> AbstractContextManager[object]:
+        """Time a block of code as one run of a stage."""
+        return self._metrics.stage_seconds.labels(self.incident, stage).time()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Record the duration of a stage measured elsewhere."""
+        self._metrics.stage_seconds.labels(self.incident, stage).observe(seconds)
+
+    def observe_cycle(self, seconds: float) -> None:
+        """Record the duration of a whole cycle."""
+        self._metrics.cycle_seconds.labels(self.incident).observe(seconds)
+
+    def skipped(self, reason: str) -> None:
+        """Count a cycle that did not reach the solver, e.g. ``unchanged`` or ``superseded``."""
+        self._metrics.skipped_cycles.labels(self.incident, reason).inc()
+
+    def set_queue_depth(self, queue: str, depth: int) -> None:
+        """Record the number of items waiting in a queue."""
+        self._metrics.queue_depth.labels(self.incident, queue).set(depth)
+
+    def watch_queue_depth(self, queue: str, depth: Callable[[], int]) -> None:
+        """Read the depth of an in-process queue whenever the metrics are scraped."""
+        self._metrics.queue_depth.labels(self.incident, queue).set_function(depth)
+
+    def record_solve(self, prepared: PreparedAllocation, result: OptimizationResult, stats: SolveStats) -> None:
+        """Record the model size, solver timings and termination condition, and the outcome of a solved cycle."""
+        incident = prepared.incident
+        self._metrics.patients.labels(self.incident).set(len(incident.patients))
+        self._metrics.ambulances.labels(self.incident).set(len(incident.ambulances))
+        self._metrics.hospitals.labels(self.incident).set(len(incident.hospitals))
+        self._metrics.feasible.labels(self.incident).set(len(prepared.feasible))
+        self._metrics.unassigned.labels(self.incident).set(len(result.unassigned_patient_ids))
+        if stats.termination == "empty":
+            self.skipped("no_candidates")
+            return
+        self._metrics.solver_terminations.labels(self.incident, stats.termination).inc()
+        self.observe("build", stats.build_seconds)
+        self.observe("solve", stats.solve_seconds)
+
+    def record_routing(self, counters: Mapping[UsageKey, ElementUsage]) -> None:
+        """Count route matrix usage taken from a ``RoutingUsage``, e.g. of one cycle or of background prefetching."""
+        metrics = self._metrics
+        for (matrix, preference), usage in counters.items():
+            metrics.route_matrix_requests.labels(self.incident, matrix, preference, "sent").inc(usage.requests)
+            metrics.route_matrix_requests.labels(self.incident, matrix, preference, "failed").inc(usage.failed_requests)
+            for kind in ELEMENT_KINDS:
+                metrics.route_matrix_elements.labels(self.incident, matrix, preference, kind).inc(getattr(usage, kind))
+
+    def clear(self) -> None:
+        """Drop the gauges of this incident, once its loop has stopped."""
+        metrics = self._metrics
+        for gauge in (metrics.patients, metrics.ambulances, metrics.hospitals, metrics.feasible, metrics.unassigned):
+            with suppress(KeyError):
+                gauge.remove(self.incident)
+        for queue in ("snapshots", "allocations", "jobs"):
+            with suppress(KeyError):
+                metrics.queue_depth.remove(self.incident, queue)
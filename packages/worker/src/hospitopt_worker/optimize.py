@@ -1,10 +1,15 @@
 """Optimization logic for assigning patients to hospitals and ambulances."""
 
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
 from typing import Iterable
 from uuid import UUID
 
 import pyomo.environ as pyo
 from google.maps import routing_v2
+from opentelemetry import trace
 from pydantic import PositiveFloat
 
 from hospitopt_core.domain.models import (
@@ -18,64 +23,296 @@ from hospitopt_core.domain.models import (
     PatientAssignment,
     PatientIndex,
 )
-from hospitopt_worker.routes import build_minutes_tables
+from hospitopt_worker.ingestion.tracking import InputDelta
+from hospitopt_worker.providers.base import RoutingClient
+from hospitopt_worker.routes import RoutingContext, build_minutes_tables
+from hospitopt_worker.usage import RoutingUsage
 
+tracer = trace.get_tracer(__name__)
 
-async def optimize_allocation(
-    routes_client: routing_v2.RoutesAsyncClient,
+
+@dataclass(frozen=True)
+class OpenIncident:
+    """The undecided part of an incident, once ambulances already committed to a patient are set aside."""
+
+    hospitals: list[Hospital]  # free beds reduced by the committed transports heading there
+    patients: list[Patient]
+    ambulances: list[Ambulance]
+    ambulance_delays: list[int]  # minutes until each ambulance is free, non-zero for re-entering ones
+    committed: list[PatientAssignment]  # previous assignments of committed transports, carried over unchanged
+
+
+def split_commitments(
+    hospitals: list[Hospital],
+    patients: list[Patient],
+    ambulances: list[Ambulance],
+    previous_assignments: Mapping[UUID, PatientAssignment],
+    reenter_committed: bool = False,
+    now: datetime | None = None,
+) -> OpenIncident:
+    """Fix ambulances en route to a patient and remove them, with their patients, from routing and the model.
+
+    A committed transport whose previous assignment is known keeps it and reserves its hospital bed. With
+    ``reenter_committed``, its ambulance re-enters at that hospital once the projected transport is over.
+
+    Args:
+        hospitals: Hospitals in index order.
+        patients: Patients in index order.
+        ambulances: Ambulances in index order; ``assigned_patient_id`` marks committed ones.
+        previous_assignments: Latest assignments by patient id.
+        reenter_committed: Let committed ambulances serve another patient after their transport. Defaults to False.
+        now: Reference time for the projected transports. Defaults to now.
+
+    Returns:
+        The open incident.
+    """
+    now = now or datetime.now(UTC)
+    patient_ids = {patient.id for patient in patients}
+    hospitals_by_id = {hospital.id: hospital for hospital in hospitals}
+    reserved: dict[UUID, int] = {}
+    committed_patients: set[UUID] = set()
+    committed: list[PatientAssignment] = []
+    open_ambulances: list[Ambulance] = []
+    delays: list[int] = []
+    for ambulance in ambulances:
+        if ambulance.assigned_patient_id not in patient_ids:
+            open_ambulances.append(ambulance)
+            delays.append(0)
+            continue
+        committed_patients.add(ambulance.assigned_patient_id)
+        previous = previous_assignments.get(ambulance.assigned_patient_id)
+        if previous is None or previous.ambulance_id != ambulance.id or previous.hospital_id not in hospitals_by_id:
+            continue  # transport of unknown destination, leave its stored assignment alone
+        committed.append(previous)
+        reserved[previous.hospital_id] = reserved.get(previous.hospital_id, 0) + 1
+        if reenter_committed:
+            hospital = hospitals_by_id[previous.hospital_id]
+            elapsed_minutes = (now - previous.optimized_at).total_seconds() / 60
+            open_ambulances.append(ambulance.model_copy(update={"lat": hospital.lat, "lon": hospital.lon}))
+            delays.append(max(0, round((previous.estimated_travel_minutes or 0) - elapsed_minutes)))
+
+    return OpenIncident(
+        hospitals=[
+            hospital.model_copy(update={"used_beds": hospital.used_beds + reserved[hospital.id]})
+            if hospital.id in reserved
+            else hospital
+            for hospital in hospitals
+        ],
+        patients=[patient for patient in patients if patient.id not in committed_patients],
+        ambulances=open_ambulances,
+        ambulance_delays=delays,
+        committed=committed,
+    )
+
+
+Triple = tuple[PatientIndex, AmbulanceIndex, HospitalIndex]
+
+
+class FeasibilityBuilder:
+    """Incrementally builds feasible (patient, ambulance, hospital) triples as travel times arrive.
+
+    A triple is evaluated as soon as both of its legs are known, so candidates for fully routed patients exist
+    while the rest of the route matrices are still streaming in.
+    """
+
+    def __init__(
+        self,
+        patients: list[Patient],
+        hospitals: list[Hospital],
+        speed_factor: float,
+        ambulance_delays: list[int] | None = None,
+    ) -> None:
+        """Create an empty builder.
+
+        Args:
+            patients: Patients in index order.
+            hospitals: Hospitals in index order; hospitals without free beds never yield candidates.
+            speed_factor: Multiplier to reduce travel time for priority transport.
+            ambulance_delays: Optional minutes until each ambulance is free, added to its travel times.
+        """
+        self.speed_factor = speed_factor
+        self._ambulance_delays = ambulance_delays
+        self._deadlines = [patient.time_to_hospital_minutes for patient in patients]
+        self._open_hospitals = {
+            HospitalIndex(h_index)
+            for h_index, hospital in enumerate(hospitals)
+            if hospital.bed_capacity > hospital.used_beds
+        }
+        self._patient_to_hospital: dict[PatientIndex, dict[HospitalIndex, int]] = {}
+        self._ambulance_to_patient: dict[PatientIndex, dict[AmbulanceIndex, int]] = {}
+        self.feasible: dict[Triple, int] = {}
+        self.feasible_weights: dict[Triple, float] = {}
+
+    def add_patient_to_hospital(self, p_index: PatientIndex, h_index: HospitalIndex, minutes: int) -> None:
+        """Record a patient -> hospital leg and evaluate the triples it completes."""
+        if h_index not in self._open_hospitals:  # hospital already over maximum capacity
+            return
+        legs = self._patient_to_hospital.setdefault(p_index, {})
+        if legs.get(h_index) == minutes:
+            return
+        legs[h_index] = minutes
+        for a_index, ap in self._ambulance_to_patient.get(p_index, {}).items():
+            self._evaluate(p_index, a_index, h_index, ap + minutes)
+
+    def add_ambulance_to_patient(self, a_index: AmbulanceIndex, p_index: PatientIndex, minutes: int) -> None:
+        """Record an ambulance -> patient leg and evaluate the triples it completes."""
+        legs = self._ambulance_to_patient.setdefault(p_index, {})
+        if legs.get(a_index) == minutes:
+            return
+        legs[a_index] = minutes
+        for h_index, ph in self._patient_to_hospital.get(p_index, {}).items():
+            self._evaluate(p_index, a_index, h_index, minutes + ph)
+
+    def extend_from_tables(self, minutes_tables: MinutesTables) -> None:
+        """Add every leg of complete tables; legs already seen with the same minutes are skipped."""
+        for (p_index, h_index), minutes in minutes_tables.patient_to_hospital.items():
+            self.add_patient_to_hospital(p_index, h_index, minutes)
+        for (a_index, p_index), minutes in minutes_tables.ambulance_to_patient.items():
+            self.add_ambulance_to_patient(a_index, p_index, minutes)
+
+    def _evaluate(
+        self, p_index: PatientIndex, a_index: AmbulanceIndex, h_index: HospitalIndex, raw_travel_minutes: int
+    ) -> None:
+        key = (p_index, a_index, h_index)
+        travel_minutes = round(raw_travel_minutes / self.speed_factor)
+        if self._ambulance_delays is not None:
+            travel_minutes += self._ambulance_delays[a_index]
+        slack = self._deadlines[p_index] - travel_minutes
+        if slack > 0:
+            self.feasible[key] = travel_minutes
+            self.feasible_weights[key] = 1.0 / slack
+        else:
+            self.feasible.pop(key, None)
+            self.feasible_weights.pop(key, None)
+
+
+@dataclass(frozen=True)
+class PreparedAllocation:
+    """Everything the solver needs for one cycle, once travel times are routed and candidates are built."""
+
+    incident: OpenIncident
+    feasible: dict[Triple, int]  # candidate triple -> travel minutes
+    feasible_weights: dict[Triple, float]
+    capacity_shortfall: int
+    ambulance_shortfall: int
+    estimated: bool
+    usage: RoutingUsage = field(default_factory=RoutingUsage)  # route matrix usage of this cycle only
+
+
+@dataclass
+class SolveStats:
+    """Timings and outcome of one ``solve_allocation`` call."""
+
+    build_seconds: float = 0.0  # building the Pyomo model
+    solve_seconds: float = 0.0  # the solver call itself
+    termination: str = "empty"  # solver termination condition, ``empty`` when there was no model to solve
+
+
+async def prepare_allocation(
+    routes_client: RoutingClient,
     hospitals: Iterable[Hospital],
     patients: Iterable[Patient],
     ambulances: Iterable[Ambulance],
     travel_mode: routing_v2.RouteTravelMode = routing_v2.RouteTravelMode.DRIVE,
     speed_factor: PositiveFloat = 1.3,  # to account for priority vehicle speedups, 30% faster by default
-) -> OptimizationResult:
-    """Optimize patient allocations with urgency-weighted objective.
+    snap_resolution_degrees: PositiveFloat | None = None,
+    routing_context: RoutingContext | None = None,
+    previous_assignments: Mapping[UUID, PatientAssignment] | None = None,
+    reenter_committed: bool = False,
+    delta: InputDelta | None = None,
+) -> PreparedAllocation:
+    """Route travel times and build the candidate triples of the allocation model.
+
+    With routed legs in the routing context, travel times between entities ``delta`` leaves untouched are carried
+    over from the previous cycle and reach the feasibility builder before any live result, so only the rows and
+    columns of added or changed entities are routed while their triples are already being built.
 
     Args:
-        routes_client: Google Routes async client used for travel-time matrices.
+        routes_client: Routing client (Google Routes or a local provider) used for travel-time matrices.
         hospitals: Available hospitals with capacities.
         patients: Patients to allocate with urgency constraints.
         ambulances: Available ambulances for transport.
         travel_mode: Google Routes travel mode. Defaults to DRIVE.
         speed_factor: Multiplier to reduce travel time for priority transport. Defaults to 1.3.
+        snap_resolution_degrees: Grid resolution in degrees used to merge nearby coordinates before routing.
+            Defaults to None, which only merges exact duplicates.
+        routing_context: Optional long-lived routing state shared across optimization cycles.
+        previous_assignments: Latest assignments by patient id, carried over for ambulances already committed to
+            their patient. Committed ambulances and their patients are never routed nor part of the model.
+        reenter_committed: Let committed ambulances serve another patient once their projected transport is over.
+            Defaults to False.
+        delta: Changes of the inputs since the previous call with the same routing context. Defaults to None,
+            which routes every row.
 
     Returns:
-        OptimizationResult containing assignments and summary metrics.
+        The prepared allocation, to be passed to ``solve_allocation``.
     """
-    hospital_list = list(hospitals)
-    patient_list = list(patients)
-    ambulance_list = list(ambulances)
+    incident = split_commitments(
+        list(hospitals), list(patients), list(ambulances), previous_assignments or {}, reenter_committed
+    )
+    hospital_list = incident.hospitals
+    patient_list = incident.patients
+    ambulance_list = incident.ambulances
 
     total_capacity = sum(hospital.bed_capacity - hospital.used_beds for hospital in hospital_list)
     capacity_shortfall = max(0, len(patient_list) - total_capacity)
     ambulance_shortfall = max(0, len(patient_list) - len(ambulance_list))
 
-    feasible: dict[tuple[PatientIndex, AmbulanceIndex, HospitalIndex], int] = {}
-    feasible_weights: dict[tuple[PatientIndex, AmbulanceIndex, HospitalIndex], float] = {}
-    minutes_tables: MinutesTables = await build_minutes_tables(
-        routes_client, patient_list, hospital_list, ambulance_list, travel_mode=travel_mode
+    # Candidate triples are built while the route matrices stream in, overlapping feasibility work with routing.
+    builder = FeasibilityBuilder(patient_list, hospital_list, speed_factor, incident.ambulance_delays)
+    usage = RoutingUsage()
+    with tracer.start_as_current_span("allocation.route") as span:
+        minutes_tables: MinutesTables = await build_minutes_tables(
+            routes_client,
+            patient_list,
+            hospital_list,
+            ambulance_list,
+            travel_mode=travel_mode,
+            snap_resolution_degrees=snap_resolution_degrees,
+            context=routing_context,
+            sink=builder,
+            speed_factor=speed_factor,
+            ambulance_delays=incident.ambulance_delays,
+            usage=usage,
+            changed=delta.touched() if delta is not None else None,
+        )
+        span.set_attribute("hospitopt.estimated", minutes_tables.estimated)
+    with tracer.start_as_current_span("allocation.feasibility") as span:
+        span.set_attribute("hospitopt.streamed_triples", len(builder.feasible))
+        builder.extend_from_tables(minutes_tables)  # legs not streamed, e.g. estimates or late live results
+        feasible = dict(sorted(builder.feasible.items()))  # arrival order must not change the model
+        span.set_attribute("hospitopt.feasible_triples", len(feasible))
+    return PreparedAllocation(
+        incident=incident,
+        feasible=feasible,
+        feasible_weights=builder.feasible_weights,
+        capacity_shortfall=capacity_shortfall,
+        ambulance_shortfall=ambulance_shortfall,
+        estimated=minutes_tables.estimated,
+        usage=usage,
     )
-    a_p_minutes = minutes_tables.ambulance_to_patient
-    p_h_minutes = minutes_tables.patient_to_hospital
-    for p_index, patient in enumerate(patient_list):
-        for h_index, hospital in enumerate(hospital_list):
-            if hospital.bed_capacity <= hospital.used_beds:  # hospital already over maximum capacity
-                continue
-            for a_index, ambulance in enumerate(ambulance_list):
-                ap = a_p_minutes.get((AmbulanceIndex(a_index), PatientIndex(p_index)))
-                ph = p_h_minutes.get((PatientIndex(p_index), HospitalIndex(h_index)))
-                if ap is None or ph is None:
-                    continue
-                raw_travel_minutes = ap + ph
-                travel_minutes = round(raw_travel_minutes / speed_factor)
-                if travel_minutes <= patient.time_to_hospital_minutes:
-                    slack = patient.time_to_hospital_minutes - travel_minutes
-                    if slack <= 0:
-                        continue
-                    feasible[(PatientIndex(p_index), AmbulanceIndex(a_index), HospitalIndex(h_index))] = travel_minutes
-                    feasible_weights[(PatientIndex(p_index), AmbulanceIndex(a_index), HospitalIndex(h_index))] = (
-                        1.0 / slack
-                    )
+
+
+def solve_allocation(prepared: PreparedAllocation, stats: SolveStats | None = None) -> OptimizationResult:
+    """Solve the urgency-weighted allocation model of a prepared allocation.
+
+    This is CPU-bound and blocking; callers on the event loop should run it in a worker thread.
+
+    Args:
+        prepared: Output of ``prepare_allocation``.
+        stats: Optional stats updated with the model build and solver timings and the termination condition.
+
+    Returns:
+        OptimizationResult containing assignments and summary metrics.
+    """
+    incident = prepared.incident
+    hospital_list = incident.hospitals
+    patient_list = incident.patients
+    ambulance_list = incident.ambulances
+    feasible = prepared.feasible
+    feasible_weights = prepared.feasible_weights
+    capacity_shortfall = prepared.capacity_shortfall
+    ambulance_shortfall = prepared.ambulance_shortfall
 
     if not feasible:
         # prevent solver from failing on empty model
@@ -89,55 +326,68 @@ async def optimize_allocation(
             for patient in patient_list
         ]
         return OptimizationResult(
-            assignments=urgent_assignments,
+            assignments=incident.committed + urgent_assignments,
             unassigned_patient_ids=[patient.id for patient in patient_list],
-            max_lives_saved=0,
+            max_lives_saved=len(incident.committed),
             capacity_shortfall=capacity_shortfall,
             ambulance_shortfall=ambulance_shortfall,
+            estimated=prepared.estimated,
         )
 
-    model = pyo.ConcreteModel()
-    model.F = pyo.Set(initialize=list(feasible.keys()), dimen=3)
-    model.P = pyo.RangeSet(0, len(patient_list) - 1)
-    model.A = pyo.RangeSet(0, len(ambulance_list) - 1)
-    model.H = pyo.RangeSet(0, len(hospital_list) - 1)
+    started = time.monotonic()
+    with tracer.start_as_current_span(
+        "allocation.build_model", attributes={"hospitopt.feasible_triples": len(feasible)}
+    ):
+        model = pyo.ConcreteModel()
+        model.F = pyo.Set(initialize=list(feasible.keys()), dimen=3)
+        model.P = pyo.RangeSet(0, len(patient_list) - 1)
+        model.A = pyo.RangeSet(0, len(ambulance_list) - 1)
+        model.H = pyo.RangeSet(0, len(hospital_list) - 1)
 
-    model.assign = pyo.Var(model.F, within=pyo.Binary)
+        model.assign = pyo.Var(model.F, within=pyo.Binary)
 
-    def patient_limit(m: pyo.ConcreteModel, p_index: int) -> pyo.Constraint:
-        """Each patient can be assigned at most once."""
-        if not any(key[0] == p_index for key in m.F):
-            return pyo.Constraint.Feasible  # When no feasible assignments exist for this patient
-        return sum(m.assign[key] for key in m.F if key[0] == p_index) <= 1
+        def patient_limit(m: pyo.ConcreteModel, p_index: int) -> pyo.Constraint:
+            """Each patient can be assigned at most once."""
+            if not any(key[0] == p_index for key in m.F):
+                return pyo.Constraint.Feasible  # When no feasible assignments exist for this patient
+            return sum(m.assign[key] for key in m.F if key[0] == p_index) <= 1
 
-    model.patient_limit = pyo.Constraint(model.P, rule=patient_limit)
+        model.patient_limit = pyo.Constraint(model.P, rule=patient_limit)
 
-    def hospital_capacity(m: pyo.ConcreteModel, h_index: int) -> pyo.Constraint:
-        """Hospital capacity cannot be exceeded."""
-        available = max(0, hospital_list[h_index].bed_capacity - hospital_list[h_index].used_beds)
-        if not any(key[2] == h_index for key in m.F):
-            return pyo.Constraint.Feasible  # When no feasible assignments exist for this hospital
-        return sum(m.assign[key] for key in m.F if key[2] == h_index) <= available
+        def hospital_capacity(m: pyo.ConcreteModel, h_index: int) -> pyo.Constraint:
+            """Hospital capacity cannot be exceeded."""
+            available = max(0, hospital_list[h_index].bed_capacity - hospital_list[h_index].used_beds)
+            if not any(key[2] == h_index for key in m.F):
+                return pyo.Constraint.Feasible  # When no feasible assignments exist for this hospital
+            return sum(m.assign[key] for key in m.F if key[2] == h_index) <= available
 
-    model.hospital_capacity = pyo.Constraint(model.H, rule=hospital_capacity)
+        model.hospital_capacity = pyo.Constraint(model.H, rule=hospital_capacity)
 
-    def ambulance_limit(m: pyo.ConcreteModel, a_index: int) -> pyo.Constraint:
-        """Each ambulance can be assigned at most once."""
-        if not any(key[1] == a_index for key in m.F):
-            return pyo.Constraint.Feasible  # When no feasible assignments exist for this ambulance
-        return sum(m.assign[key] for key in m.F if key[1] == a_index) <= 1
+        def ambulance_limit(m: pyo.ConcreteModel, a_index: int) -> pyo.Constraint:
+            """Each ambulance can be assigned at most once."""
+            if not any(key[1] == a_index for key in m.F):
+                return pyo.Constraint.Feasible  # When no feasible assignments exist for this ambulance
+            return sum(m.assign[key] for key in m.F if key[1] == a_index) <= 1
 
-    model.ambulance_limit = pyo.Constraint(model.A, rule=ambulance_limit)
+        model.ambulance_limit = pyo.Constraint(model.A, rule=ambulance_limit)
 
-    model.objective = pyo.Objective(
-        expr=sum(model.assign[key] * feasible_weights[key] for key in model.F),
-        sense=pyo.maximize,
-    )  # prioritizes patients with less time to spare
+        model.objective = pyo.Objective(
+            expr=sum(model.assign[key] * feasible_weights[key] for key in model.F),
+            sense=pyo.maximize,
+        )  # prioritizes patients with less time to spare
 
     solver = pyo.SolverFactory("glpk")
     if solver is None or not solver.available():
         raise RuntimeError("No compatible Pyomo solver available. Install GLPK or set up another MILP solver.")
-    solver.solve(model, tee=False)
+    built = time.monotonic()
+    with tracer.start_as_current_span("allocation.solve", attributes={"hospitopt.solver": "glpk"}) as span:
+        solution = solver.solve(model, tee=False)
+        termination = str(solution.solver.termination_condition)
+        span.set_attribute("hospitopt.termination", termination)
+    if stats is not None:
+        stats.build_seconds = built - started
+        stats.solve_seconds = time.monotonic() - built
+        stats.termination = termination
 
     assignments: list[PatientAssignment] = []
     assigned_patients: set[UUID] = set()
@@ -179,9 +429,45 @@ async def optimize_allocation(
         )
 
     return OptimizationResult(
-        assignments=assignments,
+        assignments=incident.committed + assignments,
         unassigned_patient_ids=unassigned,
-        max_lives_saved=len(assigned_patients),
+        max_lives_saved=len(incident.committed) + len(assigned_patients),
         capacity_shortfall=capacity_shortfall,
         ambulance_shortfall=ambulance_shortfall,
+        estimated=prepared.estimated,
+    )
+
+
+async def optimize_allocation(
+    routes_client: RoutingClient,
+    hospitals: Iterable[Hospital],
+    patients: Iterable[Patient],
+    ambulances: Iterable[Ambulance],
+    travel_mode: routing_v2.RouteTravelMode = routing_v2.RouteTravelMode.DRIVE,
+    speed_factor: PositiveFloat = 1.3,  # to account for priority vehicle speedups, 30% faster by default
+    snap_resolution_degrees: PositiveFloat | None = None,
+    routing_context: RoutingContext | None = None,
+    previous_assignments: Mapping[UUID, PatientAssignment] | None = None,
+    reenter_committed: bool = False,
+) -> OptimizationResult:
+    """Optimize patient allocations with urgency-weighted objective.
+
+    Runs ``prepare_allocation`` and ``solve_allocation`` back to back; see ``prepare_allocation`` for the
+    arguments.
+
+    Returns:
+        OptimizationResult containing assignments and summary metrics.
+    """
+    prepared = await prepare_allocation(
+        routes_client,
+        hospitals,
+        patients,
+        ambulances,
+        travel_mode=travel_mode,
+        speed_factor=speed_factor,
+        snap_resolution_degrees=snap_resolution_degrees,
+        routing_context=routing_context,
+        previous_assignments=previous_assignments,
+        reenter_committed=reenter_committed,
     )
+    return solve_allocation(prepared)
@@ -0,0 +1,75 @@
+"""Building blocks of the staged worker pipeline."""
+
+import asyncio
+import time
+from collections.abc import Callable, Coroutine
+from dataclasses import dataclass, field
+from typing import Any, Generic, TypeVar
+
+from opentelemetry.trace import Span
+
+ItemT = TypeVar("ItemT")
+
+
+@dataclass(frozen=True)
+class Cycle:
+    """Root trace span and start time of one optimization cycle, handed from stage to stage with its data."""
+
+    span: Span
+    started: float = field(default_factory=time.monotonic)
+
+
+class LatestSlot(Generic[ItemT]):
+    """Single-item hand-off between two pipeline stages where the freshest item wins.
+
+    Putting never blocks: an item the consumer has not taken yet is replaced, so a slow downstream stage
+    only ever sees the most recent input and stale ones are dropped instead of queueing up.
+    """
+
+    def __init__(self, merge: Callable[[ItemT, ItemT], ItemT] | None = None) -> None:
+        """Create an empty slot.
+
+        Args:
+            merge: Optional function folding a dropped item into the one replacing it, e.g. to accumulate the
+                changes both carry. Defaults to keeping the newer item as is.
+        """
+        self._merge = merge
+        self._items: list[ItemT] = []
+        self._ready = asyncio.Event()
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def put(self, item: ItemT) -> ItemT | None:
+        """Offer an item, replacing the pending one if the consumer has not taken it yet.
+
+        Returns:
+            The pending item that was dropped, if any.
+        """
+        replaced = self._items[0] if self._items else None
+        self.dropped += len(self._items)
+        if replaced is not None and self._merge is not None:
+            item = self._merge(replaced, item)
+        self._items = [item]
+        self._ready.set()
+        return replaced
+
+    async def get(self) -> ItemT:
+        """Wait for and take the freshest pending item."""
+        await self._ready.wait()
+        self._ready.clear()
+        return self._items.pop()
+
+
+async def run_stages(*stages: Coroutine[Any, Any, None]) -> None:
+    """Run pipeline stages concurrently until one of them fails, then cancel the others and re-raise."""
+    tasks = [asyncio.ensure_future(stage) for stage in stages]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,19 @@
+"""Routing providers for the Hospitopt Worker."""
+
+from hospitopt_worker.providers.base import RouteMatrixProvider as RouteMatrixProvider
+from hospitopt_worker.providers.base import RoutingClient as RoutingClient
+from hospitopt_worker.providers.fake import FakeRouteMatrixProvider as FakeRouteMatrixProvider
+from hospitopt_worker.providers.offline import OfflineRouteMatrixProvider as OfflineRouteMatrixProvider
+from hospitopt_worker.providers.offline import RoadGraph as RoadGraph
+from hospitopt_worker.providers.replay import RecordingProvider as RecordingProvider
+from hospitopt_worker.providers.replay import ReplayProvider as ReplayProvider
+
+__all__ = [
+    "FakeRouteMatrixProvider",
+    "OfflineRouteMatrixProvider",
+    "RecordingProvider",
+    "ReplayProvider",
+    "RoadGraph",
+    "RouteMatrixProvider",
+    "RoutingClient",
+]
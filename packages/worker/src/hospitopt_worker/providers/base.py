@@ -0,0 +1,96 @@
+"""Routing provider interfaces for the worker runtime."""
+
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator, Iterable, Sequence
+from datetime import timedelta
+
+from google.maps import routing_v2
+from google.rpc import status_pb2
+
+Coordinate = tuple[float, float]
+
+# Routes API element limits: 100 per request with TRAFFIC_AWARE_OPTIMAL routing and 625 otherwise.
+MAX_ELEMENTS_TRAFFIC_AWARE_OPTIMAL = 100
+MAX_ELEMENTS = 625
+
+
+class RouteMatrixProvider(ABC):
+    """Abstract source of streamed route matrix elements.
+
+    Mirrors ``routing_v2.RoutesAsyncClient.compute_route_matrix`` so a provider can be used anywhere the Google
+    client is expected.
+    """
+
+    @abstractmethod
+    async def compute_route_matrix(
+        self,
+        request: routing_v2.ComputeRouteMatrixRequest,
+        metadata: Sequence[tuple[str, str]] = (),
+    ) -> AsyncIterator[routing_v2.RouteMatrixElement]:
+        """Return a stream of route matrix elements for the request."""
+        ...
+
+    def element_limit(self, routing_preference: routing_v2.RoutingPreference) -> int | None:
+        """Return the maximum number of elements per request, or None when a whole matrix fits in one request.
+
+        Defaults to the Routes API limits. Local providers return None so the worker sends each matrix at once
+        instead of splitting it into Routes-sized chunks.
+        """
+        return routes_api_element_limit(routing_preference)
+
+
+type RoutingClient = routing_v2.RoutesAsyncClient | RouteMatrixProvider
+
+
+def routes_api_element_limit(routing_preference: routing_v2.RoutingPreference) -> int:
+    """Return the Routes API element limit of a routing preference."""
+    if routing_preference == routing_v2.RoutingPreference.TRAFFIC_AWARE_OPTIMAL:
+        return MAX_ELEMENTS_TRAFFIC_AWARE_OPTIMAL
+    return MAX_ELEMENTS
+
+
+def element_limit(client: RoutingClient, routing_preference: routing_v2.RoutingPreference) -> int | None:
+    """Return the per-request element limit of any routing client; see ``RouteMatrixProvider.element_limit``."""
+    if isinstance(client, RouteMatrixProvider):
+        return client.element_limit(routing_preference)
+    return routes_api_element_limit(routing_preference)
+
+
+def request_coordinates(
+    request: routing_v2.ComputeRouteMatrixRequest,
+) -> tuple[list[Coordinate], list[Coordinate]]:
+    """Extract (lat, lon) origins and destinations from a route matrix request."""
+    origins = [
+        (origin.waypoint.location.lat_lng.latitude, origin.waypoint.location.lat_lng.longitude)
+        for origin in request.origins
+    ]
+    destinations = [
+        (destination.waypoint.location.lat_lng.latitude, destination.waypoint.location.lat_lng.longitude)
+        for destination in request.destinations
+    ]
+    return origins, destinations
+
+
+def make_element(
+    origin_index: int,
+    destination_index: int,
+    duration_seconds: float,
+    distance_meters: int = 0,
+    status_code: int = 0,
+) -> routing_v2.RouteMatrixElement:
+    """Build a route matrix element as returned by the Routes API."""
+    return routing_v2.RouteMatrixElement(
+        origin_index=origin_index,
+        destination_index=destination_index,
+        duration=timedelta(seconds=duration_seconds),
+        distance_meters=distance_meters,
+        status=status_pb2.Status(code=status_code),
+    )
+
+
+async def stream_elements(
+    elements: Iterable[routing_v2.RouteMatrixElement],
+) -> AsyncIterator[routing_v2.RouteMatrixElement]:
+    """Expose already computed elements as an async stream."""
+    for element in elements:
+        yield element
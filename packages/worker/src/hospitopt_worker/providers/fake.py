@@ -0,0 +1,117 @@
+"""Synthetic route matrix provider with latency and error injection for load and resilience tests."""
+
+import asyncio
+import random
+from collections.abc import AsyncIterator, Sequence
+
+from google.api_core import exceptions as core_exceptions
+from google.maps import routing_v2
+
+from hospitopt_worker.geo import haversine_meters
+from hospitopt_worker.providers.base import (
+    RouteMatrixProvider,
+    make_element,
+    request_coordinates,
+    routes_api_element_limit,
+)
+
+RESOURCE_EXHAUSTED = 8
+
+
+class FakeRouteMatrixProvider(RouteMatrixProvider):
+    """In-process stand-in for the Google Routes ``ComputeRouteMatrix`` streaming API.
+
+    Durations are synthesized from the straight-line distance, a road circuity factor and a speed. Response
+    latency, per-element stream delays with jitter, quota errors, broken streams and failed elements can be
+    injected, so worker throughput and resilience can be benchmarked end to end on one machine.
+    """
+
+    def __init__(
+        self,
+        speed_kph: float = 40.0,
+        circuity: float = 1.3,
+        max_elements: int | None = None,
+        latency_seconds: float = 0.0,
+        element_latency_seconds: float = 0.0,
+        jitter_seconds: float = 0.0,
+        quota_error_rate: float = 0.0,
+        stream_error_rate: float = 0.0,
+        element_error_rate: float = 0.0,
+        seed: int | None = None,
+    ) -> None:
+        """Create a fake provider.
+
+        Args:
+            speed_kph: Road speed used to turn distances into durations. Defaults to 40.
+            circuity: Ratio of road distance to straight-line distance. Defaults to 1.3.
+            max_elements: Requests above this many elements are rejected like the Routes API does. Defaults to None,
+                which applies the API limits: 100 elements with TRAFFIC_AWARE_OPTIMAL routing and 625 otherwise.
+            latency_seconds: Delay before each response stream starts. Defaults to 0.
+            element_latency_seconds: Delay before each streamed element. Defaults to 0.
+            jitter_seconds: Upper bound of the random delay added to every latency. Defaults to 0.
+            quota_error_rate: Probability that a request fails with RESOURCE_EXHAUSTED. Defaults to 0.
+            stream_error_rate: Probability that a response stream breaks off with UNAVAILABLE. Defaults to 0.
+            element_error_rate: Probability that an element carries a RESOURCE_EXHAUSTED status. Defaults to 0.
+            seed: Seed of the injected randomness, for reproducible runs. Defaults to None.
+        """
+        self.speed_kph = speed_kph
+        self.circuity = circuity
+        self.max_elements = max_elements
+        self.latency_seconds = latency_seconds
+        self.element_latency_seconds = element_latency_seconds
+        self.jitter_seconds = jitter_seconds
+        self.quota_error_rate = quota_error_rate
+        self.stream_error_rate = stream_error_rate
+        self.element_error_rate = element_error_rate
+        self.requests = 0
+        self.elements = 0
+        self._random = random.Random(seed)  # nosec B311
+
+    def element_limit(self, routing_preference: routing_v2.RoutingPreference) -> int | None:
+        return self.max_elements or routes_api_element_limit(routing_preference)
+
+    def _delay(self, seconds: float) -> float:
+        return seconds + self._random.uniform(0, self.jitter_seconds) if self.jitter_seconds else seconds
+
+    async def compute_route_matrix(
+        self,
+        request: routing_v2.ComputeRouteMatrixRequest,
+        metadata: Sequence[tuple[str, str]] = (),
+    ) -> AsyncIterator[routing_v2.RouteMatrixElement]:
+        origins, destinations = request_coordinates(request)
+        max_elements = self.max_elements or routes_api_element_limit(request.routing_preference)
+        if len(origins) * len(destinations) > max_elements:
+            raise core_exceptions.InvalidArgument(  # type: ignore[no-untyped-call]
+                f"Route matrix of {len(origins) * len(destinations)} elements exceeds {max_elements}."
+            )
+        self.requests += 1
+        delay = self._delay(self.latency_seconds)
+        if delay:
+            await asyncio.sleep(delay)
+        if self._random.random() < self.quota_error_rate:
+            raise core_exceptions.ResourceExhausted("Injected quota error.")  # type: ignore[no-untyped-call]
+        return self._stream(origins, destinations)
+
+    async def _stream(
+        self, origins: list[tuple[float, float]], destinations: list[tuple[float, float]]
+    ) -> AsyncIterator[routing_v2.RouteMatrixElement]:
+        meters_per_second = self.speed_kph / 3.6
+        broken_at = (
+            self._random.randrange(len(origins) * len(destinations))
+            if self._random.random() < self.stream_error_rate
+            else None
+        )
+        for position, (o_index, d_index) in enumerate(
+            (o, d) for o in range(len(origins)) for d in range(len(destinations))
+        ):
+            if position == broken_at:
+                raise core_exceptions.ServiceUnavailable("Injected stream error.")  # type: ignore[no-untyped-call]
+            delay = self._delay(self.element_latency_seconds)
+            if delay:
+                await asyncio.sleep(delay)
+            self.elements += 1
+            if self._random.random() < self.element_error_rate:
+                yield make_element(o_index, d_index, 0, status_code=RESOURCE_EXHAUSTED)
+                continue
+            meters = haversine_meters(origins[o_index], destinations[d_index]) * self.circuity
+            yield make_element(o_index, d_index, meters / meters_per_second, distance_meters=int(meters))
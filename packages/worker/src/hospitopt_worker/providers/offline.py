@@ -0,0 +1,260 @@
+"""Offline route matrix provider backed by a local road graph."""
+
+import asyncio
+import csv
+import heapq
+import math
+import xml.etree.ElementTree as ET  # nosec B405 - parses operator-provided local graph files
+from collections.abc import AsyncIterator, Sequence
+from pathlib import Path
+
+from google.maps import routing_v2
+
+from hospitopt_worker.geo import haversine_meters
+from hospitopt_worker.providers.base import (
+    Coordinate,
+    RouteMatrixProvider,
+    make_element,
+    request_coordinates,
+    stream_elements,
+)
+
+_GRAPHML_NS = "{http://graphml.graphdrawing.org/xmlns}"
+_TRUE_VALUES = {"true", "1", "yes"}
+NOT_FOUND = 5
+
+
+class RoadGraph:
+    """Directed road graph with travel-time and length weights."""
+
+    def __init__(self, bucket_degrees: float = 0.01) -> None:
+        self.coords: list[Coordinate] = []
+        self.adjacency: list[list[tuple[int, float, float]]] = []
+        self._node_ids: dict[str, int] = {}
+        self._bucket_degrees = bucket_degrees
+        self._buckets: dict[tuple[int, int], list[int]] = {}
+        self._extent: tuple[int, int, int, int] | None = None
+
+    def add_node(self, key: str, lat: float, lon: float) -> int:
+        """Add a node (idempotent by key) and return its index."""
+        index = self._node_ids.get(key)
+        if index is not None:
+            return index
+        index = self._node_ids[key] = len(self.coords)
+        self.coords.append((lat, lon))
+        self.adjacency.append([])
+        bucket = self._bucket(lat, lon)
+        self._buckets.setdefault(bucket, []).append(index)
+        if self._extent is None:
+            self._extent = (bucket[0], bucket[1], bucket[0], bucket[1])
+        else:
+            min_row, min_col, max_row, max_col = self._extent
+            self._extent = (
+                min(min_row, bucket[0]),
+                min(min_col, bucket[1]),
+                max(max_row, bucket[0]),
+                max(max_col, bucket[1]),
+            )
+        return index
+
+    def add_edge(self, source: int, target: int, seconds: float, meters: float) -> None:
+        """Add a directed edge."""
+        self.adjacency[source].append((target, seconds, meters))
+
+    @classmethod
+    def load(cls, path: Path, default_speed_kph: float = 50.0) -> "RoadGraph":
+        """Load a graph from a GraphML file (OSMnx export) or a CSV edge list, based on the file suffix."""
+        if path.suffix.lower() == ".graphml":
+            return cls.from_graphml(path, default_speed_kph)
+        if path.suffix.lower() == ".csv":
+            return cls.from_csv(path, default_speed_kph)
+        raise ValueError(f"Unsupported road graph format: {path.suffix} (expected .graphml or .csv)")
+
+    @classmethod
+    def from_graphml(cls, path: Path, default_speed_kph: float = 50.0) -> "RoadGraph":
+        """Load an OSMnx-style GraphML export.
+
+        Nodes must carry ``x`` (lon) and ``y`` (lat). Edges use ``travel_time`` (seconds) when present, otherwise
+        ``length`` (meters) at ``speed_kph`` or the default speed.
+        """
+        root = ET.parse(path).getroot()  # nosec B314 - operator-provided local file
+        keys = {key.get("id"): key.get("attr.name") for key in root.iter(f"{_GRAPHML_NS}key")}
+        graph_element = root.find(f"{_GRAPHML_NS}graph")
+        if graph_element is None:
+            raise ValueError(f"No graph element found in {path}")
+        directed = graph_element.get("edgedefault", "directed") == "directed"
+
+        def _data(element: ET.Element) -> dict[str, str]:
+            return {
+                keys.get(d.get("key"), d.get("key")) or "": d.text or "" for d in element.iter(f"{_GRAPHML_NS}data")
+            }
+
+        graph = cls()
+        for node in graph_element.iter(f"{_GRAPHML_NS}node"):
+            data = _data(node)
+            graph.add_node(node.get("id", ""), float(data["y"]), float(data["x"]))
+        for edge in graph_element.iter(f"{_GRAPHML_NS}edge"):
+            data = _data(edge)
+            source = graph._node_ids[edge.get("source", "")]
+            target = graph._node_ids[edge.get("target", "")]
+            meters = float(data.get("length") or haversine_meters(graph.coords[source], graph.coords[target]))
+            seconds = _edge_seconds(data.get("travel_time"), meters, data.get("speed_kph"), default_speed_kph)
+            graph.add_edge(source, target, seconds, meters)
+            if not directed:
+                graph.add_edge(target, source, seconds, meters)
+        return graph
+
+    @classmethod
+    def from_csv(cls, path: Path, default_speed_kph: float = 50.0) -> "RoadGraph":
+        """Load a CSV edge list.
+
+        Required columns: ``source_lat``, ``source_lon``, ``target_lat``, ``target_lon``. Optional columns:
+        ``length_meters``, ``travel_time_seconds``, ``speed_kph`` and ``oneway`` (rows are directed unless
+        ``oneway`` is false).
+        """
+        graph = cls()
+        with path.open(newline="") as handle:
+            for row in csv.DictReader(handle):
+                source_coord = (float(row["source_lat"]), float(row["source_lon"]))
+                target_coord = (float(row["target_lat"]), float(row["target_lon"]))
+                source = graph.add_node(f"{source_coord[0]},{source_coord[1]}", *source_coord)
+                target = graph.add_node(f"{target_coord[0]},{target_coord[1]}", *target_coord)
+                meters = float(row.get("length_meters") or haversine_meters(source_coord, target_coord))
+                seconds = _edge_seconds(row.get("travel_time_seconds"), meters, row.get("speed_kph"), default_speed_kph)
+                graph.add_edge(source, target, seconds, meters)
+                if row.get("oneway", "true").strip().lower() not in _TRUE_VALUES:
+                    graph.add_edge(target, source, seconds, meters)
+        return graph
+
+    def nearest_node(self, lat: float, lon: float, max_distance_meters: float = math.inf) -> tuple[int, float] | None:
+        """Return the nearest node index and its distance in meters, or None if no node is within range."""
+        if self._extent is None:
+            return None
+        row, col = self._bucket(lat, lon)
+        min_row, min_col, max_row, max_col = self._extent
+        max_radius = max(abs(row - min_row), abs(row - max_row), abs(col - min_col), abs(col - max_col))
+        # Lower bound on the distance covered by one ring of buckets (longitude shrinks towards the poles).
+        ring_meters = self._bucket_degrees * 111_000 * max(math.cos(math.radians(lat)), 0.01)
+
+        best: tuple[int, float] | None = None
+        for radius in range(max_radius + 1):
+            if (radius - 1) * ring_meters > min(max_distance_meters, best[1] if best else math.inf):
+                break
+            for bucket in self._ring(row, col, radius):
+                for index in self._buckets.get(bucket, ()):
+                    distance = haversine_meters((lat, lon), self.coords[index])
+                    if best is None or distance < best[1]:
+                        best = (index, distance)
+        if best is None or best[1] > max_distance_meters:
+            return None
+        return best
+
+    def shortest_paths(self, source: int, targets: set[int]) -> dict[int, tuple[float, float]]:
+        """One-to-many Dijkstra returning (seconds, meters) for every reachable target."""
+        remaining = set(targets)
+        settled: dict[int, tuple[float, float]] = {}
+        queue: list[tuple[float, float, int]] = [(0.0, 0.0, source)]
+        best = {source: 0.0}
+        while queue and remaining:
+            seconds, meters, node = heapq.heappop(queue)
+            if node in settled:
+                continue
+            settled[node] = (seconds, meters)
+            remaining.discard(node)
+            for target, edge_seconds, edge_meters in self.adjacency[node]:
+                candidate = seconds + edge_seconds
+                if candidate < best.get(target, math.inf):
+                    best[target] = candidate
+                    heapq.heappush(queue, (candidate, meters + edge_meters, target))
+        return {target: settled[target] for target in targets if target in settled}
+
+    @staticmethod
+    def _ring(row: int, col: int, radius: int) -> list[tuple[int, int]]:
+        if radius == 0:
+            return [(row, col)]
+        top_bottom = [(r, c) for r in (row - radius, row + radius) for c in range(col - radius, col + radius + 1)]
+        sides = [(r, c) for c in (col - radius, col + radius) for r in range(row - radius + 1, row + radius)]
+        return top_bottom + sides
+
+    def _bucket(self, lat: float, lon: float) -> tuple[int, int]:
+        return (math.floor(lat / self._bucket_degrees), math.floor(lon / self._bucket_degrees))
+
+
+def _edge_seconds(travel_time: str | None, meters: float, speed_kph: str | None, default_speed_kph: float) -> float:
+    if travel_time:
+        return float(travel_time)
+    speed = float(speed_kph) if speed_kph else default_speed_kph
+    return meters / (speed * 1000 / 3600)
+
+
+class OfflineRouteMatrixProvider(RouteMatrixProvider):
+    """Compute route matrices on a local road graph, without network access.
+
+    Requests have no element limit, so each matrix arrives whole and every distinct origin node is searched once.
+    """
+
+    def __init__(
+        self,
+        graph: RoadGraph,
+        access_speed_kph: float = 20.0,
+        max_snap_distance_meters: float = 2000.0,
+    ) -> None:
+        """Create the provider.
+
+        Args:
+            graph: Road graph to route on.
+            access_speed_kph: Speed used for the straight-line leg between a coordinate and its nearest node.
+                Defaults to 20.
+            max_snap_distance_meters: Coordinates farther than this from any node are treated as unroutable.
+                Defaults to 2000.
+        """
+        self._graph = graph
+        self._access_speed_mps = access_speed_kph * 1000 / 3600
+        self._max_snap_distance_meters = max_snap_distance_meters
+
+    def element_limit(self, routing_preference: routing_v2.RoutingPreference) -> int | None:
+        return None
+
+    async def compute_route_matrix(
+        self,
+        request: routing_v2.ComputeRouteMatrixRequest,
+        metadata: Sequence[tuple[str, str]] = (),
+    ) -> AsyncIterator[routing_v2.RouteMatrixElement]:
+        origins, destinations = request_coordinates(request)
+        # Dijkstra is CPU-bound, keep the event loop responsive while it runs.
+        elements = await asyncio.to_thread(self._compute_elements, origins, destinations)
+        return stream_elements(elements)
+
+    def _compute_elements(
+        self, origins: list[Coordinate], destinations: list[Coordinate]
+    ) -> list[routing_v2.RouteMatrixElement]:
+        origin_snaps = [self._snap(coord) for coord in origins]
+        destination_snaps = [self._snap(coord) for coord in destinations]
+        target_nodes = {snap[0] for snap in destination_snaps if snap is not None}
+
+        paths_by_node: dict[int, dict[int, tuple[float, float]]] = {}
+        elements: list[routing_v2.RouteMatrixElement] = []
+        for o_index, origin_snap in enumerate(origin_snaps):
+            if origin_snap is not None and origin_snap[0] not in paths_by_node:
+                paths_by_node[origin_snap[0]] = self._graph.shortest_paths(origin_snap[0], target_nodes)
+            for d_index, destination_snap in enumerate(destination_snaps):
+                path = None
+                if origin_snap is not None and destination_snap is not None:
+                    path = paths_by_node[origin_snap[0]].get(destination_snap[0])
+                if origin_snap is None or destination_snap is None or path is None:
+                    # Unreachable pairs carry a final status like the Routes API, so callers skip them, not retry.
+                    elements.append(make_element(o_index, d_index, 0, status_code=NOT_FOUND))
+                    continue
+                access_meters = origin_snap[1] + destination_snap[1]
+                elements.append(
+                    make_element(
+                        o_index,
+                        d_index,
+                        duration_seconds=path[0] + access_meters / self._access_speed_mps,
+                        distance_meters=round(path[1] + access_meters),
+                    )
+                )
+        return elements
+
+    def _snap(self, coord: Coordinate) -> tuple[int, float] | None:
+        return self._graph.nearest_node(*coord, max_distance_meters=self._max_snap_distance_meters)
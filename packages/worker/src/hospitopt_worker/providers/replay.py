@@ -0,0 +1,144 @@
+"""Record-and-replay route matrix providers for reproducible benchmarks."""
+
+import asyncio
+import gzip
+import json
+import threading
+from collections.abc import AsyncIterable, AsyncIterator, Sequence
+from pathlib import Path
+from typing import IO, Any, Literal
+
+from google.maps import routing_v2
+
+from hospitopt_worker.providers.base import (
+    RouteMatrixProvider,
+    RoutingClient,
+    element_limit,
+    make_element,
+    request_coordinates,
+    routes_api_element_limit,
+    stream_elements,
+)
+
+
+def _request_key(request: routing_v2.ComputeRouteMatrixRequest) -> str:
+    """Stable key of a request, ignoring the departure time which changes on every call."""
+    origins, destinations = request_coordinates(request)
+    return json.dumps(
+        [origins, destinations, int(request.travel_mode), int(request.routing_preference)],
+        separators=(",", ":"),
+    )
+
+
+def _open(path: Path, mode: Literal["r", "a"]) -> IO[str]:
+    if path.suffix != ".gz":
+        return path.open(mode, encoding="utf-8")
+    if mode == "a":
+        return gzip.open(path, "at", encoding="utf-8")
+    return gzip.open(path, "rt", encoding="utf-8")
+
+
+class RecordingProvider(RouteMatrixProvider):
+    """Wrap a routing client and persist every request with its streamed elements.
+
+    Recordings are JSON Lines (gzip-compressed when the path ends in ``.gz``), one line per request holding the
+    request key, the element limit of the wrapped client and the elements as
+    ``[origin_index, destination_index, seconds, meters, status_code]``. Concurrent streams append their lines
+    one at a time, so gzip members never interleave.
+    """
+
+    def __init__(self, inner: RoutingClient, path: Path) -> None:
+        self._inner = inner
+        self._path = path
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()  # appends run in worker threads
+
+    def element_limit(self, routing_preference: routing_v2.RoutingPreference) -> int | None:
+        return element_limit(self._inner, routing_preference)
+
+    async def compute_route_matrix(
+        self,
+        request: routing_v2.ComputeRouteMatrixRequest,
+        metadata: Sequence[tuple[str, str]] = (),
+    ) -> AsyncIterator[routing_v2.RouteMatrixElement]:
+        stream = await self._inner.compute_route_matrix(request=request, metadata=metadata)
+        return self._record(request, stream)
+
+    async def _record(
+        self,
+        request: routing_v2.ComputeRouteMatrixRequest,
+        stream: AsyncIterable[routing_v2.RouteMatrixElement],
+    ) -> AsyncIterator[routing_v2.RouteMatrixElement]:
+        elements: list[list[Any]] = []
+        async for element in stream:
+            elements.append(
+                [
+                    element.origin_index,
+                    element.destination_index,
+                    element.duration.total_seconds(),
+                    element.distance_meters,
+                    element.status.code if element.status else 0,
+                ]
+            )
+            yield element
+        record = {
+            "key": _request_key(request),
+            "max_elements": self.element_limit(request.routing_preference),
+            "elements": elements,
+        }
+        line = json.dumps(record, separators=(",", ":"))
+        await asyncio.to_thread(self._append, line)
+
+    def _append(self, line: str) -> None:
+        with self._lock, _open(self._path, "a") as handle:
+            handle.write(line + "\n")
+
+
+class ReplayProvider(RouteMatrixProvider):
+    """Serve recorded route matrices back deterministically.
+
+    Repeated requests are answered with their recordings in order; once exhausted, the last recording is reused.
+    Matrices are split with the element limit they were recorded with, so replayed requests match recorded ones.
+    """
+
+    def __init__(self, path: Path, latency_seconds: float = 0.0) -> None:
+        """Load a recording.
+
+        Args:
+            path: Recording written by RecordingProvider.
+            latency_seconds: Delay injected before each response stream starts. Defaults to 0.
+        """
+        self._latency_seconds = latency_seconds
+        self._recordings: dict[str, list[list[list[Any]]]] = {}
+        self._served: dict[str, int] = {}
+        self._element_limits: dict[int, int | None] = {}
+        with _open(path, "r") as handle:
+            for line in handle:
+                if line.strip():
+                    record = json.loads(line)
+                    self._recordings.setdefault(record["key"], []).append(record["elements"])
+                    if "max_elements" in record:
+                        self._element_limits[json.loads(record["key"])[3]] = record["max_elements"]
+
+    def element_limit(self, routing_preference: routing_v2.RoutingPreference) -> int | None:
+        # Recordings without a limit were made through the Routes API.
+        return self._element_limits.get(int(routing_preference), routes_api_element_limit(routing_preference))
+
+    async def compute_route_matrix(
+        self,
+        request: routing_v2.ComputeRouteMatrixRequest,
+        metadata: Sequence[tuple[str, str]] = (),
+    ) -> AsyncIterator[routing_v2.RouteMatrixElement]:
+        key = _request_key(request)
+        recordings = self._recordings.get(key)
+        if not recordings:
+            raise LookupError(f"No recorded route matrix for request {key}")
+        served = self._served.get(key, 0)
+        self._served[key] = served + 1
+        elements = recordings[min(served, len(recordings) - 1)]
+        if self._latency_seconds:
+            await asyncio.sleep(self._latency_seconds)
+        return stream_elements(
+            make_element(origin, destination, seconds, distance_meters=meters, status_code=code)
+            for origin, destination, seconds, meters, code in elements
+        )
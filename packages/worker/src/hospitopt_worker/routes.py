@@ -1,10 +1,22 @@
 """Google Routes API helpers for travel-time matrices."""
 
+import asyncio
+import logging
 import math
+import random
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Callable, Collection, Coroutine, Sequence
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta, timezone
+from typing import Literal, Protocol, TypeVar
+from uuid import UUID
 
+import numpy as np
+from google.api_core import exceptions as core_exceptions
 from google.maps import routing_v2
 from google.type import latlng_pb2
+from opentelemetry import trace
 
 from hospitopt_core.domain.models import (
     Ambulance,
@@ -16,125 +28,1636 @@ from hospitopt_core.domain.models import (
     PatientIndex,
     RouteMatrixEntry,
 )
+from hospitopt_worker.cache import MatrixCache
+from hospitopt_worker.estimate import TravelTimeEstimator
+from hospitopt_worker.grid import HospitalGridTable
+from hospitopt_worker.providers.base import RoutingClient, element_limit
+from hospitopt_worker.usage import ElementUsage, RoutingUsage
+
+logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
+
+Coordinate = tuple[float, float]
+
+# DEADLINE_EXCEEDED, ABORTED, RESOURCE_EXHAUSTED, INTERNAL and UNAVAILABLE are transient and worth retrying.
+RETRYABLE_STATUS_CODES = frozenset({4, 8, 10, 13, 14})
+ResultT = TypeVar("ResultT")
+
+RETRYABLE_ERRORS = (
+    core_exceptions.ResourceExhausted,
+    core_exceptions.TooManyRequests,
+    core_exceptions.ServiceUnavailable,
+    core_exceptions.DeadlineExceeded,
+    core_exceptions.InternalServerError,
+    core_exceptions.Aborted,
+)
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a per-minute rate."""
+
+    def __init__(self, rate_per_minute: float, capacity: float | None = None) -> None:
+        """Create a full bucket.
+
+        Args:
+            rate_per_minute: Tokens added per minute.
+            capacity: Maximum number of tokens. Defaults to one minute worth of tokens.
+        """
+        self.rate_per_second = rate_per_minute / 60
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """Wait until ``tokens`` are available and take them. Requests larger than the capacity take it all."""
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_second)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate_per_second)
+
+
+class RequestHedger:
+    """Duplicates requests that outlive a percentile of recent latencies; the first complete response wins.
+
+    Duplicates are capped at ``max_hedge_fraction`` of all requests so hedging trims the latency tail without
+    multiplying quota usage. The ``requests``, ``hedged`` and ``hedge_wins`` counters are exported as metrics.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        min_samples: int = 20,
+        window: int = 200,
+        max_hedge_fraction: float = 0.05,
+        min_delay_seconds: float = 0.1,
+    ) -> None:
+        """Create a hedger.
+
+        Args:
+            percentile: Latency percentile after which a duplicate is fired. Defaults to 95.
+            min_samples: Latencies needed before hedging starts. Defaults to 20.
+            window: Number of recent latencies kept. Defaults to 200.
+            max_hedge_fraction: Maximum share of requests that may be duplicated. Defaults to 0.05.
+            min_delay_seconds: Lower bound of the hedge delay. Defaults to 0.1.
+        """
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.max_hedge_fraction = max_hedge_fraction
+        self.min_delay_seconds = min_delay_seconds
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._latencies: deque[float] = deque(maxlen=window)
+
+    @property
+    def hedge_rate(self) -> float:
+        """Share of requests that were duplicated."""
+        return self.hedged / self.requests if self.requests else 0.0
+
+    def hedge_delay(self) -> float | None:
+        """Seconds after which a request is duplicated, or None while too few latencies are known."""
+        if len(self._latencies) < self.min_samples:
+            return None
+        return max(self.min_delay_seconds, float(np.percentile(self._latencies, self.percentile)))
+
+    async def run(
+        self,
+        request: Callable[[], Coroutine[None, None, ResultT]],
+        duplicate: Callable[[], Coroutine[None, None, ResultT]] | None = None,
+    ) -> ResultT:
+        """Await ``request``, racing it against ``duplicate`` (defaults to ``request``) once it is slow.
+
+        The first successful response wins and the other is cancelled. If both fail, the last error is raised.
+        """
+        self.requests += 1
+        started = time.monotonic()
+        primary: asyncio.Task[ResultT] = asyncio.ensure_future(request())
+        pending: set[asyncio.Task[ResultT]] = {primary}
+        try:
+            delay = self.hedge_delay()
+            if delay is not None:
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                if not done and self.hedged < self.max_hedge_fraction * self.requests:
+                    self.hedged += 1
+                    pending.add(asyncio.ensure_future((duplicate or request)()))
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                errors = {task: task.exception() for task in done}
+                winner = next((task for task, error in errors.items() if error is None), None)
+                if winner is not None:
+                    break
+                if not pending:
+                    raise next(iter(errors.values()))  # type: ignore[misc]
+        finally:
+            for task in pending:
+                task.cancel()
+        self._latencies.append(time.monotonic() - started)
+        if winner is not primary:
+            self.hedge_wins += 1
+        return winner.result()
+
+
+class RouteMatrixScheduler:
+    """Quota-aware scheduler for Route Matrix requests.
+
+    Token buckets cap requests and elements per minute, while an AIMD limit adapts the number of concurrent
+    requests: it grows additively on fast successes and shrinks multiplicatively on errors or slow responses.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = 3000,
+        elements_per_minute: float = 100_000,
+        min_concurrency: int = 1,
+        max_concurrency: int = 16,
+        latency_target_seconds: float = 10.0,
+        max_retries: int = 4,
+        backoff_base_seconds: float = 0.5,
+        backoff_max_seconds: float = 16.0,
+        hedger: RequestHedger | None = None,
+    ) -> None:
+        """Create a scheduler.
+
+        Args:
+            requests_per_minute: Route matrix requests per minute. Defaults to 3000.
+            elements_per_minute: Route matrix elements per minute. Defaults to 100000.
+            min_concurrency: Lower bound of the adaptive concurrency limit. Defaults to 1.
+            max_concurrency: Upper bound of the adaptive concurrency limit. Defaults to 16.
+            latency_target_seconds: Requests slower than this shrink the concurrency limit. Defaults to 10.
+            max_retries: Retries of transiently failed elements before they are dropped. Defaults to 4.
+            backoff_base_seconds: Base delay of the jittered exponential backoff. Defaults to 0.5.
+            backoff_max_seconds: Maximum delay of the jittered exponential backoff. Defaults to 16.
+            hedger: Optional hedger duplicating slow requests. Defaults to None.
+        """
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.latency_target_seconds = latency_target_seconds
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.hedger = hedger
+        self.concurrency_limit = float(max(min_concurrency, max_concurrency // 2))
+        self._requests = TokenBucket(requests_per_minute)
+        self._elements = TokenBucket(elements_per_minute)
+        self._in_flight = 0
+        self._condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def slot(self, elements: int) -> AsyncIterator[None]:
+        """Hold a request slot once request and element budgets and the concurrency limit allow it."""
+        await self.reserve(elements)
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < int(self.concurrency_limit))
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+    async def reserve(self, elements: int) -> None:
+        """Take one request and ``elements`` elements from the quota budgets."""
+        await self._requests.acquire(1)
+        await self._elements.acquire(elements)
+
+    def record(self, latency_seconds: float, failed: bool) -> None:
+        """Adapt the concurrency limit to an observed request outcome."""
+        if failed or latency_seconds > self.latency_target_seconds:
+            self.concurrency_limit = max(float(self.min_concurrency), self.concurrency_limit / 2)
+        else:
+            self.concurrency_limit = min(
+                float(self.max_concurrency), self.concurrency_limit + 1 / self.concurrency_limit
+            )
+
+    def backoff_seconds(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retry ``attempt``."""
+        return random.uniform(0, min(self.backoff_max_seconds, self.backoff_base_seconds * 2**attempt))  # nosec B311
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe after a cool-down."""
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout_seconds: float = 60.0) -> None:
+        """Create a closed breaker.
+
+        Args:
+            failure_threshold: Consecutive failures that open the circuit. Defaults to 3.
+            reset_timeout_seconds: Time the circuit stays open before a probe is let through. Defaults to 60.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self._failures = 0
+        self._opened_at: float | None = None
+
+    @property
+    def is_open(self) -> bool:
+        """Whether calls are currently being short-circuited."""
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        """Return whether a call may go through, letting one probe through per elapsed cool-down."""
+        if self._opened_at is None:
+            return True
+        now = time.monotonic()
+        if now - self._opened_at < self.reset_timeout_seconds:
+            return False
+        self._opened_at = now  # half-open: the next probe waits for another cool-down
+        return True
+
+    def record_success(self) -> None:
+        """Close the circuit."""
+        self._failures = 0
+        self._opened_at = None
+
+    def record_failure(self) -> None:
+        """Count a failure, opening the circuit once the threshold is reached."""
+        self._failures += 1
+        if self._failures >= self.failure_threshold:
+            if self._opened_at is None:
+                logger.warning("Opening routing circuit after %s consecutive failures.", self._failures)
+            self._opened_at = time.monotonic()
+
+
+class MinutesSink(Protocol):
+    """Receives travel times as soon as they are known, before the full tables are built."""
+
+    def add_patient_to_hospital(self, p_index: PatientIndex, h_index: HospitalIndex, minutes: int) -> None: ...
+
+    def add_ambulance_to_patient(self, a_index: AmbulanceIndex, p_index: PatientIndex, minutes: int) -> None: ...
+
+
+class _PendingRoute:
+    """Live routing task for one set of inputs, with the partial tables it has filled so far."""
+
+    def __init__(self, key: tuple[tuple[Coordinate, ...], ...], sink: MinutesSink | None = None) -> None:
+        self.key = key
+        self.sink = sink
+        self.patient_to_hospital: dict[tuple[PatientIndex, HospitalIndex], int] = {}
+        self.ambulance_to_patient: dict[tuple[AmbulanceIndex, PatientIndex], int] = {}
+        self.task: asyncio.Task[None] | None = None
+        self.detached = False
+        self.refreshed = True  # every row routed, no legs carried over
+
+    def add_patient_to_hospital(self, p_index: PatientIndex, h_index: HospitalIndex, minutes: int) -> None:
+        self.patient_to_hospital[(p_index, h_index)] = minutes
+        if self.sink is not None:
+            self.sink.add_patient_to_hospital(p_index, h_index, minutes)
+
+    def add_ambulance_to_patient(self, a_index: AmbulanceIndex, p_index: PatientIndex, minutes: int) -> None:
+        self.ambulance_to_patient[(a_index, p_index)] = minutes
+        if self.sink is not None:
+            self.sink.add_ambulance_to_patient(a_index, p_index, minutes)
+
+
+class RoutingFallback:
+    """Routing deadline and circuit breaker, with missing travel times estimated locally.
+
+    Live routing that misses the deadline keeps running in the background. Once it completes, its tables are held
+    for the next cycle with the same inputs and ``wait_for_refresh`` wakes up so the worker can re-solve.
+    """
+
+    def __init__(
+        self,
+        estimator: TravelTimeEstimator,
+        deadline_seconds: float = 20.0,
+        breaker: CircuitBreaker | None = None,
+    ) -> None:
+        """Create a fallback policy.
+
+        Args:
+            estimator: Local estimator used for pairs live routing did not answer in time.
+            deadline_seconds: Time budget for live routing per optimization cycle. Defaults to 20.
+            breaker: Circuit breaker guarding live routing. Defaults to a breaker with default thresholds.
+        """
+        self.estimator = estimator
+        self.deadline_seconds = deadline_seconds
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self._pending: _PendingRoute | None = None
+        self._late: tuple[tuple[tuple[Coordinate, ...], ...], MinutesTables] | None = None
+        self._refreshed = asyncio.Event()
+
+    async def wait_for_refresh(self, timeout: float) -> bool:
+        """Wait up to ``timeout`` seconds for late live routing results, returning whether they arrived."""
+        try:
+            await asyncio.wait_for(self._refreshed.wait(), timeout)
+        except TimeoutError:
+            return False
+        self._refreshed.clear()
+        return True
+
+    def estimate_tables(
+        self,
+        patient_coords: list[Coordinate],
+        hospital_coords: list[Coordinate],
+        ambulance_coords: list[Coordinate],
+        patient_to_hospital: dict[tuple[PatientIndex, HospitalIndex], int],
+        ambulance_to_patient: dict[tuple[AmbulanceIndex, PatientIndex], int],
+    ) -> MinutesTables:
+        """Complete partial tables with local estimates for every missing pair."""
+        p_to_h = dict(patient_to_hospital)
+        for (p_index, h_index), minutes in np.ndenumerate(
+            self.estimator.estimate_matrix(patient_coords, hospital_coords)
+        ):
+            p_to_h.setdefault((PatientIndex(p_index), HospitalIndex(h_index)), int(minutes))
+        a_to_p = dict(ambulance_to_patient)
+        for (a_index, p_index), minutes in np.ndenumerate(
+            self.estimator.estimate_matrix(ambulance_coords, patient_coords)
+        ):
+            a_to_p.setdefault((AmbulanceIndex(a_index), PatientIndex(p_index)), int(minutes))
+        return MinutesTables(ambulance_to_patient=a_to_p, patient_to_hospital=p_to_h, estimated=True)
+
+    def take_late_tables(self, key: tuple[tuple[Coordinate, ...], ...]) -> MinutesTables | None:
+        """Return tables routed after a missed deadline if they match ``key``, consuming them either way."""
+        late, self._late = self._late, None
+        if late is not None and late[0] == key:
+            return late[1]
+        return None
+
+    def start_live(
+        self,
+        key: tuple[tuple[Coordinate, ...], ...],
+        route: Callable[[_PendingRoute], Coroutine[None, None, None]],
+    ) -> _PendingRoute:
+        """Return the live routing task for ``key``, reusing one still running for the same inputs."""
+        if self._pending is not None:
+            if self._pending.key == key and self._pending.task is not None and not self._pending.task.done():
+                self._pending.detached = False
+                return self._pending
+            if self._pending.task is not None:
+                self._pending.task.cancel()
+        pending = _PendingRoute(key)
+        pending.task = asyncio.create_task(route(pending))
+        pending.task.add_done_callback(lambda task: self._on_done(pending, task))
+        self._pending = pending
+        return pending
+
+    def _on_done(self, pending: _PendingRoute, task: asyncio.Task[None]) -> None:
+        if self._pending is pending:
+            self._pending = None
+        if not pending.detached or task.cancelled():
+            return
+        if task.exception() is not None:
+            logger.warning("Background routing failed: %s", task.exception())
+            return
+        logger.info("Live travel times arrived after the routing deadline.")
+        self._late = (
+            pending.key,
+            MinutesTables(
+                ambulance_to_patient=pending.ambulance_to_patient, patient_to_hospital=pending.patient_to_hospital
+            ),
+        )
+        self._refreshed.set()
+
+
+class PrecisionTiers:
+    """Cheap first-pass travel times, refined with traffic-aware routing only near patients' deadlines.
+
+    A (patient, ambulance, hospital) triple whose first-pass travel time is far below or far above the patient's
+    deadline leads to the same feasibility decision at any precision, so only the legs of triples within the band
+    around the deadline are routed with TRAFFIC_AWARE_OPTIMAL. The travel time of a triple is the one the feasibility
+    check uses: both legs and the time until the ambulance is free.
+    """
+
+    def __init__(
+        self,
+        first_pass: Literal["traffic_unaware", "estimate"] = "traffic_unaware",
+        band_minutes: float = 10.0,
+        band_fraction: float = 0.25,
+    ) -> None:
+        """Create a tiering policy.
+
+        Args:
+            first_pass: TRAFFIC_UNAWARE routing or the local estimator for the cheap pass.
+                Defaults to "traffic_unaware".
+            band_minutes: Minimum half-width of the band around the deadline, in minutes. Defaults to 10.
+            band_fraction: Half-width of the band as a fraction of the deadline, when wider. Defaults to 0.25.
+        """
+        self.first_pass = first_pass
+        self.band_minutes = band_minutes
+        self.band_fraction = band_fraction
+
+    def band_for(self, deadline_minutes: int) -> float:
+        """Half-width of the refinement band for a patient deadline."""
+        return max(self.band_minutes, self.band_fraction * deadline_minutes)
+
+    def select(
+        self,
+        deadlines: list[int],
+        speed_factor: float,
+        patient_to_hospital: dict[tuple[PatientIndex, HospitalIndex], int],
+        ambulance_to_patient: dict[tuple[AmbulanceIndex, PatientIndex], int],
+        ambulance_delays: list[int] | None = None,
+    ) -> tuple[set[tuple[PatientIndex, HospitalIndex]], set[tuple[AmbulanceIndex, PatientIndex]]]:
+        """Return the patient -> hospital and ambulance -> patient legs of triples near their deadline.
+
+        Args:
+            deadlines: Deadline in minutes of every patient, by patient index.
+            speed_factor: Multiplier reducing travel time for priority transport.
+            patient_to_hospital: Best-known patient -> hospital minutes (traffic-aware where cached, else first-pass).
+            ambulance_to_patient: Best-known ambulance -> patient minutes (traffic-aware where cached, else
+                first-pass).
+            ambulance_delays: Optional minutes until each ambulance is free, by ambulance index. Defaults to None.
+
+        Returns:
+            Tuple of patient -> hospital and ambulance -> patient pairs to refine.
+        """
+        hospitals_by_patient: dict[PatientIndex, list[tuple[HospitalIndex, int]]] = {}
+        for (p_index, h_index), minutes in patient_to_hospital.items():
+            hospitals_by_patient.setdefault(p_index, []).append((h_index, minutes))
+        # Minutes until each ambulance reaches each patient, the part of a triple before the hospital leg.
+        arrivals_by_patient: dict[PatientIndex, list[tuple[AmbulanceIndex, float]]] = {}
+        for (a_index, p_index), minutes in ambulance_to_patient.items():
+            delay = ambulance_delays[a_index] if ambulance_delays is not None else 0
+            arrivals_by_patient.setdefault(p_index, []).append((a_index, minutes / speed_factor + delay))
+
+        refine_p_to_h: set[tuple[PatientIndex, HospitalIndex]] = set()
+        refine_a_to_p: set[tuple[AmbulanceIndex, PatientIndex]] = set()
+        for p_index, hospital_legs in hospitals_by_patient.items():
+            deadline = deadlines[p_index]
+            band = self.band_for(deadline)
+            for a_index, arrival in arrivals_by_patient.get(p_index, []):
+                for h_index, ph in hospital_legs:
+                    if abs(arrival + ph / speed_factor - deadline) <= band:
+                        refine_p_to_h.add((p_index, h_index))
+                        refine_a_to_p.add((a_index, p_index))
+        return refine_p_to_h, refine_a_to_p
+
+
+class RoutedLegs:
+    """Travel times of the latest live-routed cycle keyed by entity ids, carried over to rows left unchanged.
+
+    A leg is carried over while neither of its ends was added or changed since and both kept their coordinates.
+    Once the last cycle that routed every row is older than ``max_age_seconds``, nothing is carried over, so
+    every row is routed again and traffic changes are picked up.
+    """
+
+    def __init__(self, max_age_seconds: float = 300.0) -> None:
+        """Create an empty store.
+
+        Args:
+            max_age_seconds: How long legs are carried over before every row is routed again. Defaults to 300.
+        """
+        self.max_age_seconds = max_age_seconds
+        self._patient_to_hospital: dict[tuple[UUID, UUID], int] = {}
+        self._ambulance_to_patient: dict[tuple[UUID, UUID], int] = {}
+        self._coords: dict[UUID, Coordinate] = {}
+        self._refreshed_at: float | None = None  # when every row was last routed
+
+    def carry_over(
+        self,
+        patients: list[Patient],
+        hospitals: list[Hospital],
+        ambulances: list[Ambulance],
+        changed: Collection[UUID] | None,
+    ) -> MinutesTables:
+        """Return the legs between the given inputs that need no routing, indexed into them.
+
+        Args:
+            patients: Patients in index order.
+            hospitals: Hospitals in index order.
+            ambulances: Ambulances in index order.
+            changed: Ids of entities added or changed since the remembered cycle; None carries nothing over.
+        """
+        if (
+            changed is None
+            or self._refreshed_at is None
+            or time.monotonic() - self._refreshed_at > self.max_age_seconds
+        ):
+            return MinutesTables(ambulance_to_patient={}, patient_to_hospital={})
+
+        def _unchanged(entities: Sequence[Patient | Hospital | Ambulance]) -> list[tuple[int, UUID]]:
+            return [
+                (index, entity.id)
+                for index, entity in enumerate(entities)
+                if entity.id not in changed and self._coords.get(entity.id) == (entity.lat, entity.lon)
+            ]
+
+        kept_patients, kept_hospitals, kept_ambulances = (
+            _unchanged(patients),
+            _unchanged(hospitals),
+            _unchanged(ambulances),
+        )
+        patient_to_hospital = {
+            (PatientIndex(p_index), HospitalIndex(h_index)): minutes
+            for p_index, patient_id in kept_patients
+            for h_index, hospital_id in kept_hospitals
+            if (minutes := self._patient_to_hospital.get((patient_id, hospital_id))) is not None
+        }
+        ambulance_to_patient = {
+            (AmbulanceIndex(a_index), PatientIndex(p_index)): minutes
+            for a_index, ambulance_id in kept_ambulances
+            for p_index, patient_id in kept_patients
+            if (minutes := self._ambulance_to_patient.get((ambulance_id, patient_id))) is not None
+        }
+        return MinutesTables(ambulance_to_patient=ambulance_to_patient, patient_to_hospital=patient_to_hospital)
+
+    def remember(
+        self,
+        patients: list[Patient],
+        hospitals: list[Hospital],
+        ambulances: list[Ambulance],
+        tables: MinutesTables,
+        refreshed: bool,
+    ) -> None:
+        """Replace the store with the live tables of a cycle; ``refreshed`` tells whether it routed every row."""
+        self._patient_to_hospital = {
+            (patients[p_index].id, hospitals[h_index].id): minutes
+            for (p_index, h_index), minutes in tables.patient_to_hospital.items()
+        }
+        self._ambulance_to_patient = {
+            (ambulances[a_index].id, patients[p_index].id): minutes
+            for (a_index, p_index), minutes in tables.ambulance_to_patient.items()
+        }
+        entities: list[Patient | Hospital | Ambulance] = [*patients, *hospitals, *ambulances]
+        self._coords = {entity.id: (entity.lat, entity.lon) for entity in entities}
+        if refreshed:
+            self._refreshed_at = time.monotonic()
+
+    def forget(self) -> None:
+        """Drop every leg, e.g. after a cycle whose tables were estimated."""
+        self._patient_to_hospital = {}
+        self._ambulance_to_patient = {}
+        self._coords = {}
+        self._refreshed_at = None
+
+
+class RoutingContext:
+    """Long-lived routing state shared across optimization cycles."""
+
+    def __init__(
+        self,
+        grid_table: HospitalGridTable | None = None,
+        scheduler: RouteMatrixScheduler | None = None,
+        fallback: RoutingFallback | None = None,
+        estimator: TravelTimeEstimator | None = None,
+        matrix_cache: MatrixCache | None = None,
+        precision_tiers: PrecisionTiers | None = None,
+        routed_legs: RoutedLegs | None = None,
+    ) -> None:
+        """Create a routing context.
+
+        Args:
+            grid_table: Optional precomputed grid-to-hospital table used for patient -> hospital lookups.
+            scheduler: Optional quota-aware scheduler applied to every route matrix request.
+            fallback: Optional deadline and circuit breaker with local estimates for missing travel times.
+            estimator: Optional travel-time estimator trained on every live route matrix result.
+            matrix_cache: Optional pair-level cache read before live routing, e.g. kept warm by a prefetcher.
+            precision_tiers: Optional cheap first pass, refining only pairs near patients' deadlines.
+            routed_legs: Optional travel times of the previous cycle, carried over to rows left unchanged.
+        """
+        self.grid_table = grid_table
+        self.scheduler = scheduler
+        self.fallback = fallback
+        self.estimator = estimator
+        self.matrix_cache = matrix_cache
+        self.precision_tiers = precision_tiers
+        self.routed_legs = routed_legs
+        self.active_routes = 0  # on-demand routing calls in flight, background work yields to them
+
+
+def _dedupe_coords(
+    coords: list[Coordinate],
+    snap_resolution_degrees: float | None = None,
+) -> tuple[list[Coordinate], list[list[int]]]:
+    """Collapse duplicate coordinates, optionally after snapping them to a grid.
+
+    Args:
+        coords: List of (lat, lon) coordinates.
+        snap_resolution_degrees: Grid resolution in degrees. Coordinates falling in the same grid cell are merged.
+            Defaults to None, which only merges exact duplicates.
+
+    Returns:
+        Tuple of unique coordinates (first occurrence of each group) and, for every unique coordinate,
+        the original indices it represents.
+    """
+    unique: list[Coordinate] = []
+    groups: list[list[int]] = []
+    positions: dict[tuple[float, float], int] = {}
+    for index, (lat, lon) in enumerate(coords):
+        key: tuple[float, float] = (lat, lon)
+        if snap_resolution_degrees:
+            key = (round(lat / snap_resolution_degrees), round(lon / snap_resolution_degrees))
+        position = positions.get(key)
+        if position is None:
+            position = positions[key] = len(unique)
+            unique.append((lat, lon))
+            groups.append([])
+        groups[position].append(index)
+    return unique, groups
+
+
+def _rank_groups(groups: list[list[int]], priority: list[float] | None) -> list[float]:
+    """Urgency of every deduplicated coordinate: the most urgent of the original indices it represents."""
+    if priority is None:
+        return [math.inf] * len(groups)
+    return [min(priority[index] for index in group) for group in groups]
+
+
+def _sort_by_rank(
+    coords: list[Coordinate], groups: list[list[int]], rank: list[float]
+) -> tuple[list[Coordinate], list[list[int]], list[float]]:
+    order = sorted(range(len(coords)), key=rank.__getitem__)
+    return [coords[i] for i in order], [groups[i] for i in order], [rank[i] for i in order]
+
+
+def patient_urgency(patients: list[Patient], now: datetime | None = None) -> list[float]:
+    """Minutes each patient has left before their deadline, i.e. the deadline minus the time since registration.
+
+    Args:
+        patients: Patients in index order.
+        now: Reference time. Defaults to now.
+
+    Returns:
+        Remaining minutes by patient index; lower is more urgent.
+    """
+    now = now or datetime.now(timezone.utc)
+    return [
+        patient.time_to_hospital_minutes - (now - patient.registered_at).total_seconds() / 60 for patient in patients
+    ]
+
+
+def _build_request(
+    origins: list[Coordinate],
+    destinations: list[Coordinate],
+    travel_mode: routing_v2.RouteTravelMode,
+    routing_preference: routing_v2.RoutingPreference,
+    departure_time: datetime | None = None,
+) -> routing_v2.ComputeRouteMatrixRequest:
+    if departure_time is None:
+        # otherwise it complains that departure time is in the past.
+        departure_time = datetime.now(timezone.utc) + timedelta(seconds=30)
+    return routing_v2.ComputeRouteMatrixRequest(
+        origins=[
+            routing_v2.RouteMatrixOrigin(
+                waypoint=routing_v2.Waypoint(
+                    location=routing_v2.Location(lat_lng=latlng_pb2.LatLng(latitude=lat, longitude=lon))
+                )
+            )
+            for (lat, lon) in origins
+        ],
+        destinations=[
+            routing_v2.RouteMatrixDestination(
+                waypoint=routing_v2.Waypoint(
+                    location=routing_v2.Location(lat_lng=latlng_pb2.LatLng(latitude=lat, longitude=lon))
+                )
+            )
+            for (lat, lon) in destinations
+        ],
+        travel_mode=travel_mode,
+        routing_preference=routing_v2.RoutingPreference(routing_preference),
+        departure_time=departure_time,
+    )
+
+
+async def _request_block(
+    client: RoutingClient,
+    origins: list[Coordinate],
+    destinations: list[Coordinate],
+    travel_mode: routing_v2.RouteTravelMode,
+    routing_preference: routing_v2.RoutingPreference,
+    departure_time: datetime | None = None,
+    usage: ElementUsage | None = None,
+) -> tuple[dict[tuple[int, int], int], set[tuple[int, int]]]:
+    """Send one route matrix request, returning minutes by local pair and the retryable failed pairs."""
+    minutes: dict[tuple[int, int], int] = {}
+    failed: set[tuple[int, int]] = set()
+    request = _build_request(origins, destinations, travel_mode, routing_preference, departure_time)
+    if usage is not None:
+        usage.requests += 1
+    attributes = {
+        "hospitopt.origins": len(origins),
+        "hospitopt.destinations": len(destinations),
+        "hospitopt.routing_preference": routing_v2.RoutingPreference(routing_preference).name,
+    }
+    with tracer.start_as_current_span("routes.compute_route_matrix", attributes=attributes) as span:
+        try:
+            stream = await client.compute_route_matrix(
+                request=request,
+                metadata=[("x-goog-fieldmask", "duration,distance_meters,origin_index,destination_index,status")],
+            )
+            async for element in stream:
+                pair = (element.origin_index, element.destination_index)
+                if element.status and element.status.code != 0:
+                    if element.status.code in RETRYABLE_STATUS_CODES:
+                        failed.add(pair)
+                    continue
+                minutes[pair] = max(1, int(math.ceil(element.duration.total_seconds() / 60)))
+        except Exception:
+            if usage is not None:
+                usage.failed_requests += 1
+                usage.failed += len(origins) * len(destinations)
+            raise
+        # Only transient element statuses are retried (a broken stream raises and is retried as a whole). Pairs
+        # rejected outright or left out of a complete stream are unroutable and retrying them cannot help.
+        failed -= minutes.keys()
+        skipped = {
+            (o, d) for o in range(len(origins)) for d in range(len(destinations)) if (o, d) not in minutes
+        } - failed
+        span.set_attribute("hospitopt.answered", len(minutes))
+        span.set_attribute("hospitopt.failed", len(failed))
+        span.set_attribute("hospitopt.unroutable", len(skipped))
+    if usage is not None:
+        usage.billed += len(origins) * len(destinations)
+        usage.failed += len(failed)
+        usage.unroutable += len(skipped)
+    return minutes, failed
+
+
+def _record_cache_hits(span: trace.Span, hits: int, elements: int) -> None:
+    """Annotate a routing span with how many of its elements the matrix cache answered."""
+    span.set_attribute("hospitopt.cache_hits", hits)
+    span.set_attribute("hospitopt.cache_hit_ratio", hits / elements if elements else 0.0)
+
+
+def _group_pending(pending: set[tuple[int, int]]) -> list[tuple[list[int], list[int]]]:
+    """Group pending pairs into origin x destination blocks, merging origins that miss the same destinations."""
+    by_origin: dict[int, set[int]] = {}
+    for origin, destination in pending:
+        by_origin.setdefault(origin, set()).add(destination)
+    blocks: dict[frozenset[int], list[int]] = {}
+    for origin, destinations in by_origin.items():
+        blocks.setdefault(frozenset(destinations), []).append(origin)
+    return [(sorted(origins), sorted(destinations)) for destinations, origins in blocks.items()]
+
+
+async def _route_chunk(
+    client: RoutingClient,
+    origins: list[Coordinate],
+    destinations: list[Coordinate],
+    travel_mode: routing_v2.RouteTravelMode,
+    routing_preference: routing_v2.RoutingPreference,
+    scheduler: RouteMatrixScheduler | None = None,
+    departure_time: datetime | None = None,
+    usage: ElementUsage | None = None,
+) -> dict[tuple[int, int], int]:
+    """Route one origin x destination chunk.
+
+    Without a scheduler a single request is sent and failed elements are skipped. With a scheduler, requests are
+    rate limited and only elements with a transient status, or blocks whose request failed, are retried with
+    jittered exponential backoff.
+    """
+    if scheduler is None:
+        minutes, _ = await _request_block(
+            client, origins, destinations, travel_mode, routing_preference, departure_time, usage
+        )
+        return minutes
+
+    minutes = {}
+    pending = {(o, d) for o in range(len(origins)) for d in range(len(destinations))}
+    attempts = 0
+    while pending and attempts <= scheduler.max_retries:
+        if attempts:
+            await asyncio.sleep(scheduler.backoff_seconds(attempts))
+        attempts += 1
+        failed: set[tuple[int, int]] = set()
+        for block_origins, block_destinations in _group_pending(pending):
+            elements = len(block_origins) * len(block_destinations)
+            block_origin_coords = [origins[o] for o in block_origins]
+            block_destination_coords = [destinations[d] for d in block_destinations]
+
+            async def _send() -> tuple[dict[tuple[int, int], int], set[tuple[int, int]]]:
+                return await _request_block(
+                    client,
+                    block_origin_coords,
+                    block_destination_coords,
+                    travel_mode,
+                    routing_preference,
+                    departure_time,
+                    usage,
+                )
+
+            async def _send_duplicate() -> tuple[dict[tuple[int, int], int], set[tuple[int, int]]]:
+                # Duplicates share the quota budgets but not the concurrency limit, which they would only deadlock.
+                await scheduler.reserve(elements)
+                return await _send()
+
+            async with scheduler.slot(elements):
+                started = time.monotonic()
+                try:
+                    if scheduler.hedger is None:
+                        block_minutes, block_failed = await _send()
+                    else:
+                        block_minutes, block_failed = await scheduler.hedger.run(_send, _send_duplicate)
+                except RETRYABLE_ERRORS as exc:
+                    logger.warning("Route matrix request failed (%s), will retry.", exc)
+                    scheduler.record(time.monotonic() - started, failed=True)
+                    failed.update(
+                        pair for pair in pending if pair[0] in block_origins and pair[1] in block_destinations
+                    )
+                    continue
+                scheduler.record(time.monotonic() - started, failed=bool(block_failed))
+            for (o, d), value in block_minutes.items():
+                if (block_origins[o], block_destinations[d]) in pending:
+                    minutes[(block_origins[o], block_destinations[d])] = value
+            failed.update(
+                (block_origins[o], block_destinations[d])
+                for o, d in block_failed
+                if (block_origins[o], block_destinations[d]) in pending
+            )
+        pending = failed
+    if pending:
+        logger.warning("Dropping %s route matrix elements after %s attempts.", len(pending), attempts)
+    return minutes
 
 
 async def _compute_route_matrix_minutes(
-    client: routing_v2.RoutesAsyncClient,
-    origins: list[tuple[float, float]],
-    destinations: list[tuple[float, float]],
+    client: RoutingClient,
+    origins: list[Coordinate],
+    destinations: list[Coordinate],
     travel_mode: routing_v2.RouteTravelMode = routing_v2.RouteTravelMode.DRIVE,
     routing_preference: routing_v2.RoutingPreference = routing_v2.RoutingPreference.TRAFFIC_AWARE_OPTIMAL,
+    snap_resolution_degrees: float | None = None,
+    scheduler: RouteMatrixScheduler | None = None,
+    sink: Callable[[list[RouteMatrixEntry]], None] | None = None,
+    departure_time: datetime | None = None,
+    origin_priority: list[float] | None = None,
+    destination_priority: list[float] | None = None,
+    usage: ElementUsage | None = None,
 ) -> list[RouteMatrixEntry]:
     """Compute a route matrix and return duration minutes by origin/destination index.
 
     Args:
-        client: Google Routes async client.
+        client: Routing client (Google Routes async client or a RouteMatrixProvider).
         origins: List of (lat, lon) origin coordinates.
         destinations: List of (lat, lon) destination coordinates.
         travel_mode: Google Routes travel mode. Defaults to DRIVE.
         routing_preference: Google Routes routing preference. Defaults to TRAFFIC_AWARE_OPTIMAL.
+        snap_resolution_degrees: Grid resolution in degrees used to merge nearby coordinates before routing.
+            Exact duplicates are always merged. Defaults to None.
+        scheduler: Optional quota-aware scheduler. When set, chunks run concurrently under its rate limits and
+            transient failures are retried. Defaults to None (sequential, single attempt).
+        sink: Optional callback receiving the entries of each chunk as soon as it completes. Defaults to None.
+        departure_time: Departure time of the routes. Defaults to 30 seconds from now.
+        origin_priority: Optional urgency of every origin, lower first. Chunks holding the most urgent origins
+            or destinations are routed first so partial results cover them. Defaults to None.
+        destination_priority: Optional urgency of every destination, lower first. Defaults to None.
+        usage: Optional counter of the requests and elements spent on this matrix. Defaults to None.
 
     Returns:
         List of RouteMatrixEntry with duration minutes for each origin/destination pair.
     """
     entries: list[RouteMatrixEntry] = []
 
-    # Google Routes limits to 100 elements when using TRAFFIC_AWARE_OPTIMAL.
-    # Batch requests while preserving global indices.
-    max_elements = 100
-    if routing_preference == routing_v2.RoutingPreference.TRAFFIC_AWARE_OPTIMAL:
-        max_elements = 100
-
-    def _chunk_coords(coords: list[tuple[float, float]], size: int) -> list[tuple[int, list[tuple[float, float]]]]:
+    def _chunk_coords(coords: list[Coordinate], size: int) -> list[tuple[int, list[Coordinate]]]:
         return [(start, coords[start : start + size]) for start in range(0, len(coords), size)]
 
     if not origins or not destinations:
         return entries
 
-    max_origins = max(1, min(len(origins), max_elements))
+    # Ambulances sharing a base and casualties sharing a scene are routed once and fanned back out.
+    unique_origins, origin_groups = _dedupe_coords(origins, snap_resolution_degrees)
+    unique_destinations, destination_groups = _dedupe_coords(destinations, snap_resolution_degrees)
+    origin_rank = _rank_groups(origin_groups, origin_priority)
+    if origin_priority is not None:
+        unique_origins, origin_groups, origin_rank = _sort_by_rank(unique_origins, origin_groups, origin_rank)
+    destination_rank = _rank_groups(destination_groups, destination_priority)
+    if destination_priority is not None:
+        unique_destinations, destination_groups, destination_rank = _sort_by_rank(
+            unique_destinations, destination_groups, destination_rank
+        )
+    if usage is not None:
+        usage.requested += len(origins) * len(destinations)
+        usage.skipped += len(origins) * len(destinations) - len(unique_origins) * len(unique_destinations)
+
+    # Batch requests within the provider's element limit while preserving global indices.
+    max_elements = element_limit(client, routing_preference) or len(unique_origins) * len(unique_destinations)
+    max_origins = max(1, min(len(unique_origins), max_elements))
     max_destinations = max(1, max_elements // max_origins)
 
-    for origin_offset, origin_chunk in _chunk_coords(origins, max_origins):
-        for dest_offset, dest_chunk in _chunk_coords(destinations, max_destinations):
-            request = routing_v2.ComputeRouteMatrixRequest(
-                origins=[
-                    routing_v2.RouteMatrixOrigin(
-                        waypoint=routing_v2.Waypoint(
-                            location=routing_v2.Location(lat_lng=latlng_pb2.LatLng(latitude=lat, longitude=lon))
-                        )
-                    )
-                    for (lat, lon) in origin_chunk
-                ],
-                destinations=[
-                    routing_v2.RouteMatrixDestination(
-                        waypoint=routing_v2.Waypoint(
-                            location=routing_v2.Location(lat_lng=latlng_pb2.LatLng(latitude=lat, longitude=lon))
-                        )
-                    )
-                    for (lat, lon) in dest_chunk
-                ],
-                travel_mode=travel_mode,
-                routing_preference=routing_v2.RoutingPreference(routing_preference),
-                departure_time=datetime.now(timezone.utc)
-                + timedelta(seconds=30),  # otherwise it complains that departure time is in the past.
+    chunks = [
+        (origin_offset, origin_chunk, dest_offset, dest_chunk)
+        for origin_offset, origin_chunk in _chunk_coords(unique_origins, max_origins)
+        for dest_offset, dest_chunk in _chunk_coords(unique_destinations, max_destinations)
+    ]
+    if origin_priority is not None or destination_priority is not None:
+        chunks.sort(
+            key=lambda chunk: min(
+                min(origin_rank[chunk[0] : chunk[0] + len(chunk[1])]),
+                min(destination_rank[chunk[2] : chunk[2] + len(chunk[3])]),
             )
-            stream = await client.compute_route_matrix(
-                request=request,
-                metadata=[("x-goog-fieldmask", "duration,distance_meters,origin_index,destination_index")],
+        )
+
+    async def _run_chunk(
+        origin_offset: int, origin_chunk: list[Coordinate], dest_offset: int, dest_chunk: list[Coordinate]
+    ) -> None:
+        chunk_minutes = await _route_chunk(
+            client, origin_chunk, dest_chunk, travel_mode, routing_preference, scheduler, departure_time, usage
+        )
+        chunk_entries = [
+            RouteMatrixEntry(
+                origin_index=origin_index,
+                destination_index=destination_index,
+                duration_minutes=duration_minutes,
             )
-            async for element in stream:
-                if element.status and element.status.code != 0:
-                    # Skip invalid pairs
-                    continue
-                entries.append(
-                    RouteMatrixEntry(
-                        origin_index=origin_offset + element.origin_index,
-                        destination_index=dest_offset + element.destination_index,
-                        duration_minutes=max(1, int(math.ceil(element.duration.total_seconds() / 60))),
-                    )
+            for (origin_local, dest_local), duration_minutes in chunk_minutes.items()
+            for origin_index in origin_groups[origin_offset + origin_local]
+            for destination_index in destination_groups[dest_offset + dest_local]
+        ]
+        entries.extend(chunk_entries)
+        if sink is not None:
+            sink(chunk_entries)
+
+    if scheduler is None:
+        for chunk in chunks:
+            await _run_chunk(*chunk)
+    else:
+        await asyncio.gather(*(_run_chunk(*chunk) for chunk in chunks))
+    return entries
+
+
+async def _route_pairs(
+    client: RoutingClient,
+    origins: list[Coordinate],
+    destinations: list[Coordinate],
+    pairs: set[tuple[int, int]],
+    travel_mode: routing_v2.RouteTravelMode = routing_v2.RouteTravelMode.DRIVE,
+    snap_resolution_degrees: float | None = None,
+    scheduler: RouteMatrixScheduler | None = None,
+    sink: Callable[[list[RouteMatrixEntry]], None] | None = None,
+    departure_time: datetime | None = None,
+    routing_preference: routing_v2.RoutingPreference = routing_v2.RoutingPreference.TRAFFIC_AWARE_OPTIMAL,
+    origin_priority: list[float] | None = None,
+    destination_priority: list[float] | None = None,
+    usage: ElementUsage | None = None,
+) -> list[RouteMatrixEntry]:
+    """Route a subset of an origin x destination matrix, in blocks of origins missing the same destinations.
+
+    Returned and sunk entries are indexed into ``origins`` and ``destinations``. With priorities, blocks holding
+    the most urgent origins or destinations are started first.
+    """
+    entries: list[RouteMatrixEntry] = []
+
+    async def _route_block(block_origins: list[int], block_destinations: list[int]) -> None:
+        def _remap(block_entries: list[RouteMatrixEntry]) -> list[RouteMatrixEntry]:
+            return [
+                RouteMatrixEntry(
+                    origin_index=block_origins[e.origin_index],
+                    destination_index=block_destinations[e.destination_index],
+                    duration_minutes=e.duration_minutes,
                 )
+                for e in block_entries
+            ]
+
+        def _block_sink(block_entries: list[RouteMatrixEntry]) -> None:
+            if sink is not None:
+                sink(_remap(block_entries))
+
+        routed = await _compute_route_matrix_minutes(
+            client,
+            origins=[origins[o] for o in block_origins],
+            destinations=[destinations[d] for d in block_destinations],
+            travel_mode=travel_mode,
+            routing_preference=routing_preference,
+            snap_resolution_degrees=snap_resolution_degrees,
+            scheduler=scheduler,
+            sink=_block_sink,
+            departure_time=departure_time,
+            origin_priority=None if origin_priority is None else [origin_priority[o] for o in block_origins],
+            destination_priority=(
+                None if destination_priority is None else [destination_priority[d] for d in block_destinations]
+            ),
+            usage=usage,
+        )
+        entries.extend(_remap(routed))
+
+    def _block_rank(block: tuple[list[int], list[int]]) -> float:
+        origin_rank = min(_rank_groups([block[0]], origin_priority))
+        destination_rank = min(_rank_groups([block[1]], destination_priority))
+        return min(origin_rank, destination_rank)
+
+    blocks = sorted(_group_pending(pairs), key=_block_rank)
+    await asyncio.gather(*(_route_block(o, d) for o, d in blocks))
     return entries
 
 
+async def refresh_hospital_grid(
+    client: RoutingClient,
+    grid_table: HospitalGridTable,
+    max_cells: int,
+    travel_mode: routing_v2.RouteTravelMode = routing_v2.RouteTravelMode.DRIVE,
+    scheduler: RouteMatrixScheduler | None = None,
+    usage: ElementUsage | None = None,
+) -> int:
+    """Route missing or stale grid cells to every tracked hospital for the current time-of-day bucket.
+
+    Args:
+        client: Routing client (Google Routes async client or a RouteMatrixProvider).
+        grid_table: Table to refresh.
+        max_cells: Maximum number of cells to refresh in this call.
+        travel_mode: Google Routes travel mode. Defaults to DRIVE.
+        scheduler: Optional quota-aware scheduler shared with on-demand routing. Defaults to None.
+        usage: Optional counter of the requests and elements spent on the refresh. Defaults to None.
+
+    Returns:
+        Number of refreshed cells.
+    """
+    hospitals = grid_table.hospitals
+    now = datetime.now(timezone.utc)
+    cells = grid_table.cells_to_refresh(now, limit=max_cells)
+    if not hospitals or not cells:
+        return 0
+
+    entries = await _compute_route_matrix_minutes(
+        client,
+        origins=[grid_table.cell_center(cell) for cell in cells],
+        destinations=[(h.lat, h.lon) for h in hospitals],
+        travel_mode=travel_mode,
+        scheduler=scheduler,
+        usage=usage,
+    )
+    minutes: list[dict[UUID, int]] = [{} for _ in cells]
+    for entry in entries:
+        minutes[entry.origin_index][hospitals[entry.destination_index].id] = entry.duration_minutes
+    hospital_ids = {hospital.id for hospital in hospitals}
+    for cell, cell_minutes in zip(cells, minutes, strict=True):
+        grid_table.store(cell, cell_minutes, hospital_ids, now)
+    return len(cells)
+
+
+async def prefetch_route_matrices(
+    client: RoutingClient,
+    cache: MatrixCache,
+    hospitals: list[Hospital],
+    patients: list[Patient],
+    ambulances: list[Ambulance],
+    departure_time: datetime,
+    max_elements: int,
+    travel_mode: routing_v2.RouteTravelMode = routing_v2.RouteTravelMode.DRIVE,
+    scheduler: RouteMatrixScheduler | None = None,
+    should_yield: Callable[[], bool] | None = None,
+    usage: ElementUsage | None = None,
+) -> int:
+    """Route pairs missing from the matrix cache for one departure time, within an element budget.
+
+    Active patient -> hospital pairs go first, then idle ambulance -> patient pairs.
+
+    Args:
+        client: Routing client (Google Routes async client or a RouteMatrixProvider).
+        cache: Cache to fill.
+        hospitals: Known hospitals.
+        patients: Active patients.
+        ambulances: Known ambulances; only those without an assigned patient are prefetched.
+        departure_time: Departure time to prefetch for.
+        max_elements: Maximum number of elements to route.
+        travel_mode: Google Routes travel mode. Defaults to DRIVE.
+        scheduler: Optional scheduler holding the prefetch budget. Defaults to None.
+        should_yield: Optional check, made before each matrix, that stops prefetching when it returns True.
+        usage: Optional counter of the requests and elements spent on prefetching. Defaults to None.
+
+    Returns:
+        Number of routed elements.
+    """
+    patient_coords = [(p.lat, p.lon) for p in patients]
+    hospital_coords = [(h.lat, h.lon) for h in hospitals]
+    idle_coords = [(a.lat, a.lon) for a in ambulances if a.assigned_patient_id is None]
+    routed = 0
+    for origins, destinations in ((patient_coords, hospital_coords), (idle_coords, patient_coords)):
+        if routed >= max_elements or (should_yield is not None and should_yield()):
+            break
+        _, missing = cache.split(origins, destinations, departure_time)
+        budgeted = set(sorted(missing)[: max_elements - routed])
+        if not budgeted:
+            continue
+        entries = await _route_pairs(
+            client,
+            origins,
+            destinations,
+            budgeted,
+            travel_mode=travel_mode,
+            scheduler=scheduler,
+            departure_time=departure_time,
+            usage=usage,
+        )
+        cache.put_entries(origins, destinations, departure_time, entries)
+        routed += len(budgeted)
+    return routed
+
+
+class MatrixPrefetcher:
+    """Keeps the matrix cache warm for the latest known entities, ahead of departure-time buckets.
+
+    Prefetching runs under its own scheduler, whose quota is meant to be carved out of the project quota, and
+    stops whenever on-demand routing is in flight so it never competes with it. Its route matrix usage is
+    accounted in ``usage``, apart from the usage of optimization cycles.
+    """
+
+    def __init__(
+        self,
+        cache: MatrixCache,
+        scheduler: RouteMatrixScheduler | None = None,
+        max_elements_per_run: int = 2000,
+        lead_minutes: float = 5.0,
+    ) -> None:
+        """Create a prefetcher.
+
+        Args:
+            cache: Cache shared with on-demand routing.
+            scheduler: Scheduler holding the prefetch budget. Defaults to None.
+            max_elements_per_run: Maximum number of elements routed per run. Defaults to 2000.
+            lead_minutes: How long before a departure-time bucket starts it is prefetched. Defaults to 5.
+        """
+        self.cache = cache
+        self.scheduler = scheduler
+        self.max_elements_per_run = max_elements_per_run
+        self.lead_minutes = lead_minutes
+        self.usage = RoutingUsage()
+        self._hospitals: list[Hospital] = []
+        self._patients: list[Patient] = []
+        self._ambulances: list[Ambulance] = []
+
+    def update(
+        self, hospitals: Sequence[Hospital], patients: Sequence[Patient], ambulances: Sequence[Ambulance]
+    ) -> None:
+        """Set the entities to keep warm."""
+        self._hospitals = list(hospitals)
+        self._patients = list(patients)
+        self._ambulances = list(ambulances)
+
+    async def run_once(
+        self,
+        client: RoutingClient,
+        context: RoutingContext | None = None,
+        travel_mode: routing_v2.RouteTravelMode = routing_v2.RouteTravelMode.DRIVE,
+    ) -> int:
+        """Prefetch the current departure bucket and, once within the lead time, the next one.
+
+        Args:
+            client: Routing client (Google Routes async client or a RouteMatrixProvider).
+            context: Routing context whose on-demand routing takes precedence. Defaults to None.
+            travel_mode: Google Routes travel mode. Defaults to DRIVE.
+
+        Returns:
+            Number of routed elements.
+        """
+        now = datetime.now(timezone.utc)
+        departures = [now + timedelta(seconds=30)]
+        next_start = self.cache.next_bucket_start(now)
+        if timedelta(seconds=30) < next_start - now <= timedelta(minutes=self.lead_minutes):
+            departures.append(next_start)
+
+        def _should_yield() -> bool:
+            return context is not None and context.active_routes > 0
+
+        routed = 0
+        for departure in departures:
+            routed += await prefetch_route_matrices(
+                client,
+                self.cache,
+                self._hospitals,
+                self._patients,
+                self._ambulances,
+                departure_time=departure,
+                max_elements=self.max_elements_per_run - routed,
+                travel_mode=travel_mode,
+                scheduler=self.scheduler,
+                should_yield=_should_yield,
+                usage=self.usage.counter("prefetch"),
+            )
+        return routed
+
+
 async def build_minutes_tables(
-    client: routing_v2.RoutesAsyncClient,
+    client: RoutingClient,
     patients: list[Patient],
     hospitals: list[Hospital],
     ambulances: list[Ambulance],
     travel_mode: routing_v2.RouteTravelMode = routing_v2.RouteTravelMode.DRIVE,
+    snap_resolution_degrees: float | None = None,
+    context: RoutingContext | None = None,
+    sink: MinutesSink | None = None,
+    speed_factor: float = 1.0,
+    ambulance_delays: list[int] | None = None,
+    usage: RoutingUsage | None = None,
+    changed: Collection[UUID] | None = None,
 ) -> MinutesTables:
     """Build patient -> hospital and ambulance -> patient duration tables in minutes.
 
+    Both matrices are routed concurrently and every travel time is passed to ``sink`` as soon as its chunk
+    completes, so consumers can overlap their work with network I/O. The returned tables remain authoritative:
+    pairs answered without live routing (estimates, late results) are only reported there.
+
+    With a routing fallback in the context, live routing is bounded by its deadline and circuit breaker and any pair
+    it has not answered in time is estimated locally; such tables are flagged as estimated.
+
+    With routed legs in the context, the legs of the previous live tables between entities not in ``changed`` are
+    carried over and only the remaining rows and columns are routed.
+
     Args:
-        client: Google Routes async client.
+        client: Routing client (Google Routes async client or a RouteMatrixProvider).
         patients: List of patients.
         hospitals: List of hospitals.
         ambulances: List of ambulances.
         travel_mode: Google Routes travel mode. Defaults to DRIVE.
+        snap_resolution_degrees: Grid resolution in degrees used to merge nearby coordinates before routing.
+            Defaults to None, which only merges exact duplicates.
+        context: Optional long-lived routing state (grid table, scheduler, fallback) shared across cycles.
+        sink: Optional consumer of travel times as they arrive during this call. Defaults to None.
+        speed_factor: Multiplier reducing travel time for priority transport, used to place triples relative to
+            patients' deadlines when precision tiers are enabled. Defaults to 1.0.
+        ambulance_delays: Optional minutes until each ambulance is free, counted with the travel times when placing
+            triples relative to patients' deadlines. Defaults to None.
+        usage: Optional accounting of the requests and elements of this call, per matrix type and routing
+            preference. Defaults to None.
+        changed: Ids of entities added or changed since the previous call with the same context. Defaults to None,
+            which routes every row.
 
     Returns:
         MinutesTables with patient_to_hospital and ambulance_to_patient dicts.
     """
     patient_coords = [(p.lat, p.lon) for p in patients]
     hospital_coords = [(h.lat, h.lon) for h in hospitals]
-    p_to_h = await _compute_route_matrix_minutes(
-        client,
-        origins=patient_coords,
-        destinations=hospital_coords,
-        travel_mode=travel_mode,
+    ambulance_coords = [(a.lat, a.lon) for a in ambulances]
+    key = (tuple(patient_coords), tuple(hospital_coords), tuple(ambulance_coords))
+    legs = context.routed_legs if context is not None else None
+    carried = legs.carry_over(patients, hospitals, ambulances, changed) if legs is not None else None
+
+    def _live(tables: MinutesTables, refreshed: bool) -> MinutesTables:
+        if legs is not None:
+            legs.remember(patients, hospitals, ambulances, tables, refreshed)
+        return tables
+
+    def _estimated(tables: MinutesTables) -> MinutesTables:
+        if legs is not None:
+            legs.forget()  # estimates must not be carried over as live travel times
+        return tables
+
+    async def _route(pending: _PendingRoute) -> None:
+        if context is not None:
+            context.active_routes += 1
+        attributes = {
+            "hospitopt.patients": len(patients),
+            "hospitopt.hospitals": len(hospitals),
+            "hospitopt.ambulances": len(ambulances),
+        }
+        try:
+            with tracer.start_as_current_span("routes.live", attributes=attributes):
+                await _route_live(
+                    client,
+                    pending,
+                    patients,
+                    hospitals,
+                    ambulances,
+                    travel_mode,
+                    snap_resolution_degrees,
+                    context,
+                    speed_factor,
+                    ambulance_delays,
+                    usage,
+                    carried,
+                )
+        finally:
+            if context is not None:
+                context.active_routes -= 1
+
+    fallback = context.fallback if context is not None else None
+    if fallback is None:
+        pending = _PendingRoute(key, sink)
+        await _route(pending)
+        return _live(
+            MinutesTables(
+                ambulance_to_patient=pending.ambulance_to_patient, patient_to_hospital=pending.patient_to_hospital
+            ),
+            pending.refreshed,
+        )
+
+    late = fallback.take_late_tables(key)
+    if late is not None:
+        return _live(late, False)  # routed by an earlier call, which may have carried legs over
+    if not fallback.breaker.allow():
+        logger.warning("Routing circuit is open, estimating all travel times.")
+        return _estimated(fallback.estimate_tables(patient_coords, hospital_coords, ambulance_coords, {}, {}))
+
+    pending = fallback.start_live(key, _route)
+    pending.sink = sink
+    assert pending.task is not None
+    done, _ = await asyncio.wait({pending.task}, timeout=fallback.deadline_seconds)
+    if pending.task in done:
+        if pending.task.exception() is None:
+            fallback.breaker.record_success()
+            return _live(
+                MinutesTables(
+                    ambulance_to_patient=pending.ambulance_to_patient, patient_to_hospital=pending.patient_to_hospital
+                ),
+                pending.refreshed,
+            )
+        logger.error("Live routing failed, estimating missing travel times.", exc_info=pending.task.exception())
+    else:
+        logger.warning(
+            "Live routing missed the %ss deadline, estimating missing travel times.", fallback.deadline_seconds
+        )
+        pending.detached = True
+        pending.sink = None  # the caller moves on with estimates
+    fallback.breaker.record_failure()
+    return _estimated(
+        fallback.estimate_tables(
+            patient_coords, hospital_coords, ambulance_coords, pending.patient_to_hospital, pending.ambulance_to_patient
+        )
     )
+
+
+async def _route_live(
+    client: RoutingClient,
+    pending: _PendingRoute,
+    patients: list[Patient],
+    hospitals: list[Hospital],
+    ambulances: list[Ambulance],
+    travel_mode: routing_v2.RouteTravelMode,
+    snap_resolution_degrees: float | None,
+    context: RoutingContext | None,
+    speed_factor: float = 1.0,
+    ambulance_delays: list[int] | None = None,
+    usage: RoutingUsage | None = None,
+    carried: MinutesTables | None = None,
+) -> None:
+    """Fill the pending tables from the grid table, carried legs, the matrix cache and live routing, as results arrive."""
+    patient_coords = [(p.lat, p.lon) for p in patients]
+    hospital_coords = [(h.lat, h.lon) for h in hospitals]
     ambulance_coords = [(a.lat, a.lon) for a in ambulances]
-    a_to_p = await _compute_route_matrix_minutes(
-        client,
-        origins=ambulance_coords,
-        destinations=patient_coords,
-        travel_mode=travel_mode,
+
+    scheduler = context.scheduler if context is not None else None
+    estimator = context.estimator if context is not None else None
+    traffic_aware = routing_v2.RoutingPreference.TRAFFIC_AWARE_OPTIMAL
+    p_to_h_usage = usage.counter("patient_to_hospital", traffic_aware) if usage is not None else None
+    a_to_p_usage = usage.counter("ambulance_to_patient", traffic_aware) if usage is not None else None
+    routed_patients = list(range(len(patients)))
+    if context is not None and context.grid_table is not None:
+        grid_table = context.grid_table
+        grid_table.sync_hospitals(hospitals)
+        now = datetime.now(timezone.utc)
+        routed_patients = []
+        for p_index, (lat, lon) in enumerate(patient_coords):
+            cell_minutes = grid_table.lookup(lat, lon, hospitals, now)
+            if cell_minutes is None:
+                routed_patients.append(p_index)
+                continue
+            for h_index, minutes in cell_minutes.items():
+                pending.add_patient_to_hospital(PatientIndex(p_index), HospitalIndex(h_index), minutes)
+            if p_to_h_usage is not None:
+                p_to_h_usage.cached += len(hospitals)
+        trace.get_current_span().set_attribute("hospitopt.grid_hits", len(patients) - len(routed_patients))
+
+    # Legs carried over from the previous cycle are known pairs, indexed into the routed matrices like the rest.
+    local_patient = {p_index: local for local, p_index in enumerate(routed_patients)}
+    known_p_to_h: set[tuple[int, int]] = set()
+    known_a_to_p: set[tuple[int, int]] = set()
+    if carried is not None:
+        for (p_index, h_index), minutes in carried.patient_to_hospital.items():
+            if p_index in local_patient:  # grid table answers take precedence
+                pending.add_patient_to_hospital(p_index, h_index, minutes)
+                known_p_to_h.add((local_patient[p_index], h_index))
+        for (a_index, p_index), minutes in carried.ambulance_to_patient.items():
+            pending.add_ambulance_to_patient(a_index, p_index, minutes)
+            known_a_to_p.add((a_index, p_index))
+        if p_to_h_usage is not None and a_to_p_usage is not None:
+            p_to_h_usage.cached += len(known_p_to_h)
+            a_to_p_usage.cached += len(known_a_to_p)
+        pending.refreshed = not (known_p_to_h or known_a_to_p)
+        trace.get_current_span().set_attribute("hospitopt.carried_legs", len(known_p_to_h) + len(known_a_to_p))
+
+    def _store_patient_to_hospital(entries: list[RouteMatrixEntry], observe: bool = True) -> None:
+        for e in entries:
+            pending.add_patient_to_hospital(
+                PatientIndex(routed_patients[e.origin_index]), HospitalIndex(e.destination_index), e.duration_minutes
+            )
+        if observe and estimator is not None:
+            estimator.observe_batch(
+                [patient_coords[routed_patients[e.origin_index]] for e in entries],
+                [hospital_coords[e.destination_index] for e in entries],
+                [e.duration_minutes for e in entries],
+            )
+
+    def _store_ambulance_to_patient(entries: list[RouteMatrixEntry], observe: bool = True) -> None:
+        for e in entries:
+            pending.add_ambulance_to_patient(
+                AmbulanceIndex(e.origin_index), PatientIndex(e.destination_index), e.duration_minutes
+            )
+        if observe and estimator is not None:
+            estimator.observe_batch(
+                [ambulance_coords[e.origin_index] for e in entries],
+                [patient_coords[e.destination_index] for e in entries],
+                [e.duration_minutes for e in entries],
+            )
+
+    cache = context.matrix_cache if context is not None else None
+    departure_time = datetime.now(timezone.utc) + timedelta(seconds=30)
+
+    # Rows and columns of the most time-critical patients are routed first, so a cut-short phase leaves them with
+    # complete candidate sets.
+    urgency = patient_urgency(patients)
+    routed_urgency = [urgency[p_index] for p_index in routed_patients]
+
+    async def _route_matrix(
+        origins: list[Coordinate],
+        destinations: list[Coordinate],
+        store: Callable[..., None],
+        pairs: set[tuple[int, int]] | None = None,
+        origin_priority: list[float] | None = None,
+        destination_priority: list[float] | None = None,
+        matrix_usage: ElementUsage | None = None,
+        matrix: str = "patient_to_hospital",
+        known: set[tuple[int, int]] | None = None,
+    ) -> None:
+        # Entries are stored as chunks complete so a deadline or sink can use partial results; the returned list is
+        # stored again as a whole, which only matters for clients that do not report chunks.
+        known = known or set()
+        elements = len(pairs) if pairs is not None else len(origins) * len(destinations) - len(known)
+        with tracer.start_as_current_span(
+            "routes.matrix", attributes={"hospitopt.matrix": matrix, "hospitopt.elements": elements}
+        ) as span:
+            if pairs is not None:
+                routed = await _route_pairs(
+                    client,
+                    origins,
+                    destinations,
+                    pairs,
+                    travel_mode=travel_mode,
+                    snap_resolution_degrees=snap_resolution_degrees,
+                    scheduler=scheduler,
+                    sink=store,
+                    departure_time=departure_time,
+                    origin_priority=origin_priority,
+                    destination_priority=destination_priority,
+                    usage=matrix_usage,
+                )
+                if cache is not None:
+                    cache.put_entries(origins, destinations, departure_time, routed)
+            elif cache is None and not known:
+                routed = await _compute_route_matrix_minutes(
+                    client,
+                    origins=origins,
+                    destinations=destinations,
+                    travel_mode=travel_mode,
+                    snap_resolution_degrees=snap_resolution_degrees,
+                    scheduler=scheduler,
+                    sink=store,
+                    origin_priority=origin_priority,
+                    destination_priority=destination_priority,
+                    usage=matrix_usage,
+                )
+            else:
+                if cache is None:
+                    missing = {(o, d) for o in range(len(origins)) for d in range(len(destinations))} - known
+                else:
+                    hits, missing = cache.split(origins, destinations, departure_time)
+                    hits = [e for e in hits if (e.origin_index, e.destination_index) not in known]
+                    missing -= known
+                    store(hits, False)
+                    if matrix_usage is not None:
+                        matrix_usage.cached += len(hits)
+                    _record_cache_hits(span, len(hits), elements)
+                routed = await _route_pairs(
+                    client,
+                    origins,
+                    destinations,
+                    missing,
+                    travel_mode=travel_mode,
+                    snap_resolution_degrees=snap_resolution_degrees,
+                    scheduler=scheduler,
+                    sink=store,
+                    departure_time=departure_time,
+                    origin_priority=origin_priority,
+                    destination_priority=destination_priority,
+                    usage=matrix_usage,
+                )
+                if cache is not None:
+                    cache.put_entries(origins, destinations, departure_time, routed)
+            store(routed, False)
+
+    routed_patient_coords = [patient_coords[p_index] for p_index in routed_patients]
+    tiers = context.precision_tiers if context is not None else None
+    if tiers is None:
+        await asyncio.gather(
+            _route_matrix(
+                routed_patient_coords,
+                hospital_coords,
+                _store_patient_to_hospital,
+                origin_priority=routed_urgency,
+                matrix_usage=p_to_h_usage,
+                known=known_p_to_h,
+            ),
+            _route_matrix(
+                ambulance_coords,
+                patient_coords,
+                _store_ambulance_to_patient,
+                destination_priority=urgency,
+                matrix_usage=a_to_p_usage,
+                matrix="ambulance_to_patient",
+                known=known_a_to_p,
+            ),
+        )
+        return
+
+    async def _first_pass(
+        origins: list[Coordinate],
+        destinations: list[Coordinate],
+        store: Callable[..., None],
+        origin_priority: list[float] | None = None,
+        destination_priority: list[float] | None = None,
+        matrix: str = "patient_to_hospital",
+        known: set[tuple[int, int]] | None = None,
+    ) -> set[tuple[int, int]]:
+        """Store cached or cheap minutes for every pair not known yet, returning those that are not traffic-aware."""
+        known = known or set()
+        pairs = {(o, d) for o in range(len(origins)) for d in range(len(destinations))} - known
+        with tracer.start_as_current_span(
+            "routes.first_pass", attributes={"hospitopt.matrix": matrix, "hospitopt.elements": len(pairs)}
+        ) as span:
+            if cache is not None:
+                hits, pairs = cache.split(origins, destinations, departure_time)
+                hits = [e for e in hits if (e.origin_index, e.destination_index) not in known]
+                pairs -= known
+                store(hits, False)
+                if usage is not None:
+                    usage.counter(matrix, traffic_aware).cached += len(hits)
+                _record_cache_hits(span, len(hits), len(origins) * len(destinations))
+            if tiers.first_pass == "estimate" and estimator is not None:
+                minutes = estimator.estimate_matrix(origins, destinations)
+                cheap = [
+                    RouteMatrixEntry(origin_index=o, destination_index=d, duration_minutes=int(minutes[o, d]))
+                    for o, d in pairs
+                ]
+            else:
+                cheap = await _route_pairs(
+                    client,
+                    origins,
+                    destinations,
+                    pairs,
+                    travel_mode=travel_mode,
+                    snap_resolution_degrees=snap_resolution_degrees,
+                    scheduler=scheduler,
+                    departure_time=departure_time,
+                    routing_preference=routing_v2.RoutingPreference.TRAFFIC_UNAWARE,
+                    origin_priority=origin_priority,
+                    destination_priority=destination_priority,
+                    usage=(
+                        usage.counter(matrix, routing_v2.RoutingPreference.TRAFFIC_UNAWARE)
+                        if usage is not None
+                        else None
+                    ),
+                )
+            store(cheap, False)  # cheap minutes must not calibrate the traffic-aware estimator
+            return pairs
+
+    cheap_p_to_h, cheap_a_to_p = await asyncio.gather(
+        _first_pass(
+            routed_patient_coords,
+            hospital_coords,
+            _store_patient_to_hospital,
+            origin_priority=routed_urgency,
+            known=known_p_to_h,
+        ),
+        _first_pass(
+            ambulance_coords,
+            patient_coords,
+            _store_ambulance_to_patient,
+            destination_priority=urgency,
+            matrix="ambulance_to_patient",
+            known=known_a_to_p,
+        ),
+    )
+    refine_p_to_h, refine_a_to_p = tiers.select(
+        [patient.time_to_hospital_minutes for patient in patients],
+        speed_factor,
+        pending.patient_to_hospital,
+        pending.ambulance_to_patient,
+        ambulance_delays,
+    )
+    p_to_h_pairs = {
+        (local_patient[p_index], int(h_index)) for p_index, h_index in refine_p_to_h if p_index in local_patient
+    } & cheap_p_to_h
+    a_to_p_pairs = {(int(a_index), int(p_index)) for a_index, p_index in refine_a_to_p} & cheap_a_to_p
+    logger.debug(
+        "Refining %s of %s first-pass elements with traffic-aware routing.",
+        len(p_to_h_pairs) + len(a_to_p_pairs),
+        len(cheap_p_to_h) + len(cheap_a_to_p),
     )
-    return MinutesTables(
-        ambulance_to_patient={
-            (AmbulanceIndex(e.origin_index), PatientIndex(e.destination_index)): e.duration_minutes for e in a_to_p
-        },
-        patient_to_hospital={
-            (PatientIndex(e.origin_index), HospitalIndex(e.destination_index)): e.duration_minutes for e in p_to_h
-        },
+    if p_to_h_usage is not None and a_to_p_usage is not None:
+        p_to_h_usage.skipped += len(cheap_p_to_h) - len(p_to_h_pairs)
+        a_to_p_usage.skipped += len(cheap_a_to_p) - len(a_to_p_pairs)
+    await asyncio.gather(
+        _route_matrix(
+            routed_patient_coords,
+            hospital_coords,
+            _store_patient_to_hospital,
+            p_to_h_pairs,
+            origin_priority=routed_urgency,
+            matrix_usage=p_to_h_usage,
+        ),
+        _route_matrix(
+            ambulance_coords,
+            patient_coords,
+            _store_ambulance_to_patient,
+            a_to_p_pairs,
+            destination_priority=urgency,
+            matrix_usage=a_to_p_usage,
+            matrix="ambulance_to_patient",
+        ),
     )
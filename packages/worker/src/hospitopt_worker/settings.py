@@ -1,9 +1,17 @@
 """Worker application settings."""
 
+from pathlib import Path
 from typing import Annotated, Literal
 
-from pydantic import BaseModel, ConfigDict, Discriminator, Field, HttpUrl, SecretStr
+from opentelemetry import trace
+from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+from opentelemetry.sdk.resources import SERVICE_NAME, Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+from pydantic import BaseModel, ConfigDict, Discriminator, Field, HttpUrl, PositiveFloat, PositiveInt, SecretStr
 from hospitopt_core.config.settings import BaseAppConfig, DbConnectionConfig, FromEnv
+from hospitopt_core.domain.models import Latitude, Longitude
 
 
 class APIIngestion(BaseModel):
@@ -22,9 +30,355 @@ type IngestionConfig = Annotated[
 ]
 
 
+class GoogleRoutingProvider(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    type: Literal["google"] = "google"
+
+
+class OfflineRoutingProvider(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    type: Literal["offline"] = "offline"
+    graph_path: Path = Field(description="Road graph exported from OpenStreetMap (.graphml or .csv edge list).")
+    default_speed_kph: PositiveFloat = Field(50.0, description="Speed used for edges without travel time or speed.")
+    access_speed_kph: PositiveFloat = Field(
+        20.0, description="Speed used between a coordinate and its nearest road node."
+    )
+    max_snap_distance_meters: PositiveFloat = Field(
+        2000.0, description="Coordinates farther than this from any road node are treated as unroutable."
+    )
+
+
+class ReplayRoutingProvider(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    type: Literal["replay"] = "replay"
+    path: Path = Field(description="Recording written with routing.record_path.")
+    latency_seconds: float = Field(0.0, ge=0, description="Delay injected before each replayed response.")
+
+
+class FakeRoutingProvider(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    type: Literal["fake"] = "fake"
+    speed_kph: PositiveFloat = Field(40.0, description="Road speed used to synthesize durations from distance.")
+    circuity: float = Field(1.3, ge=1, description="Ratio of road distance to straight-line distance.")
+    max_elements: PositiveInt | None = Field(
+        None,
+        description="Requests with more elements are rejected. Defaults to the Routes API limits: 100 elements with "
+        "TRAFFIC_AWARE_OPTIMAL routing and 625 otherwise.",
+    )
+    latency_seconds: float = Field(0.0, ge=0, description="Delay before each response stream starts.")
+    element_latency_seconds: float = Field(0.0, ge=0, description="Delay before each streamed element.")
+    jitter_seconds: float = Field(0.0, ge=0, description="Upper bound of the random delay added to every latency.")
+    quota_error_rate: float = Field(0.0, ge=0, le=1, description="Probability of a RESOURCE_EXHAUSTED request.")
+    stream_error_rate: float = Field(0.0, ge=0, le=1, description="Probability that a response stream breaks off.")
+    element_error_rate: float = Field(0.0, ge=0, le=1, description="Probability that an element fails.")
+    seed: int | None = Field(None, description="Seed of the injected randomness, for reproducible runs.")
+
+
+type RoutingProviderConfig = Annotated[
+    GoogleRoutingProvider | OfflineRoutingProvider | ReplayRoutingProvider | FakeRoutingProvider,
+    Discriminator("type"),
+]
+
+
+class GridTableConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    enabled: bool = Field(False, description="Answer patient -> hospital durations from a precomputed grid table.")
+    resolution_degrees: PositiveFloat = Field(0.01, description="Grid cell size in degrees (0.01 is roughly 1 km).")
+    bucket_minutes: int = Field(60, gt=0, le=1440, description="Width of the time-of-day buckets in minutes.")
+    max_age_seconds: PositiveFloat = Field(6 * 3600, description="Age after which a grid cell is considered stale.")
+    refresh_interval_seconds: PositiveFloat = Field(60.0, description="Interval between background refreshes.")
+    max_cells_per_refresh: PositiveInt = Field(25, description="Maximum number of cells routed per refresh.")
+    bounds: tuple[Latitude, Longitude, Latitude, Longitude] | None = Field(
+        None, description="Service area (min_lat, min_lon, max_lat, max_lon) whose cells are kept warm."
+    )
+
+
+class HedgingConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    enabled: bool = Field(False, description="Duplicate slow route matrix requests; the first response wins.")
+    percentile: float = Field(
+        95.0, gt=0, lt=100, description="Percentile of recent request latency after which a duplicate is fired."
+    )
+    min_samples: PositiveInt = Field(20, description="Request latencies observed before hedging starts.")
+    window: PositiveInt = Field(200, description="Number of recent request latencies the percentile is taken over.")
+    max_hedge_fraction: float = Field(0.05, gt=0, le=1, description="Maximum share of requests that may be duplicated.")
+    min_delay_seconds: PositiveFloat = Field(0.1, description="Lower bound of the delay before a duplicate is fired.")
+
+
+class SchedulerConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    enabled: bool = Field(
+        False, description="Rate limit route matrix requests and retry elements that failed transiently."
+    )
+    requests_per_minute: PositiveFloat = Field(3000, description="Route matrix requests per minute (project quota).")
+    elements_per_minute: PositiveFloat = Field(100_000, description="Route matrix elements per minute (project quota).")
+    min_concurrency: PositiveInt = Field(1, description="Lower bound of the adaptive concurrency limit.")
+    max_concurrency: PositiveInt = Field(16, description="Upper bound of the adaptive concurrency limit.")
+    latency_target_seconds: PositiveFloat = Field(
+        10.0, description="Requests slower than this shrink the concurrency limit like errors do."
+    )
+    max_retries: int = Field(4, ge=0, description="Retries of transiently failed elements before they are dropped.")
+    backoff_base_seconds: PositiveFloat = Field(0.5, description="Base delay of the jittered exponential backoff.")
+    backoff_max_seconds: PositiveFloat = Field(16.0, description="Maximum delay of the jittered exponential backoff.")
+    hedging: HedgingConfig = Field(
+        default_factory=HedgingConfig, description="Hedged requests that trim the route matrix latency tail."
+    )
+
+
+class FallbackConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    enabled: bool = Field(False, description="Bound live routing by a deadline and a circuit breaker.")
+    deadline_seconds: PositiveFloat = Field(
+        20.0, description="Time budget for live routing per cycle, after which missing pairs are estimated."
+    )
+    failure_threshold: PositiveInt = Field(
+        3, description="Consecutive failed or late routing cycles that open the circuit breaker."
+    )
+    reset_timeout_seconds: PositiveFloat = Field(
+        60.0, description="Time the circuit stays open before live routing is probed again."
+    )
+
+
+class EstimatorConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    prior_speed_kph: PositiveFloat = Field(
+        30.0, description="Straight-line speed assumed until enough live routes have been observed."
+    )
+    region_degrees: PositiveFloat = Field(0.1, description="Size of the origin regions with their own model.")
+    bucket_minutes: int = Field(60, gt=0, le=1440, description="Width of the time-of-day buckets in minutes.")
+    min_observations: PositiveInt = Field(20, description="Observations a region or bucket model needs to be used.")
+    decay: float = Field(
+        0.999, gt=0, le=1, description="Per-observation forgetting factor so models track changing conditions."
+    )
+    error_window: PositiveInt = Field(1000, description="Recent estimate errors kept for the error distribution.")
+
+
+class PrefetchConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    enabled: bool = Field(
+        False, description="Cache route matrices per departure bucket and keep them warm in the background."
+    )
+    bucket_minutes: int = Field(15, gt=0, le=1440, description="Width of the departure-time buckets in minutes.")
+    max_age_seconds: PositiveFloat = Field(3600, description="Age after which a cached pair is routed again.")
+    max_entries: PositiveInt = Field(200_000, description="Maximum number of cached origin/destination pairs.")
+    lead_minutes: PositiveFloat = Field(5.0, description="How long before a departure bucket starts it is prefetched.")
+    interval_seconds: PositiveFloat = Field(30.0, description="Interval between background prefetch runs.")
+    max_elements_per_run: PositiveInt = Field(2000, description="Maximum number of elements routed per run.")
+    requests_per_minute: PositiveFloat = Field(
+        300, description="Prefetch request budget; keep the on-demand scheduler quota net of it."
+    )
+    elements_per_minute: PositiveFloat = Field(
+        10_000, description="Prefetch element budget; keep the on-demand scheduler quota net of it."
+    )
+    max_concurrency: PositiveInt = Field(2, description="Maximum concurrent prefetch requests.")
+
+
+class PrecisionTiersConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    enabled: bool = Field(False, description="Route a cheap first pass and refine only pairs near patients' deadlines.")
+    first_pass: Literal["traffic_unaware", "estimate"] = Field(
+        "traffic_unaware", description="TRAFFIC_UNAWARE routing or the local estimator for the first pass."
+    )
+    band_minutes: PositiveFloat = Field(
+        10.0, description="Minimum half-width in minutes of the band around the deadline that gets refined."
+    )
+    band_fraction: float = Field(
+        0.25, ge=0, description="Half-width of the refinement band as a fraction of the deadline, when wider."
+    )
+
+
+class RoutingConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    provider: RoutingProviderConfig = Field(
+        default_factory=GoogleRoutingProvider, description="Travel-time provider, Google Routes by default."
+    )
+    record_path: Path | None = Field(
+        None, description="Record every route matrix request and response to this file (.jsonl or .jsonl.gz)."
+    )
+    snap_resolution_degrees: PositiveFloat | None = Field(
+        None,
+        description=(
+            "Grid resolution in degrees used to merge nearby coordinates before requesting route matrices "
+            "(e.g. 0.0005 is roughly 50 m). Exact duplicates are always merged."
+        ),
+    )
+    reuse_max_age_seconds: float = Field(
+        300.0,
+        ge=0,
+        description="How long travel times between inputs left unchanged are carried over from the previous cycle, "
+        "so only added or changed rows are routed, before every row is routed again. 0 routes every row each cycle.",
+    )
+    scheduler: SchedulerConfig = Field(
+        default_factory=SchedulerConfig, description="Quota-aware scheduling of route matrix requests."
+    )
+    grid_table: GridTableConfig = Field(
+        default_factory=GridTableConfig, description="Precomputed grid-to-hospital travel-time table."
+    )
+    fallback: FallbackConfig = Field(
+        default_factory=FallbackConfig, description="Routing deadline and circuit breaker with local estimates."
+    )
+    estimator: EstimatorConfig = Field(
+        default_factory=EstimatorConfig, description="Travel-time estimator trained on live route matrix results."
+    )
+    prefetch: PrefetchConfig = Field(
+        default_factory=PrefetchConfig, description="Route matrix cache with a budgeted background prefetcher."
+    )
+    precision_tiers: PrecisionTiersConfig = Field(
+        default_factory=PrecisionTiersConfig, description="Cheap first pass with traffic-aware refinement."
+    )
+
+
+class OptimizationConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    reenter_committed_ambulances: bool = Field(
+        False,
+        description="Let ambulances committed to a patient serve another one from their destination hospital, "
+        "once their projected transport is over.",
+    )
+
+
+class TriggerConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    mode: Literal["poll", "notify"] = Field(
+        "poll",
+        description="poll re-reads the inputs every poll_interval_seconds; notify wakes up on Postgres NOTIFY from "
+        "the input table triggers (db ingestion only) and keeps polling only as a safety net.",
+    )
+    channel: str = Field("hospitopt_changes", description="Notification channel of the input table triggers.")
+    debounce_seconds: float = Field(0.25, ge=0, description="Quiet period that ends a burst of notifications.")
+    max_delay_seconds: PositiveFloat = Field(2.0, description="Maximum time a burst may delay the next cycle.")
+    safety_poll_interval_seconds: PositiveFloat = Field(
+        60.0, description="Polling interval in notify mode, covering missed notifications."
+    )
+
+
+class QueueConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    enabled: bool = Field(
+        False,
+        description="Enqueue an optimization job in the optimization_jobs table for every incident whose inputs "
+        "changed (for all inputs when not sharded) and claim jobs of any incident with FOR UPDATE SKIP LOCKED instead "
+        "of optimizing in place, so several worker replicas share the incidents.",
+    )
+    concurrency: PositiveInt = Field(4, description="Jobs of different incidents this worker runs at once.")
+    lease_seconds: PositiveFloat = Field(
+        300.0, description="How long a claimed job is held without renewal before another replica may take it."
+    )
+    max_attempts: PositiveInt = Field(
+        3, description="Attempts after which a failing job, or one whose worker crashed, is no longer retried."
+    )
+    retention_seconds: PositiveFloat = Field(
+        86400.0, description="Age after which failed jobs are deleted; finished jobs are deleted with their result."
+    )
+
+
+class ShardingConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    enabled: bool = Field(
+        False,
+        description="Run an independent optimization loop per incident or region key, each with its own change "
+        "detection, caches and cadence. Entries without a key form a shard of their own.",
+    )
+    incidents: list[str] | None = Field(
+        None,
+        description="Incident keys to run shards for. Defaults to discovering them from the inputs (db ingestion "
+        "only); required with api ingestion.",
+    )
+    discovery_interval_seconds: PositiveFloat = Field(
+        30.0, description="How often new incidents are discovered and shards of vanished ones stopped."
+    )
+
+
+class CheckpointConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    enabled: bool = Field(
+        False,
+        description="Periodically save the latest inputs, assignments and routing caches, and restore them on "
+        "startup so the first cycle after a restart is warm.",
+    )
+    path: Path = Field(
+        Path("checkpoints/worker.json.gz"),
+        description="Checkpoint file, gzip-compressed when it ends in .gz. Shards add their incident to the name.",
+    )
+    interval_seconds: PositiveFloat = Field(60.0, description="How often the checkpoint is saved.")
+
+
+class MetricsConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    enabled: bool = Field(False, description="Serve Prometheus metrics of the optimization cycles over HTTP.")
+    host: str = Field("0.0.0.0", description="Address the metrics endpoint binds to.")  # nosec B104 - scraped in-cluster
+    port: int = Field(9100, ge=1, le=65535, description="Port of the metrics endpoint.")
+
+
+class TracingConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    enabled: bool = Field(False, description="Export OpenTelemetry traces of the optimization cycles.")
+    endpoint: FromEnv[HttpUrl] = Field(
+        HttpUrl("http://localhost:4318/v1/traces"), description="OTLP/HTTP traces endpoint of the collector."
+    )
+    headers: dict[str, FromEnv[SecretStr]] = Field(
+        default_factory=dict, description="Headers sent with every export, e.g. an authorization token."
+    )
+    service_name: str = Field("hospitopt-worker", description="Service name reported with the traces.")
+    sample_ratio: float = Field(
+        1.0, ge=0, le=1, description="Fraction of cycles traced; spans follow the decision of their cycle."
+    )
+
+    def setup_tracing(self) -> TracerProvider | None:  # pragma: no cover
+        """Install a tracer provider exporting over OTLP; returns it so it can be shut down, or None if disabled."""
+        if not self.enabled:
+            return None
+        provider = TracerProvider(
+            resource=Resource.create({SERVICE_NAME: self.service_name}),
+            sampler=ParentBased(TraceIdRatioBased(self.sample_ratio)),
+        )
+        exporter = OTLPSpanExporter(
+            endpoint=str(self.endpoint),
+            headers={name: value.get_secret_value() for name, value in self.headers.items()},
+        )
+        provider.add_span_processor(BatchSpanProcessor(exporter))
+        trace.set_tracer_provider(provider)
+        return provider
+
+
 class WorkerConfig(BaseAppConfig):
     model_config = ConfigDict(extra="forbid")
 
     poll_interval_seconds: FromEnv[float] = Field(10.0, gt=0, description="Polling interval in seconds.")
-    google_maps_api_key: FromEnv[SecretStr] = Field(description="Google Maps API key.")
+    google_maps_api_key: FromEnv[SecretStr | None] = Field(
+        None, description="Google Maps API key, required when using the google routing provider."
+    )
     ingestion: IngestionConfig = Field(description="Ingestion configuration, only db type is supported for now.")
+    routing: RoutingConfig = Field(default_factory=RoutingConfig, description="Travel-time routing configuration.")
+    trigger: TriggerConfig = Field(default_factory=TriggerConfig, description="What starts an optimization cycle.")
+    optimization: OptimizationConfig = Field(
+        default_factory=OptimizationConfig, description="Allocation model configuration."
+    )
+    queue: QueueConfig = Field(default_factory=QueueConfig, description="Job queue for horizontally scaled workers.")
+    sharding: ShardingConfig = Field(
+        default_factory=ShardingConfig, description="Concurrent optimization loops per incident."
+    )
+    checkpoint: CheckpointConfig = Field(
+        default_factory=CheckpointConfig, description="Warm restarts from checkpointed worker state."
+    )
+    metrics: MetricsConfig = Field(default_factory=MetricsConfig, description="Prometheus metrics endpoint.")
+    tracing: TracingConfig = Field(default_factory=TracingConfig, description="OpenTelemetry trace export.")
@@ -0,0 +1,162 @@
+"""Event-driven optimization triggers from Postgres LISTEN/NOTIFY."""
+
+import asyncio
+import json
+import logging
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeSubscription:
+    """Input changes of one incident, or of all of them, coalesced into bursts.
+
+    Subscriptions of several shards share the connection of their ``ChangeListener``; each only wakes up for
+    notifications of its own incident and for those that concern every incident, like a TRUNCATE.
+    """
+
+    def __init__(self, listener: "ChangeListener", incident: str | None = None, all_incidents: bool = False) -> None:
+        """Create a subscription; use ``ChangeListener.for_incident`` rather than calling this directly.
+
+        Args:
+            listener: Listener owning the connection.
+            incident: Incident or region key to wake up for, None standing for entries without a key.
+            all_incidents: Wake up for every incident, ignoring ``incident``. Defaults to False.
+        """
+        self._listener = listener
+        self.incident = incident
+        self.all_incidents = all_incidents
+        self._event = asyncio.Event()
+        self._tables: set[str] = set()
+
+    def _notify(self, table: str, incident: str | None, scoped: bool) -> None:
+        if self.all_incidents or not scoped or incident == self.incident:
+            self._tables.add(table)
+            self._event.set()
+
+    async def wait(self, timeout: float) -> set[str]:
+        """Wait for input changes, coalescing a burst of notifications into one wake-up.
+
+        Args:
+            timeout: Safety-net polling interval after which to return without a notification.
+
+        Returns:
+            Tables that changed, empty when the timeout expired first.
+        """
+        listener = self._listener
+        await listener.ensure_connected()
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except TimeoutError:
+            return set()
+        deadline = asyncio.get_running_loop().time() + listener.max_delay_seconds
+        while (remaining := deadline - asyncio.get_running_loop().time()) > 0:
+            self._event.clear()
+            try:
+                await asyncio.wait_for(self._event.wait(), min(listener.debounce_seconds, remaining))
+            except TimeoutError:
+                break
+        self._event.clear()
+        tables, self._tables = self._tables, set()
+        return tables
+
+    async def close(self) -> None:
+        """Stop receiving notifications."""
+        self._listener.unsubscribe(self)
+
+
+class ChangeListener(ChangeSubscription):
+    """Listens for input table change notifications and coalesces bursts of them.
+
+    Notifications are raised by the triggers of the ``notify_on_input_changes`` and ``incident_keys`` migrations,
+    with the table and the incident key of the changed rows as a JSON payload. The listener itself wakes up for
+    every incident; ``for_incident`` subscribes a shard to its own incident over the same connection. While the
+    connection is down, waits simply time out so the worker falls back to polling, and reconnecting is retried on
+    every wait.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        channel: str = "hospitopt_changes",
+        debounce_seconds: float = 0.25,
+        max_delay_seconds: float = 2.0,
+    ) -> None:
+        """Create a listener; call ``start`` to connect.
+
+        Args:
+            dsn: Postgres connection string (``postgresql://...``).
+            channel: Notification channel of the table triggers. Defaults to ``hospitopt_changes``.
+            debounce_seconds: Quiet period that ends a burst of notifications. Defaults to 0.25.
+            max_delay_seconds: Maximum time a burst may delay the next cycle. Defaults to 2.
+        """
+        super().__init__(self, all_incidents=True)
+        self.dsn = dsn
+        self.channel = channel
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self._connection: asyncpg.Connection | None = None
+        self._subscriptions: list[ChangeSubscription] = [self]
+        self._lock = asyncio.Lock()
+
+    @property
+    def connected(self) -> bool:
+        """Whether notifications are currently being received."""
+        return self._connection is not None and not self._connection.is_closed()
+
+    def for_incident(self, incident: str | None) -> ChangeSubscription:
+        """Subscribe to the changes of one incident or region key; None selects entries without a key."""
+        subscription = ChangeSubscription(self, incident)
+        self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: ChangeSubscription) -> None:
+        """Stop delivering notifications to a subscription."""
+        if subscription is not self and subscription in self._subscriptions:
+            self._subscriptions.remove(subscription)
+
+    async def start(self) -> None:
+        """Connect and LISTEN on the channel."""
+        connection = await asyncpg.connect(self.dsn)
+        await connection.add_listener(self.channel, self._on_notify)
+        connection.add_termination_listener(self._on_terminate)
+        self._connection = connection
+        logger.info("Listening for input changes on channel %s.", self.channel)
+
+    async def ensure_connected(self) -> None:
+        """Connect unless already listening; failures are logged and leave the caller polling."""
+        async with self._lock:  # subscriptions of concurrent shards must not open a connection each
+            if self.connected:
+                return
+            try:
+                await self.start()
+            except (OSError, asyncpg.PostgresError) as exc:
+                logger.warning("Could not listen for input changes (%s), polling instead.", exc)
+
+    async def close(self) -> None:
+        """Stop listening and close the connection."""
+        connection, self._connection = self._connection, None
+        if connection is not None and not connection.is_closed():
+            await connection.close()
+
+    def _on_notify(self, connection: object, pid: int, channel: str, payload: str) -> None:
+        table, incident, scoped = parse_payload(payload)
+        for subscription in self._subscriptions:
+            subscription._notify(table, incident, scoped)
+
+    def _on_terminate(self, connection: object) -> None:
+        logger.warning("Change notification connection lost, polling until it is re-established.")
+        self._connection = None
+
+
+def parse_payload(payload: str) -> tuple[str, str | None, bool]:
+    """Return the table, the incident key and whether the change is limited to that incident.
+
+    Row changes carry ``{"table": ..., "incident": ...}``. A payload without an incident, such as the one of a
+    TRUNCATE or the bare table name of the original triggers, concerns every incident.
+    """
+    if not payload.startswith("{"):
+        return payload, None, False
+    change = json.loads(payload)
+    return change["table"], change.get("incident"), "incident" in change
@@ -0,0 +1,54 @@
+"""Route matrix element and request accounting."""
+
+from dataclasses import dataclass, fields
+
+from google.maps import routing_v2
+
+UsageKey = tuple[str, str]
+
+
+@dataclass
+class ElementUsage:
+    """Route matrix usage of one matrix type and routing preference."""
+
+    requests: int = 0  # requests sent, including retries and hedged duplicates
+    failed_requests: int = 0  # requests that raised instead of streaming a response
+    requested: int = 0  # elements asked of live routing, before deduplication
+    skipped: int = 0  # elements not routed thanks to deduplication or precision tiers
+    cached: int = 0  # elements answered by the grid table, the matrix cache or the previous cycle's legs
+    billed: int = 0  # elements of answered requests, i.e. what the provider charges for
+    failed: int = 0  # elements of failed requests or with a retryable error status
+    unroutable: int = 0  # elements with a non-retryable error status
+
+    def __iadd__(self, other: "ElementUsage") -> "ElementUsage":
+        for field in fields(self):
+            setattr(self, field.name, getattr(self, field.name) + getattr(other, field.name))
+        return self
+
+
+class RoutingUsage:
+    """Route matrix usage per matrix type and routing preference, accumulated until taken once per cycle."""
+
+    def __init__(self) -> None:
+        self._counters: dict[UsageKey, ElementUsage] = {}
+
+    def counter(
+        self,
+        matrix: str,
+        preference: routing_v2.RoutingPreference = routing_v2.RoutingPreference.TRAFFIC_AWARE_OPTIMAL,
+    ) -> ElementUsage:
+        """Return the counter of a matrix type (e.g. ``patient_to_hospital``) and routing preference."""
+        return self._counters.setdefault((matrix, routing_v2.RoutingPreference(preference).name), ElementUsage())
+
+    def take(self) -> dict[UsageKey, ElementUsage]:
+        """Return the usage accumulated since the last call and start over."""
+        counters, self._counters = self._counters, {}
+        return dict(sorted(counters.items()))
+
+    @staticmethod
+    def total(counters: dict[UsageKey, ElementUsage]) -> ElementUsage:
+        """Sum usage over matrix types and routing preferences."""
+        total = ElementUsage()
+        for usage in counters.values():
+            total += usage
+        return total
@@ -0,0 +1,88 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, select, update
+
+from hospitopt_core.db.models import PatientDB
+from hospitopt_worker.ingestion import SQLAlchemyIngestor
+from hospitopt_worker.ingestion.tracking import InputTracker
+
+
+@pytest_asyncio.fixture
+async def clean_patients(session_factory):
+    async with session_factory() as session:
+        await session.execute(delete(PatientDB))
+        await session.commit()
+    yield
+    async with session_factory() as session:
+        await session.execute(delete(PatientDB))
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_revisions_track_concurrent_writers_in_any_commit_order(session_factory, clean_patients):
+    """Test concurrent writers do not block each other and every commit moves the revision."""
+    ingestor = SQLAlchemyIngestor(session_factory)
+    before = await ingestor.get_revisions()
+
+    async with session_factory() as first, session_factory() as second:
+        first.add(PatientDB(lat=0.0, lon=0.0, time_to_hospital_minutes=30))
+        await first.flush()
+        second.add(PatientDB(lat=1.0, lon=1.0, time_to_hospital_minutes=30))
+        await second.flush()  # would wait for the first writer with a shared counter row
+        await second.commit()
+        after_second = await ingestor.get_revisions()
+        await first.commit()  # commits after a younger transaction
+    after_first = await ingestor.get_revisions()
+
+    assert before is not None and after_second is not None and after_first is not None
+    assert len({before["patients"], after_second["patients"], after_first["patients"]}) == 3
+    assert before["hospitals"] == after_first["hospitals"]
+
+    async with session_factory() as session:
+        await session.execute(update(PatientDB).values(time_to_hospital_minutes=20))
+        await session.commit()
+    after_update = await ingestor.get_revisions()
+    async with session_factory() as session:
+        await session.execute(delete(PatientDB))
+        await session.commit()
+
+    assert after_update is not None and after_update["patients"] != after_first["patients"]
+    assert await ingestor.get_revisions() == before
+
+
+@pytest.mark.asyncio
+async def test_revisions_notice_an_older_writer_committing_after_a_younger_one(session_factory, clean_patients):
+    """Test an update whose transaction is older than the latest seen write is not missed."""
+    ingestor = SQLAlchemyIngestor(session_factory)
+    async with session_factory() as session:
+        session.add_all([PatientDB(lat=0.0, lon=0.0, time_to_hospital_minutes=30) for _ in range(2)])
+        await session.commit()
+        first_id, second_id = (await session.execute(select(PatientDB.id))).scalars().all()
+
+    async with session_factory() as older, session_factory() as younger:
+        await older.execute(update(PatientDB).where(PatientDB.id == first_id).values(time_to_hospital_minutes=10))
+        await younger.execute(update(PatientDB).where(PatientDB.id == second_id).values(time_to_hospital_minutes=10))
+        await younger.commit()
+        seen = await ingestor.get_revisions()
+        await older.commit()  # same row count, and a lower transaction id than the latest one seen
+
+    assert seen is not None
+    assert await ingestor.get_revisions() != seen
+
+
+@pytest.mark.asyncio
+async def test_writes_to_one_incident_do_not_refresh_another_shard(session_factory, clean_patients):
+    """Test each shard's change detection only sees the rows of its own incident."""
+    ingestor = SQLAlchemyIngestor(session_factory)
+    north = InputTracker(ingestor.for_incident("north"))
+    south = InputTracker(ingestor.for_incident("south"))
+    await north.refresh()
+    await south.refresh()
+
+    async with session_factory() as session:
+        session.add(PatientDB(lat=0.0, lon=0.0, time_to_hospital_minutes=30, incident="north"))
+        await session.commit()
+
+    assert await south.refresh() is False
+    assert await north.refresh() is True
+    assert [patient.incident for patient in north.patients] == ["north"]
@@ -0,0 +1,147 @@
+from datetime import timedelta
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, select, update
+
+from hospitopt_core.db.models import OptimizationJobDB
+from hospitopt_core.domain.models import OptimizationResult
+from hospitopt_worker.db import DatabaseWriter
+from hospitopt_worker.jobs import GLOBAL_SCOPE, JobQueue, incident_scope, scope_incident
+
+
+@pytest_asyncio.fixture
+async def clean_jobs(session_factory):
+    async with session_factory() as session:
+        await session.execute(delete(OptimizationJobDB))
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_job_queue_coalesces_pending_jobs_and_runs_one_job_per_scope(session_factory, clean_jobs):
+    """Test only one replica at a time claims the job of a scope."""
+    first = JobQueue(session_factory, worker_id="first")
+    second = JobQueue(session_factory, worker_id="second")
+
+    await first.enqueue()
+    await second.enqueue()
+    async with session_factory() as session:
+        assert len((await session.execute(select(OptimizationJobDB))).scalars().all()) == 1
+
+    job = await first.claim()
+    assert job is not None
+    assert job.attempts == 1
+
+    await second.enqueue()  # a change while the job is running queues a follow-up
+    assert await second.claim() is None  # but the scope is busy
+
+    assert await DatabaseWriter(session_factory).write_job_result(
+        OptimizationResult(max_lives_saved=0, assignments=[], unassigned_patient_ids=[]), job.id, first.worker_id
+    )
+    follow_up = await second.claim()
+    assert follow_up is not None
+    assert follow_up.id != job.id
+
+
+@pytest.mark.asyncio
+async def test_job_results_are_fenced_by_the_lease(session_factory, clean_jobs):
+    """Test a worker whose lease expired and was taken over cannot write its result."""
+    scope = incident_scope(f"incident-{uuid4()}")
+    first = JobQueue(session_factory, worker_id="first")
+    second = JobQueue(session_factory, worker_id="second")
+    writer = DatabaseWriter(session_factory)
+    empty = OptimizationResult(max_lives_saved=0, assignments=[], unassigned_patient_ids=[])
+
+    await first.enqueue(scope)
+    job = await first.claim()
+    assert job is not None
+    async with session_factory() as session:
+        await session.execute(
+            update(OptimizationJobDB)
+            .where(OptimizationJobDB.id == job.id)
+            .values(lease_expires_at=OptimizationJobDB.requested_at)
+        )
+        await session.commit()
+
+    takeover = await second.claim()
+    assert takeover is not None
+    assert takeover.id == job.id
+    assert await first.renew(job) is False
+    assert await writer.write_job_result(empty, job.id, first.worker_id) is False
+    assert await writer.write_job_result(empty, job.id, second.worker_id) is True
+
+
+@pytest.mark.asyncio
+async def test_job_queue_runs_jobs_of_different_scopes_in_parallel(session_factory, clean_jobs):
+    """Test one replica claims jobs of any scope, one running job per scope at a time."""
+    queue = JobQueue(session_factory, worker_id="replica")
+    north, south = incident_scope("north"), incident_scope("south")
+
+    await queue.enqueue(north)
+    await queue.enqueue(south)
+    first = await queue.claim()
+    await queue.enqueue(first.scope)  # a follow-up of a running scope waits for it
+    second = await queue.claim()
+
+    assert {first.scope, second.scope} == {north, south}
+    assert await queue.claim() is None
+    assert await queue.depth() == 1
+    assert scope_incident(north) == "north"
+    assert scope_incident(GLOBAL_SCOPE) is None
+
+
+@pytest.mark.asyncio
+async def test_job_queue_stops_reclaiming_jobs_that_crash_their_worker(session_factory, clean_jobs):
+    """Test a job whose lease keeps expiring is marked failed once it used up its attempts."""
+    queue = JobQueue(session_factory, worker_id="replica", max_attempts=2)
+
+    async def expire(job_id):
+        async with session_factory() as session:
+            await session.execute(
+                update(OptimizationJobDB)
+                .where(OptimizationJobDB.id == job_id)
+                .values(lease_expires_at=OptimizationJobDB.requested_at)
+            )
+            await session.commit()
+
+    await queue.enqueue()
+    job = await queue.claim()
+    await expire(job.id)
+    retry = await queue.claim()
+    assert retry is not None
+    assert retry.attempts == 2
+    await expire(retry.id)
+
+    assert await queue.claim() is None
+    async with session_factory() as session:
+        failed = (await session.execute(select(OptimizationJobDB))).scalar_one()
+    assert failed.status == "failed"
+
+
+@pytest.mark.asyncio
+async def test_job_queue_deletes_expired_failed_jobs(session_factory, clean_jobs):
+    """Test failed jobs do not pile up past the retention."""
+    queue = JobQueue(session_factory, worker_id="north", max_attempts=1, retention_seconds=60)
+    scope = incident_scope("north")
+
+    await queue.enqueue(scope)
+    old = await queue.claim()
+    assert old is not None
+    await queue.fail(old, "boom")
+    async with session_factory() as session:
+        await session.execute(
+            update(OptimizationJobDB)
+            .where(OptimizationJobDB.id == old.id)
+            .values(requested_at=OptimizationJobDB.requested_at - timedelta(minutes=5))
+        )
+        await session.commit()
+
+    await queue.enqueue(scope)
+    recent = await queue.claim()
+    assert recent is not None
+    await queue.fail(recent, "boom")
+
+    async with session_factory() as session:
+        remaining = (await session.execute(select(OptimizationJobDB.id))).scalars().all()
+    assert remaining == [recent.id]
@@ -0,0 +1,96 @@
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from hospitopt_core.domain.models import Ambulance, Hospital, Patient
+from hospitopt_worker import routes
+from hospitopt_worker.cache import MatrixCache
+
+DEPARTURE = datetime(2026, 1, 1, 8, 5, tzinfo=UTC)
+
+
+def _fake_compute(calls: list):
+    async def fake_compute(client, origins, destinations, travel_mode=None, **kwargs):
+        calls.append((origins, destinations, kwargs.get("departure_time")))
+        return [
+            routes.RouteMatrixEntry(origin_index=o, destination_index=d, duration_minutes=10 + d)
+            for o in range(len(origins))
+            for d in range(len(destinations))
+        ]
+
+    return fake_compute
+
+
+def test_matrix_cache_buckets_expiry_and_eviction(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("hospitopt_worker.cache.time.monotonic", lambda: now[0])
+    cache = MatrixCache(bucket_minutes=15, max_age_seconds=60, max_entries=2)
+
+    cache.put((0.0, 0.0), (1.0, 1.0), DEPARTURE, 12)
+    assert cache.get((0.0, 0.0), (1.0, 1.0), DEPARTURE + timedelta(minutes=9)) == 12
+    assert cache.get((0.0, 0.0), (1.0, 1.0), DEPARTURE + timedelta(minutes=10)) is None  # next bucket
+    assert cache.next_bucket_start(DEPARTURE) == datetime(2026, 1, 1, 8, 15, tzinfo=UTC)
+
+    cache.put((0.0, 0.0), (2.0, 2.0), DEPARTURE, 20)
+    cache.put((0.0, 0.0), (3.0, 3.0), DEPARTURE, 30)
+    assert len(cache) == 2
+    assert cache.get((0.0, 0.0), (1.0, 1.0), DEPARTURE) is None  # oldest evicted
+
+    now[0] = 61.0
+    assert cache.split([(0.0, 0.0)], [(2.0, 2.0)], DEPARTURE) == ([], {(0, 0)})
+
+
+@pytest.mark.asyncio
+async def test_build_minutes_tables_routes_only_cache_misses(monkeypatch):
+    calls: list = []
+    monkeypatch.setattr(routes, "_compute_route_matrix_minutes", _fake_compute(calls))
+
+    hospitals = [Hospital(bed_capacity=1, lat=0.0, lon=0.0), Hospital(bed_capacity=1, lat=0.0, lon=1.0)]
+    patients = [Patient(lat=1.0, lon=1.0, time_to_hospital_minutes=30)]
+    ambulances = [Ambulance(lat=2.0, lon=2.0)]
+    context = routes.RoutingContext(matrix_cache=MatrixCache())
+
+    first = await routes.build_minutes_tables(None, patients, hospitals, ambulances, context=context)
+    calls.clear()
+    patients.append(Patient(lat=3.0, lon=3.0, time_to_hospital_minutes=30))
+    second = await routes.build_minutes_tables(None, patients, hospitals, ambulances, context=context)
+
+    assert first.patient_to_hospital == {(0, 0): 10, (0, 1): 11}
+    # only the new patient's row and column are routed
+    assert sorted((origins, destinations) for origins, destinations, _ in calls) == [
+        ([(2.0, 2.0)], [(3.0, 3.0)]),
+        ([(3.0, 3.0)], [(0.0, 0.0), (0.0, 1.0)]),
+    ]
+    assert second.patient_to_hospital == {(0, 0): 10, (0, 1): 11, (1, 0): 10, (1, 1): 11}
+    assert second.ambulance_to_patient == {(0, 0): 10, (0, 1): 10}
+
+
+@pytest.mark.asyncio
+async def test_prefetch_respects_budget_idle_ambulances_and_yield(monkeypatch):
+    calls: list = []
+    monkeypatch.setattr(routes, "_compute_route_matrix_minutes", _fake_compute(calls))
+
+    hospitals = [Hospital(bed_capacity=1, lat=0.0, lon=0.0)]
+    patients = [Patient(lat=1.0, lon=1.0, time_to_hospital_minutes=30)]
+    ambulances = [Ambulance(lat=2.0, lon=2.0), Ambulance(lat=4.0, lon=4.0, assigned_patient_id=patients[0].id)]
+    cache = MatrixCache()
+
+    routed = await routes.prefetch_route_matrices(
+        None, cache, hospitals, patients, ambulances, DEPARTURE, max_elements=10, should_yield=lambda: False
+    )
+    assert routed == 2
+    assert [(origins, destinations) for origins, destinations, _ in calls] == [
+        ([(1.0, 1.0)], [(0.0, 0.0)]),
+        ([(2.0, 2.0)], [(1.0, 1.0)]),
+    ]
+    assert all(departure == DEPARTURE for _, _, departure in calls)
+    assert cache.get((2.0, 2.0), (1.0, 1.0), DEPARTURE) == 10
+
+    patients.append(Patient(lat=3.0, lon=3.0, time_to_hospital_minutes=30))
+    assert await routes.prefetch_route_matrices(None, cache, hospitals, patients, ambulances, DEPARTURE, 1) == 1
+    assert (
+        await routes.prefetch_route_matrices(
+            None, cache, hospitals, patients, ambulances, DEPARTURE, 10, should_yield=lambda: True
+        )
+        == 0
+    )
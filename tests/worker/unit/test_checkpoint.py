@@ -0,0 +1,90 @@
+from datetime import UTC, datetime
+
+import pytest
+
+from hospitopt_core.domain.models import Ambulance, Hospital, Patient, PatientAssignment
+from hospitopt_worker.cache import MatrixCache
+from hospitopt_worker.checkpoint import WorkerCheckpoint
+from hospitopt_worker.estimate import TravelTimeEstimator
+from hospitopt_worker.grid import HospitalGridTable
+from hospitopt_worker.ingestion.base import DataIngestor
+from hospitopt_worker.ingestion.tracking import InputTracker
+from hospitopt_worker.routes import RoutingContext
+
+
+class _FakeIngestor(DataIngestor):
+    def __init__(self, revisions):
+        self.revisions = revisions
+        self.loads = []
+        self.hospitals = [Hospital(name="H", bed_capacity=1, lat=0.0, lon=0.0)]
+        self.patients = [Patient(lat=1.0, lon=1.0, time_to_hospital_minutes=20)]
+        self.ambulances = [Ambulance(lat=2.0, lon=2.0)]
+
+    async def get_hospitals(self):
+        self.loads.append("hospitals")
+        return self.hospitals
+
+    async def get_patients(self):
+        self.loads.append("patients")
+        return self.patients
+
+    async def get_ambulances(self):
+        self.loads.append("ambulances")
+        return self.ambulances
+
+    async def get_revisions(self):
+        return self.revisions
+
+
+def _routing_context() -> RoutingContext:
+    return RoutingContext(
+        grid_table=HospitalGridTable(resolution_degrees=0.01),
+        estimator=TravelTimeEstimator(min_observations=1),
+        matrix_cache=MatrixCache(),
+    )
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_restores_a_warm_worker(tmp_path):
+    now = datetime.now(UTC)
+    ingestor = _FakeIngestor({"hospitals": (1, 3, 4), "patients": (2, 5, 6), "ambulances": (1, 2, 3)})
+    inputs = InputTracker(ingestor)
+    await inputs.refresh()
+    hospital, patient = ingestor.hospitals[0], ingestor.patients[0]
+    assignments = {
+        patient.id: PatientAssignment(
+            patient_id=patient.id,
+            hospital_id=hospital.id,
+            treatment_deadline_minutes=patient.time_to_hospital_minutes,
+            patient_registered_at=patient.registered_at,
+        )
+    }
+    context = _routing_context()
+    context.matrix_cache.put((1.0, 1.0), (0.0, 0.0), now, 17)
+    context.grid_table.sync_hospitals(ingestor.hospitals)
+    context.grid_table.store(context.grid_table.cell_for(1.0, 1.0), {hospital.id: 17}, {hospital.id}, now)
+    context.estimator.observe_batch([(1.0, 1.0)] * 5, [(0.0, 0.0)] * 5, [40] * 5, at=now)
+
+    checkpoint = WorkerCheckpoint(tmp_path / "worker.json.gz")
+    checkpoint.save(checkpoint.collect(inputs, assignments, context))
+
+    restarted_inputs = InputTracker(ingestor)
+    restarted_assignments: dict = {}
+    restarted = _routing_context()
+    assert checkpoint.restore(restarted_inputs, restarted_assignments, restarted) is True
+
+    ingestor.loads.clear()
+    assert await restarted_inputs.refresh() is False  # nothing changed while the worker was down
+    assert ingestor.loads == []
+    assert restarted_inputs.patients == ingestor.patients
+    assert restarted_assignments == assignments
+    assert restarted.matrix_cache.get((1.0, 1.0), (0.0, 0.0), now) == 17
+    assert restarted.grid_table.lookup(1.0, 1.0, ingestor.hospitals, now) == {0: 17}
+    assert restarted.estimator.estimate_minutes((1.0, 1.0), (0.0, 0.0), now) == context.estimator.estimate_minutes(
+        (1.0, 1.0), (0.0, 0.0), now
+    )
+
+
+def test_checkpoint_restore_without_file_starts_cold(tmp_path):
+    checkpoint = WorkerCheckpoint(tmp_path / "missing.json")
+    assert checkpoint.restore(InputTracker(_FakeIngestor(None)), {}) is False
@@ -0,0 +1,74 @@
+import random
+from datetime import UTC, datetime
+
+import numpy as np
+
+from hospitopt_worker.estimate import TravelTimeEstimator
+from hospitopt_worker.geo import haversine_meters
+
+MORNING = datetime(2026, 1, 1, 8, 15, tzinfo=UTC)
+
+
+def _observations(rng: random.Random, lat: float, lon: float, count: int) -> list[tuple[float, float]]:
+    return [(lat + rng.uniform(0, 0.09), lon + rng.uniform(0, 0.09)) for _ in range(count)]
+
+
+def _km(origin: tuple[float, float], destination: tuple[float, float]) -> float:
+    return haversine_meters(origin, destination) / 1000
+
+
+def test_estimator_uses_prior_speed_without_observations():
+    estimator = TravelTimeEstimator(speed_kph=60.0)
+
+    assert estimator.estimate_minutes((0.0, 0.0), (0.0, 0.0), MORNING) == 1
+    assert estimator.estimate_minutes((0.0, 0.0), (0.0, 0.1), MORNING) == 12  # ~11.1 km
+
+
+def test_estimator_learns_per_region_and_bucket():
+    rng = random.Random(7)
+    estimator = TravelTimeEstimator(speed_kph=60.0, min_observations=10)
+    city = _observations(rng, 38.70, -9.20, 200)
+    rural = _observations(rng, 39.50, -8.00, 200)
+    destinations = _observations(rng, 38.70, -9.20, 200)
+    rural_destinations = _observations(rng, 39.50, -8.00, 200)
+
+    # slow, winding city roads with a fixed 3 minute overhead vs. fast rural roads
+    city_minutes = [round(3 + 4.0 * _km(o, d)) for o, d in zip(city, destinations)]
+    rural_minutes = [max(1, round(1.0 * _km(o, d))) for o, d in zip(rural, rural_destinations)]
+    estimator.observe_batch(city, destinations, city_minutes, MORNING)
+    estimator.observe_batch(rural, rural_destinations, rural_minutes, MORNING)
+
+    assert abs(estimator.estimate_minutes((38.72, -9.18), (38.72, -9.13), MORNING) - (3 + 4.0 * 4.35)) <= 2
+    assert abs(estimator.estimate_minutes((39.52, -7.98), (39.52, -7.93), MORNING) - 4.3) <= 2
+    # another time of day has no bucket model yet, but the global model already beats the 60 km/h prior
+    evening = MORNING.replace(hour=19)
+    assert estimator.estimate_minutes((38.72, -9.18), (38.72, -9.13), evening) > 5
+
+
+def test_estimator_matrix_matches_single_estimates():
+    rng = random.Random(3)
+    estimator = TravelTimeEstimator(min_observations=5)
+    origins = _observations(rng, 38.70, -9.20, 50)
+    destinations = _observations(rng, 38.70, -9.20, 50)
+    estimator.observe_batch(origins, destinations, [10] * 50, MORNING)
+
+    matrix = estimator.estimate_matrix(origins[:3], destinations[:4], MORNING)
+
+    assert matrix.shape == (3, 4)
+    assert matrix.tolist() == [
+        [estimator.estimate_minutes(o, d, MORNING) for d in destinations[:4]] for o in origins[:3]
+    ]
+    assert estimator.estimate_matrix([], destinations, MORNING).shape == (0, 50)
+
+
+def test_estimator_reports_error_distribution():
+    estimator = TravelTimeEstimator(speed_kph=60.0, error_window=3)
+    assert estimator.error_summary().count == 0
+
+    for minutes in (14, 16, 22, 12):  # estimated 12 minutes each time while below min_observations
+        estimator.observe((0.0, 0.0), (0.0, 0.1), minutes, MORNING)
+
+    summary = estimator.error_summary()
+    assert summary.count == 4
+    assert summary.mean_error_minutes == np.mean([4, 10, 0])
+    assert summary.p95_absolute_error_minutes <= 10
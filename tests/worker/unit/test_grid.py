@@ -0,0 +1,113 @@
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from hospitopt_core.domain.models import Ambulance, Hospital, Patient
+from hospitopt_worker import routes
+from hospitopt_worker.grid import HospitalGridTable
+
+
+def _hospitals() -> list[Hospital]:
+    return [
+        Hospital(name="A", bed_capacity=5, lat=38.70, lon=-9.10),
+        Hospital(name="B", bed_capacity=5, lat=38.75, lon=-9.15),
+    ]
+
+
+def test_grid_lookup_hit_miss_and_stale():
+    hospitals = _hospitals()
+    table = HospitalGridTable(resolution_degrees=0.01)
+    table.sync_hospitals(hospitals)
+    now = datetime(2026, 1, 1, 8, 30, tzinfo=UTC)
+
+    assert table.lookup(38.7212, -9.1388, hospitals, now) is None
+
+    cell = table.cell_for(38.7212, -9.1388)
+    table.store(cell, {hospitals[0].id: 12, hospitals[1].id: 7}, {h.id for h in hospitals}, now)
+
+    assert table.lookup(38.7218, -9.1381, hospitals, now) == {0: 12, 1: 7}
+    # a different time-of-day bucket misses
+    assert table.lookup(38.7218, -9.1381, hospitals, now + timedelta(hours=3)) is None
+
+    table.mark_stale(cell)
+    assert table.lookup(38.7218, -9.1381, hospitals, now) is None
+    assert cell in table.cells_to_refresh(now, limit=10)
+
+
+def test_grid_sync_hospitals_invalidates_moved_hospital():
+    hospitals = _hospitals()
+    table = HospitalGridTable(resolution_degrees=0.01)
+    table.sync_hospitals(hospitals)
+    now = datetime(2026, 1, 1, 8, 30, tzinfo=UTC)
+    cell = table.cell_for(38.72, -9.13)
+    table.store(cell, {hospitals[0].id: 12, hospitals[1].id: 7}, {h.id for h in hospitals}, now)
+
+    moved = [hospitals[0], hospitals[1].model_copy(update={"lat": 38.80})]
+    table.sync_hospitals(moved)
+
+    assert table.lookup(38.72, -9.13, moved, now) is None
+    assert table.cells_to_refresh(now, limit=10) == [cell]
+
+
+@pytest.mark.asyncio
+async def test_build_minutes_tables_routes_only_grid_misses(monkeypatch):
+    calls = []
+
+    async def fake_compute(client, origins, destinations, travel_mode=None, **kwargs):
+        calls.append((origins, destinations))
+        return [
+            routes.RouteMatrixEntry(origin_index=o, destination_index=d, duration_minutes=30)
+            for o in range(len(origins))
+            for d in range(len(destinations))
+        ]
+
+    monkeypatch.setattr(routes, "_compute_route_matrix_minutes", fake_compute)
+
+    hospitals = _hospitals()
+    patients = [
+        Patient(lat=38.7212, lon=-9.1388, time_to_hospital_minutes=60),
+        Patient(lat=38.9, lon=-9.3, time_to_hospital_minutes=60),
+    ]
+    ambulances = [Ambulance(lat=38.71, lon=-9.12)]
+    table = HospitalGridTable(resolution_degrees=0.01)
+    table.sync_hospitals(hospitals)
+    table.store(
+        table.cell_for(38.7212, -9.1388),
+        {hospitals[0].id: 12, hospitals[1].id: 7},
+        {h.id for h in hospitals},
+        datetime.now(UTC),
+    )
+
+    minutes_tables = await routes.build_minutes_tables(
+        client=None,
+        patients=patients,
+        hospitals=hospitals,
+        ambulances=ambulances,
+        context=routes.RoutingContext(grid_table=table),
+    )
+
+    assert calls[0][0] == [(38.9, -9.3)]
+    assert minutes_tables.patient_to_hospital == {(0, 0): 12, (0, 1): 7, (1, 0): 30, (1, 1): 30}
+    assert minutes_tables.ambulance_to_patient == {(0, 0): 30, (0, 1): 30}
+
+
+@pytest.mark.asyncio
+async def test_refresh_hospital_grid_stores_cell_minutes(monkeypatch):
+    async def fake_compute(client, origins, destinations, travel_mode=None, **kwargs):
+        return [
+            routes.RouteMatrixEntry(origin_index=o, destination_index=d, duration_minutes=10 + d)
+            for o in range(len(origins))
+            for d in range(len(destinations))
+        ]
+
+    monkeypatch.setattr(routes, "_compute_route_matrix_minutes", fake_compute)
+
+    hospitals = _hospitals()
+    table = HospitalGridTable(resolution_degrees=0.01, bounds=(38.701, -9.119, 38.719, -9.101))
+    table.sync_hospitals(hospitals)
+
+    refreshed = await routes.refresh_hospital_grid(None, table, max_cells=100)
+
+    assert refreshed == 4
+    assert table.cells_to_refresh(datetime.now(UTC), limit=100) == []
+    assert table.lookup(38.705, -9.115, hospitals, datetime.now(UTC)) == {0: 10, 1: 11}
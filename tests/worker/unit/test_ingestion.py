@@ -0,0 +1,36 @@
+import pytest
+from pydantic import HttpUrl, SecretStr
+
+from hospitopt_core.db.models import PatientDB
+from hospitopt_worker.ingestion import APIIngestor, SQLAlchemyIngestor
+
+
+def _where(ingestor: SQLAlchemyIngestor) -> str:
+    return str(ingestor._select(PatientDB).compile(compile_kwargs={"literal_binds": True})).split("WHERE")[-1]
+
+
+def test_sqlalchemy_ingestor_limits_shards_to_their_incident():
+    unscoped = SQLAlchemyIngestor(session_factory=None)  # type: ignore[arg-type]
+    assert "WHERE" not in str(unscoped._select(PatientDB))
+
+    assert "patients.incident IN ('north-fire')" in _where(unscoped.for_incident("north-fire"))
+    assert _where(unscoped.for_incident(None)).strip() == "patients.incident IS NULL"
+
+
+def test_api_ingestor_shards_by_explicit_incident_keys_only():
+    ingestor = APIIngestor(host_url=HttpUrl("http://api.test"), api_key=SecretStr("key"))
+
+    shard = ingestor.for_incident("north-fire")
+    assert shard._httpx_async_client.params["incident"] == "north-fire"
+    with pytest.raises(ValueError):
+        ingestor.for_incident(None)
+
+
+def test_sqlalchemy_ingestor_revisions_only_count_rows_of_its_incident():
+    shard = SQLAlchemyIngestor(session_factory=None).for_incident("north-fire")  # type: ignore[arg-type]
+
+    query = str(shard._revision_query().compile(compile_kwargs={"literal_binds": True}))
+
+    assert query.count("incident IN ('north-fire')") == 3
+    assert "max(patients.revision)" in query
+    assert "xmin" not in query.replace("pg_snapshot_xmin", "")
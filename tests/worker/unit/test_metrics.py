@@ -0,0 +1,105 @@
+from google.maps import routing_v2
+from prometheus_client import CollectorRegistry
+
+from hospitopt_core.domain.models import Ambulance, Hospital, OptimizationResult, Patient
+from hospitopt_worker.metrics import WorkerMetrics
+from hospitopt_worker.optimize import OpenIncident, PreparedAllocation, SolveStats
+from hospitopt_worker.routes import RequestHedger
+from hospitopt_worker.usage import ElementUsage, RoutingUsage
+
+
+def _prepared(feasible: dict) -> PreparedAllocation:
+    return PreparedAllocation(
+        incident=OpenIncident(
+            hospitals=[Hospital(name="H", bed_capacity=2, used_beds=0, lat=0.0, lon=0.0)],
+            patients=[Patient(lat=1.0, lon=1.0, time_to_hospital_minutes=20) for _ in range(3)],
+            ambulances=[Ambulance(lat=2.0, lon=2.0) for _ in range(2)],
+            ambulance_delays=[0, 0],
+            committed=[],
+        ),
+        feasible=feasible,
+        feasible_weights={key: 1.0 for key in feasible},
+        capacity_shortfall=1,
+        ambulance_shortfall=1,
+        estimated=False,
+    )
+
+
+def test_record_solve_sets_model_gauges_and_counts_terminations():
+    registry = CollectorRegistry()
+    metrics = WorkerMetrics(registry).for_incident("north")
+    prepared = _prepared({(0, 0, 0): 5, (1, 1, 0): 7})
+    patient_ids = [patient.id for patient in prepared.incident.patients]
+    result = OptimizationResult(max_lives_saved=2, assignments=[], unassigned_patient_ids=patient_ids[2:])
+
+    metrics.record_solve(prepared, result, SolveStats(build_seconds=0.2, solve_seconds=0.5, termination="optimal"))
+
+    def sample(name, **labels):
+        return registry.get_sample_value(name, {"incident": "north", **labels})
+
+    assert sample("hospitopt_worker_patients") == 3
+    assert sample("hospitopt_worker_ambulances") == 2
+    assert sample("hospitopt_worker_hospitals") == 1
+    assert sample("hospitopt_worker_feasible_triples") == 2
+    assert sample("hospitopt_worker_unassigned_patients") == 1
+    assert sample("hospitopt_worker_solver_terminations_total", termination="optimal") == 1
+    assert sample("hospitopt_worker_stage_seconds_sum", stage="solve") == 0.5
+    assert sample("hospitopt_worker_stage_seconds_count", stage="build") == 1
+
+
+def test_empty_model_counts_as_skipped_and_clear_drops_incident_gauges():
+    registry = CollectorRegistry()
+    metrics = WorkerMetrics(registry).for_incident("north")
+    prepared = _prepared({})
+    result = OptimizationResult(max_lives_saved=0, assignments=[], unassigned_patient_ids=[])
+
+    metrics.record_solve(prepared, result, SolveStats())
+    metrics.watch_queue_depth("snapshots", lambda: 1)
+
+    def sample(name, **labels):
+        return registry.get_sample_value(name, {"incident": "north", **labels})
+
+    assert sample("hospitopt_worker_skipped_cycles_total", reason="no_candidates") == 1
+    assert sample("hospitopt_worker_stage_seconds_count", stage="solve") is None
+    assert sample("hospitopt_worker_queue_depth", queue="snapshots") == 1
+
+    metrics.clear()
+
+    assert sample("hospitopt_worker_patients") is None
+    assert sample("hospitopt_worker_queue_depth", queue="snapshots") is None
+
+
+def test_hedger_counters_are_exported_at_scrape_time():
+    registry = CollectorRegistry()
+    hedger = RequestHedger(max_hedge_fraction=0.1)
+    WorkerMetrics(registry).watch_hedger(hedger)
+
+    hedger.requests, hedger.hedged, hedger.hedge_wins = 40, 4, 3
+
+    assert registry.get_sample_value("hospitopt_worker_hedge_requests_total") == 40
+    assert registry.get_sample_value("hospitopt_worker_hedged_requests_total") == 4
+    assert registry.get_sample_value("hospitopt_worker_hedge_wins_total") == 3
+    assert registry.get_sample_value("hospitopt_worker_hedge_rate") == 0.1
+    assert registry.get_sample_value("hospitopt_worker_hedge_rate_limit") == 0.1
+
+
+def test_routing_usage_is_counted_by_matrix_and_preference():
+    registry = CollectorRegistry()
+    metrics = WorkerMetrics(registry).for_incident("north")
+    usage = RoutingUsage()
+    usage.counter("patient_to_hospital").billed += 6
+    usage.counter("patient_to_hospital").requests += 2
+    usage.counter("prefetch", routing_v2.RoutingPreference.TRAFFIC_AWARE).cached += 3
+
+    metrics.record_routing(usage.take())
+    metrics.record_routing({("patient_to_hospital", "TRAFFIC_AWARE_OPTIMAL"): ElementUsage(billed=1)})
+
+    def sample(name, matrix, preference, kind):
+        labels = {"incident": "north", "matrix": matrix, "preference": preference, "kind": kind}
+        return registry.get_sample_value(name, labels)
+
+    elements, requests = "hospitopt_worker_route_matrix_elements_total", "hospitopt_worker_route_matrix_requests_total"
+    assert sample(elements, "patient_to_hospital", "TRAFFIC_AWARE_OPTIMAL", "billed") == 7
+    assert sample(requests, "patient_to_hospital", "TRAFFIC_AWARE_OPTIMAL", "sent") == 2
+    assert sample(requests, "patient_to_hospital", "TRAFFIC_AWARE_OPTIMAL", "failed") == 0
+    assert sample(elements, "prefetch", "TRAFFIC_AWARE", "cached") == 3
@@ -1,12 +1,14 @@
+from datetime import UTC, datetime, timedelta
+
 import pytest
 
-from hospitopt_core.domain.models import Ambulance, Hospital, MinutesTables, Patient
-from hospitopt_worker import optimize
+from hospitopt_core.domain.models import Ambulance, Hospital, MinutesTables, Patient, PatientAssignment
+from hospitopt_worker import optimize, routes
 
 
 @pytest.mark.asyncio
 async def test_optimize_assigns_feasible(monkeypatch):
-    async def fake_build_minutes_tables(client, patients, hospitals, ambulances, travel_mode=None):
+    async def fake_build_minutes_tables(client, patients, hospitals, ambulances, travel_mode=None, **kwargs):
         # patient->hospital and ambulance->patient matrices
         return MinutesTables(
             patient_to_hospital={(0, 0): 5},
@@ -36,7 +38,7 @@ async def test_optimize_assigns_feasible(monkeypatch):
 
 @pytest.mark.asyncio
 async def test_optimize_skips_over_capacity(monkeypatch):
-    async def fake_build_minutes_tables(client, patients, hospitals, ambulances, travel_mode=None):
+    async def fake_build_minutes_tables(client, patients, hospitals, ambulances, travel_mode=None, **kwargs):
         return optimize.MinutesTables(
             patient_to_hospital={(0, 0): 5},
             ambulance_to_patient={(0, 0): 5},
@@ -63,7 +65,7 @@ async def test_optimize_skips_over_capacity(monkeypatch):
 
 @pytest.mark.asyncio
 async def test_optimize_prioritizes_urgent(monkeypatch):
-    async def fake_build_minutes_tables(client, patients, hospitals, ambulances, travel_mode=None):
+    async def fake_build_minutes_tables(client, patients, hospitals, ambulances, travel_mode=None, **kwargs):
         # two patients, one hospital, one ambulance
         # patient 0: travel 18, time_to_hospital 20 => slack 2 (weight 0.5)
         # patient 1: travel 12, time_to_hospital 50 => slack 38 (weight ~0.026)
@@ -94,3 +96,125 @@ async def test_optimize_prioritizes_urgent(monkeypatch):
     assigned = [a for a in result.assignments if not a.requires_urgent_transport]
     assert len(assigned) == 1
     assert assigned[0].patient_id == patients[0].id
+
+
+def test_feasibility_builder_evaluates_triples_as_legs_arrive():
+    hospitals = [
+        Hospital(name="H1", bed_capacity=1, lat=0.0, lon=0.0),
+        Hospital(name="Full", bed_capacity=1, used_beds=1, lat=0.0, lon=0.0),
+    ]
+    patients = [Patient(lat=1.0, lon=1.0, time_to_hospital_minutes=20)]
+    builder = optimize.FeasibilityBuilder(patients, hospitals, speed_factor=1.0)
+
+    builder.add_ambulance_to_patient(0, 0, 5)
+    builder.add_ambulance_to_patient(1, 0, 30)
+    assert builder.feasible == {}
+
+    builder.add_patient_to_hospital(0, 0, 10)
+    builder.add_patient_to_hospital(0, 1, 1)
+    assert builder.feasible == {(0, 0, 0): 15}
+    assert builder.feasible_weights == {(0, 0, 0): 1 / 5}
+
+    # a slower update of a known leg drops the triple it no longer satisfies
+    builder.extend_from_tables(
+        MinutesTables(patient_to_hospital={(0, 0): 15}, ambulance_to_patient={(0, 0): 5, (1, 0): 30})
+    )
+    assert builder.feasible == {}
+
+
+@pytest.mark.asyncio
+async def test_build_minutes_tables_streams_into_sink(monkeypatch):
+    async def fake_compute(client, origins, destinations, travel_mode=None, sink=None, **kwargs):
+        entries = [
+            routes.RouteMatrixEntry(origin_index=o, destination_index=d, duration_minutes=5)
+            for o in range(len(origins))
+            for d in range(len(destinations))
+        ]
+        for entry in entries:
+            sink([entry])
+        return entries
+
+    monkeypatch.setattr(routes, "_compute_route_matrix_minutes", fake_compute)
+
+    hospitals = [Hospital(name="H", bed_capacity=2, lat=0.0, lon=0.0)]
+    patients = [
+        Patient(lat=1.0, lon=1.0, time_to_hospital_minutes=20),
+        Patient(lat=2.0, lon=2.0, time_to_hospital_minutes=8),
+    ]
+    ambulances = [Ambulance(lat=2.0, lon=2.0)]
+    builder = optimize.FeasibilityBuilder(patients, hospitals, speed_factor=1.0)
+
+    await routes.build_minutes_tables(None, patients, hospitals, ambulances, sink=builder)
+
+    assert builder.feasible == {(0, 0, 0): 10}
+
+
+def test_split_commitments_reserves_bed_and_reenters_ambulance():
+    now = datetime.now(UTC)
+    hospitals = [Hospital(name="H", bed_capacity=2, used_beds=0, lat=5.0, lon=5.0)]
+    patients = [
+        Patient(lat=1.0, lon=1.0, time_to_hospital_minutes=60),
+        Patient(lat=2.0, lon=2.0, time_to_hospital_minutes=60),
+    ]
+    committed = Ambulance(lat=0.0, lon=0.0, assigned_patient_id=patients[0].id)
+    free = Ambulance(lat=3.0, lon=3.0)
+    previous = PatientAssignment(
+        patient_id=patients[0].id,
+        hospital_id=hospitals[0].id,
+        ambulance_id=committed.id,
+        estimated_travel_minutes=30,
+        treatment_deadline_minutes=60,
+        patient_registered_at=now,
+        optimized_at=now - timedelta(minutes=10),
+    )
+
+    incident = optimize.split_commitments(
+        hospitals, patients, [committed, free], {patients[0].id: previous}, reenter_committed=True, now=now
+    )
+
+    assert incident.patients == [patients[1]]
+    assert incident.hospitals[0].used_beds == 1
+    assert incident.committed == [previous]
+    assert [(a.id, a.lat) for a in incident.ambulances] == [(committed.id, 5.0), (free.id, 3.0)]
+    assert incident.ambulance_delays == [20, 0]
+
+    without_reentry = optimize.split_commitments(hospitals, patients, [committed, free], {})
+    assert without_reentry.patients == [patients[1]]
+    assert without_reentry.ambulances == [free]
+    assert without_reentry.committed == []
+
+
+@pytest.mark.asyncio
+async def test_optimize_excludes_committed_pairs_from_routing(monkeypatch):
+    routed = []
+
+    async def fake_build_minutes_tables(client, patients, hospitals, ambulances, travel_mode=None, **kwargs):
+        routed.append((patients, ambulances))
+        return MinutesTables(patient_to_hospital={}, ambulance_to_patient={})
+
+    monkeypatch.setattr(optimize, "build_minutes_tables", fake_build_minutes_tables)
+
+    hospitals = [Hospital(name="H", bed_capacity=1, used_beds=0, lat=0.0, lon=0.0)]
+    patients = [Patient(lat=1.0, lon=1.0, time_to_hospital_minutes=20)]
+    ambulance = Ambulance(lat=2.0, lon=2.0, assigned_patient_id=patients[0].id)
+    previous = PatientAssignment(
+        patient_id=patients[0].id,
+        hospital_id=hospitals[0].id,
+        ambulance_id=ambulance.id,
+        estimated_travel_minutes=10,
+        treatment_deadline_minutes=20,
+        patient_registered_at=patients[0].registered_at,
+    )
+
+    result = await optimize.optimize_allocation(
+        routes_client=None,
+        hospitals=hospitals,
+        patients=patients,
+        ambulances=[ambulance],
+        previous_assignments={patients[0].id: previous},
+    )
+
+    assert routed == [([], [])]
+    assert result.assignments == [previous]
+    assert result.max_lives_saved == 1
+    assert result.unassigned_patient_ids == []
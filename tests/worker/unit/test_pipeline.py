@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from hospitopt_worker.pipeline import LatestSlot, run_stages
+
+
+@pytest.mark.asyncio
+async def test_latest_slot_hands_only_the_freshest_item_to_a_slow_consumer():
+    slot: LatestSlot[int] = LatestSlot()
+    consumed = []
+
+    async def consumer():
+        while True:
+            consumed.append(await slot.get())
+            await asyncio.sleep(0.05)  # slow stage
+
+    task = asyncio.create_task(consumer())
+    slot.put(1)
+    await asyncio.sleep(0.01)
+    for item in (2, 3, 4):
+        slot.put(item)
+    await asyncio.sleep(0.1)
+    task.cancel()
+
+    assert consumed == [1, 4]
+    assert slot.dropped == 2
+
+
+@pytest.mark.asyncio
+async def test_run_stages_cancels_remaining_stages_when_one_fails():
+    cancelled = asyncio.Event()
+
+    async def forever():
+        try:
+            await asyncio.sleep(3600)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError, match="boom"):
+        await run_stages(forever(), failing())
+    assert cancelled.is_set()
+
+
+@pytest.mark.asyncio
+async def test_latest_slot_merges_dropped_items_into_their_replacement():
+    slot: LatestSlot[list[int]] = LatestSlot(lambda dropped, item: dropped + item)
+
+    assert slot.put([1]) is None
+    assert slot.put([2]) == [1]
+    slot.put([3])
+
+    assert await slot.get() == [1, 2, 3]
+    assert slot.dropped == 2
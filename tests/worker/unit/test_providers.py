@@ -0,0 +1,226 @@
+from pathlib import Path
+
+import pytest
+from google.api_core import exceptions as core_exceptions
+from google.maps import routing_v2
+
+from hospitopt_worker import routes
+from hospitopt_worker.providers import (
+    FakeRouteMatrixProvider,
+    OfflineRouteMatrixProvider,
+    RecordingProvider,
+    ReplayProvider,
+    RoadGraph,
+)
+
+GRAPHML = """<?xml version="1.0" encoding="utf-8"?>
+<graphml xmlns="http://graphml.graphdrawing.org/xmlns">
+  <key id="d0" for="node" attr.name="y" attr.type="string"/>
+  <key id="d1" for="node" attr.name="x" attr.type="string"/>
+  <key id="d2" for="edge" attr.name="length" attr.type="string"/>
+  <key id="d3" for="edge" attr.name="travel_time" attr.type="string"/>
+  <graph edgedefault="directed">
+    <node id="1"><data key="d0">0.0</data><data key="d1">0.0</data></node>
+    <node id="2"><data key="d0">0.0</data><data key="d1">0.01</data></node>
+    <node id="3"><data key="d0">0.0</data><data key="d1">0.02</data></node>
+    <edge source="1" target="2"><data key="d2">1000</data><data key="d3">60</data></edge>
+    <edge source="2" target="3"><data key="d2">1000</data><data key="d3">120</data></edge>
+    <edge source="1" target="3"><data key="d2">2500</data><data key="d3">600</data></edge>
+  </graph>
+</graphml>
+"""
+
+
+def test_road_graph_from_csv_respects_oneway(tmp_path: Path):
+    path = tmp_path / "edges.csv"
+    path.write_text(
+        "source_lat,source_lon,target_lat,target_lon,length_meters,travel_time_seconds,oneway\n"
+        "0.0,0.0,0.0,0.01,1000,60,false\n"
+        "0.0,0.01,0.0,0.02,1000,,true\n"
+    )
+
+    graph = RoadGraph.load(path, default_speed_kph=36.0)
+
+    assert len(graph.coords) == 3
+    assert graph.shortest_paths(0, {2}) == {2: (160.0, 2000.0)}
+    assert graph.shortest_paths(1, {0}) == {0: (60.0, 1000.0)}
+    assert graph.shortest_paths(2, {0}) == {}
+
+
+@pytest.mark.asyncio
+async def test_offline_provider_computes_matrix(tmp_path: Path):
+    path = tmp_path / "graph.graphml"
+    path.write_text(GRAPHML)
+    provider = OfflineRouteMatrixProvider(RoadGraph.load(path), max_snap_distance_meters=500)
+
+    result = await routes._compute_route_matrix_minutes(
+        provider,
+        origins=[(0.0, 0.0), (5.0, 5.0)],
+        destinations=[(0.0, 0.02), (0.0, 0.0)],
+    )
+
+    # node 1 -> node 3 takes the 3 minute detour via node 2; the far-away origin cannot be snapped
+    assert sorted((e.origin_index, e.destination_index, e.duration_minutes) for e in result) == [
+        (0, 0, 3),
+        (0, 1, 1),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_scheduler_does_not_retry_unreachable_offline_pairs(tmp_path: Path):
+    class _CountingProvider(OfflineRouteMatrixProvider):
+        requests = 0
+
+        async def compute_route_matrix(self, request, metadata=()):
+            self.requests += 1
+            return await super().compute_route_matrix(request, metadata)
+
+    path = tmp_path / "graph.graphml"
+    path.write_text(GRAPHML)
+    provider = _CountingProvider(RoadGraph.load(path), max_snap_distance_meters=500)
+    scheduler = routes.RouteMatrixScheduler(backoff_base_seconds=0.0001, backoff_max_seconds=0.0001)
+    usage = routes.ElementUsage()
+
+    # the graph is directed, so node 3 cannot reach node 1
+    result = await routes._compute_route_matrix_minutes(
+        provider, origins=[(0.0, 0.02)], destinations=[(0.0, 0.0)], scheduler=scheduler, usage=usage
+    )
+
+    assert result == []
+    assert provider.requests == 1
+    assert usage.unroutable == 1
+
+
+@pytest.mark.asyncio
+async def test_offline_provider_routes_whole_matrices_with_one_search_per_origin(tmp_path: Path):
+    class _CountingGraph(RoadGraph):
+        searches = 0
+
+        def shortest_paths(self, source, targets):
+            self.searches += 1
+            return super().shortest_paths(source, targets)
+
+    path = tmp_path / "graph.graphml"
+    path.write_text(GRAPHML)
+    graph = _CountingGraph.from_graphml(path)
+    recording = tmp_path / "routes.jsonl"
+    provider = RecordingProvider(OfflineRouteMatrixProvider(graph, max_snap_distance_meters=500), recording)
+    # 110 elements exceed the Routes API limit of TRAFFIC_AWARE_OPTIMAL requests; all origins snap to node 1
+    origins = [(0.0, 0.0001 * i) for i in range(11)]
+    destinations = [(0.0, 0.02 + 0.0001 * i) for i in range(10)]
+
+    result = await routes._compute_route_matrix_minutes(provider, origins=origins, destinations=destinations)
+
+    assert len(result) == 110
+    assert graph.searches == 1
+    assert len(recording.read_text().splitlines()) == 1
+    replayed = await routes._compute_route_matrix_minutes(
+        ReplayProvider(recording), origins=origins, destinations=destinations
+    )
+    assert replayed == result
+
+
+def test_road_graph_rejects_unknown_format(tmp_path: Path):
+    with pytest.raises(ValueError, match="Unsupported road graph format"):
+        RoadGraph.load(tmp_path / "graph.osm")
+
+
+@pytest.mark.asyncio
+async def test_record_and_replay_round_trip(tmp_path: Path):
+    graph_path = tmp_path / "graph.graphml"
+    graph_path.write_text(GRAPHML)
+    recording = tmp_path / "routes.jsonl.gz"
+    origins = [(0.0, 0.0), (0.0, 0.01)]
+    destinations = [(0.0, 0.02)]
+
+    recorder = RecordingProvider(OfflineRouteMatrixProvider(RoadGraph.load(graph_path)), recording)
+    recorded = await routes._compute_route_matrix_minutes(recorder, origins=origins, destinations=destinations)
+
+    replay = ReplayProvider(recording)
+    first = await routes._compute_route_matrix_minutes(replay, origins=origins, destinations=destinations)
+    second = await routes._compute_route_matrix_minutes(replay, origins=origins, destinations=destinations)
+
+    assert recorded == first == second
+    with pytest.raises(LookupError, match="No recorded route matrix"):
+        await routes._compute_route_matrix_minutes(replay, origins=origins, destinations=[(1.0, 1.0)])
+
+
+@pytest.mark.asyncio
+async def test_recording_concurrent_streams_keeps_every_request(tmp_path: Path):
+    recording = tmp_path / "routes.jsonl.gz"
+    recorder = RecordingProvider(FakeRouteMatrixProvider(max_elements=1), recording)
+    scheduler = routes.RouteMatrixScheduler(max_concurrency=8)
+    origins = [(0.0, 0.01 * i) for i in range(4)]
+    destinations = [(0.01 * i, 0.0) for i in range(4)]
+
+    recorded = await routes._compute_route_matrix_minutes(
+        recorder, origins=origins, destinations=destinations, scheduler=scheduler
+    )
+    replayed = await routes._compute_route_matrix_minutes(
+        ReplayProvider(recording), origins=origins, destinations=destinations
+    )
+
+    def _pairs(entries):
+        return sorted((e.origin_index, e.destination_index, e.duration_minutes) for e in entries)
+
+    assert len(recorded) == 16
+    assert _pairs(replayed) == _pairs(recorded)
+
+
+@pytest.mark.asyncio
+async def test_fake_provider_synthesizes_durations_from_distance():
+    provider = FakeRouteMatrixProvider(speed_kph=60.0, circuity=1.0)
+
+    result = await routes._compute_route_matrix_minutes(
+        provider, origins=[(0.0, 0.0)], destinations=[(0.0, 0.1), (0.0, 0.2)]
+    )
+
+    # 0.1 degrees of longitude at the equator is ~11.1 km, i.e. ~11.1 minutes at 60 km/h
+    assert sorted((e.destination_index, e.duration_minutes) for e in result) == [(0, 12), (1, 23)]
+
+
+@pytest.mark.asyncio
+async def test_fake_provider_injected_failures_are_retried():
+    provider = FakeRouteMatrixProvider(quota_error_rate=0.3, element_error_rate=0.3, stream_error_rate=0.2, seed=7)
+    scheduler = routes.RouteMatrixScheduler(max_retries=20, backoff_base_seconds=0.0001, backoff_max_seconds=0.0001)
+    origins = [(0.0, 0.01 * i) for i in range(5)]
+    destinations = [(0.01 * i, 0.0) for i in range(4)]
+
+    result = await routes._compute_route_matrix_minutes(
+        provider, origins=origins, destinations=destinations, scheduler=scheduler
+    )
+
+    assert len(result) == 20
+    assert provider.requests > 1
+
+
+@pytest.mark.asyncio
+async def test_fake_provider_rejects_oversized_requests():
+    provider = FakeRouteMatrixProvider(max_elements=1)
+    request = routes._build_request(
+        [(0.0, 0.0)],
+        [(0.0, 0.1), (0.0, 0.2)],
+        routing_v2.RouteTravelMode.DRIVE,
+        routing_v2.RoutingPreference.TRAFFIC_AWARE,
+    )
+
+    with pytest.raises(core_exceptions.InvalidArgument):
+        await provider.compute_route_matrix(request)
+
+
+@pytest.mark.asyncio
+async def test_fake_provider_element_limit_follows_routing_preference():
+    provider = FakeRouteMatrixProvider()
+    origins = [(0.0, 0.01 * i) for i in range(11)]
+    destinations = [(0.01 * i, 0.0) for i in range(10)]
+
+    def _request(preference):
+        return routes._build_request(origins, destinations, routing_v2.RouteTravelMode.DRIVE, preference)
+
+    with pytest.raises(core_exceptions.InvalidArgument, match="exceeds 100"):
+        await provider.compute_route_matrix(_request(routing_v2.RoutingPreference.TRAFFIC_AWARE_OPTIMAL))
+    await provider.compute_route_matrix(_request(routing_v2.RoutingPreference.TRAFFIC_AWARE))
+
+    # the worker chunks traffic-aware optimal matrices to the lower limit
+    result = await routes._compute_route_matrix_minutes(provider, origins=origins, destinations=destinations)
+    assert len(result) == 110
@@ -1,9 +1,14 @@
-from datetime import timedelta
+import asyncio
+from datetime import UTC, datetime, timedelta
 
 import pytest
+from google.api_core import exceptions as core_exceptions
 
 from hospitopt_core.domain.models import Ambulance, Hospital, Patient
 from hospitopt_worker import routes
+from hospitopt_worker.estimate import TravelTimeEstimator
+from hospitopt_worker.providers import FakeRouteMatrixProvider
+from hospitopt_worker.usage import ElementUsage, RoutingUsage
 
 
 class _Status:
@@ -28,9 +33,11 @@ class _DummyClient:
     def __init__(self, elements):
         self.elements = elements
         self.last_metadata = None
+        self.last_request = None
 
     async def compute_route_matrix(self, request, metadata=None):
         self.last_metadata = metadata
+        self.last_request = request
         return _async_gen(self.elements)
 
 
@@ -53,12 +60,52 @@ async def test_compute_route_matrix_minutes_filters_invalid():
         routes.RouteMatrixEntry(origin_index=0, destination_index=0, duration_minutes=12),
         routes.RouteMatrixEntry(origin_index=1, destination_index=0, duration_minutes=15),
     ]
-    assert client.last_metadata == [("x-goog-fieldmask", "duration,distance_meters,origin_index,destination_index")]
+    assert client.last_metadata == [
+        ("x-goog-fieldmask", "duration,distance_meters,origin_index,destination_index,status")
+    ]
+
+
+@pytest.mark.asyncio
+async def test_compute_route_matrix_minutes_deduplicates_coordinates():
+    elements = [
+        _Element(0, 0, duration=timedelta(minutes=7)),
+        _Element(1, 0, duration=timedelta(minutes=9)),
+    ]
+    client = _DummyClient(elements)
+
+    result = await routes._compute_route_matrix_minutes(
+        client,
+        origins=[(0.0, 0.0), (1.0, 1.0), (0.0, 0.0)],
+        destinations=[(2.0, 2.0), (2.0, 2.0)],
+    )
+
+    assert len(client.last_request.origins) == 2
+    assert len(client.last_request.destinations) == 1
+    assert sorted((e.origin_index, e.destination_index, e.duration_minutes) for e in result) == [
+        (0, 0, 7),
+        (0, 1, 7),
+        (1, 0, 9),
+        (1, 1, 9),
+        (2, 0, 7),
+        (2, 1, 7),
+    ]
+
+
+def test_dedupe_coords_snaps_to_grid():
+    coords = [(38.70001, -9.10001), (38.70002, -9.10002), (38.71, -9.1)]
+
+    exact_unique, exact_groups = routes._dedupe_coords(coords)
+    snapped_unique, snapped_groups = routes._dedupe_coords(coords, snap_resolution_degrees=0.001)
+
+    assert exact_unique == coords
+    assert exact_groups == [[0], [1], [2]]
+    assert snapped_unique == [(38.70001, -9.10001), (38.71, -9.1)]
+    assert snapped_groups == [[0, 1], [2]]
 
 
 @pytest.mark.asyncio
 async def test_build_minutes_tables_uses_compute(monkeypatch):
-    async def fake_compute(client, origins, destinations, travel_mode=None):
+    async def fake_compute(client, origins, destinations, travel_mode=None, **kwargs):
         return [
             routes.RouteMatrixEntry(
                 origin_index=0,
@@ -115,3 +162,402 @@ async def test_compute_route_matrix_minutes_both_empty() -> None:
         destinations=[],
     )
     assert result == []
+
+
+class _FlakyClient:
+    """Fails the first request with a quota error and one element with RESOURCE_EXHAUSTED on the second."""
+
+    def __init__(self):
+        self.requests = []
+
+    async def compute_route_matrix(self, request, metadata=None):
+        self.requests.append((len(request.origins), len(request.destinations)))
+        if len(self.requests) == 1:
+            raise core_exceptions.ResourceExhausted("quota")
+        elements = []
+        for o in range(len(request.origins)):
+            for d in range(len(request.destinations)):
+                failed = len(self.requests) == 2 and (o, d) == (1, 1)
+                elements.append(_Element(o, d, duration=timedelta(minutes=10 + o), status_code=8 if failed else 0))
+        return _async_gen(elements)
+
+
+@pytest.mark.asyncio
+async def test_scheduler_retries_only_failed_elements():
+    client = _FlakyClient()
+    scheduler = routes.RouteMatrixScheduler(backoff_base_seconds=0.001, backoff_max_seconds=0.001)
+
+    result = await routes._compute_route_matrix_minutes(
+        client,
+        origins=[(0.0, 0.0), (1.0, 1.0)],
+        destinations=[(2.0, 2.0), (3.0, 3.0)],
+        scheduler=scheduler,
+    )
+
+    assert client.requests == [(2, 2), (2, 2), (1, 1)]
+    assert sorted((e.origin_index, e.destination_index, e.duration_minutes) for e in result) == [
+        (0, 0, 10),
+        (0, 1, 10),
+        (1, 0, 11),
+        (1, 1, 10),
+    ]
+
+
+def test_scheduler_aimd_concurrency_limit():
+    scheduler = routes.RouteMatrixScheduler(min_concurrency=1, max_concurrency=8, latency_target_seconds=1.0)
+    assert scheduler.concurrency_limit == 4
+
+    scheduler.record(latency_seconds=0.1, failed=True)
+    assert scheduler.concurrency_limit == 2
+    scheduler.record(latency_seconds=5.0, failed=False)
+    assert scheduler.concurrency_limit == 1
+    scheduler.record(latency_seconds=5.0, failed=False)
+    assert scheduler.concurrency_limit == 1
+
+    for _ in range(100):
+        scheduler.record(latency_seconds=0.1, failed=False)
+    assert scheduler.concurrency_limit == 8
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_waits_for_refill():
+    bucket = routes.TokenBucket(rate_per_minute=6000, capacity=1)
+
+    await bucket.acquire()
+    started = routes.time.monotonic()
+    await bucket.acquire()
+
+    assert routes.time.monotonic() - started >= 0.005
+
+
+@pytest.mark.asyncio
+async def test_build_minutes_tables_estimates_after_deadline_then_refreshes(monkeypatch):
+    release = asyncio.Event()
+
+    async def fake_compute(client, origins, destinations, travel_mode=None, sink=None, **kwargs):
+        entries = [
+            routes.RouteMatrixEntry(origin_index=o, destination_index=d, duration_minutes=7)
+            for o in range(len(origins))
+            for d in range(len(destinations))
+        ]
+        if len(destinations) == 1:  # patient -> hospital answers immediately, ambulance -> patient hangs
+            await release.wait()
+        sink(entries)
+        return entries
+
+    monkeypatch.setattr(routes, "_compute_route_matrix_minutes", fake_compute)
+
+    patients = [Patient(lat=0.0, lon=0.0, time_to_hospital_minutes=10)]
+    hospitals = [Hospital(name="H", bed_capacity=1, lat=0.0, lon=0.1), Hospital(bed_capacity=1, lat=0.0, lon=0.2)]
+    ambulances = [Ambulance(lat=0.1, lon=0.0)]
+    fallback = routes.RoutingFallback(TravelTimeEstimator(speed_kph=60.0), deadline_seconds=0.01)
+    context = routes.RoutingContext(fallback=fallback)
+
+    estimated = await routes.build_minutes_tables(None, patients, hospitals, ambulances, context=context)
+
+    assert estimated.estimated
+    assert estimated.patient_to_hospital == {(0, 0): 7, (0, 1): 7}
+    assert estimated.ambulance_to_patient == {(0, 0): 12}  # ~11.1 km at 60 km/h
+    assert fallback.breaker.is_open is False
+
+    release.set()
+    assert await fallback.wait_for_refresh(timeout=1.0)
+    refreshed = await routes.build_minutes_tables(None, patients, hospitals, ambulances, context=context)
+
+    assert not refreshed.estimated
+    assert refreshed.ambulance_to_patient == {(0, 0): 7}
+
+
+@pytest.mark.asyncio
+async def test_build_minutes_tables_skips_routing_while_circuit_open(monkeypatch):
+    calls = []
+
+    async def failing_compute(client, origins, destinations, travel_mode=None, **kwargs):
+        calls.append(origins)
+        raise core_exceptions.ServiceUnavailable("down")
+
+    monkeypatch.setattr(routes, "_compute_route_matrix_minutes", failing_compute)
+
+    patients = [Patient(lat=0.0, lon=0.0, time_to_hospital_minutes=10)]
+    hospitals = [Hospital(bed_capacity=1, lat=0.0, lon=0.1)]
+    ambulances = [Ambulance(lat=0.1, lon=0.0)]
+    breaker = routes.CircuitBreaker(failure_threshold=1, reset_timeout_seconds=60.0)
+    context = routes.RoutingContext(fallback=routes.RoutingFallback(TravelTimeEstimator(), breaker=breaker))
+
+    first = await routes.build_minutes_tables(None, patients, hospitals, ambulances, context=context)
+    second = await routes.build_minutes_tables(None, patients, hospitals, ambulances, context=context)
+
+    assert first.estimated and second.estimated
+    assert breaker.is_open
+    assert len(calls) == 2  # both matrices of the first cycle only
+
+
+def test_circuit_breaker_half_open_probe(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(routes.time, "monotonic", lambda: now[0])
+    breaker = routes.CircuitBreaker(failure_threshold=2, reset_timeout_seconds=30.0)
+
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    now[0] = 31.0
+    assert breaker.allow()  # single probe
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.allow()
+    assert not breaker.is_open
+
+
+def test_precision_tiers_select_pairs_near_deadline():
+    tiers = routes.PrecisionTiers(band_minutes=5.0, band_fraction=0.0)
+
+    p_to_h, a_to_p = tiers.select(
+        deadlines=[60, 25],
+        speed_factor=1.0,
+        patient_to_hospital={(0, 0): 10, (1, 0): 10, (1, 1): 40},
+        ambulance_to_patient={(0, 0): 10, (0, 1): 12, (1, 1): 50},
+    )
+
+    # only patient 1 via hospital 0 and ambulance 0 lands within 5 minutes of its deadline
+    assert p_to_h == {(1, 0)}
+    assert a_to_p == {(0, 1)}
+
+
+def test_precision_tiers_count_the_ambulance_leg_and_delay_against_the_deadline():
+    tiers = routes.PrecisionTiers(band_minutes=5.0, band_fraction=0.0)
+
+    p_to_h, a_to_p = tiers.select(
+        deadlines=[40],
+        speed_factor=1.0,
+        patient_to_hospital={(0, 0): 10},
+        ambulance_to_patient={(0, 0): 15, (1, 0): 2},
+        ambulance_delays=[12, 0],
+    )
+
+    # the hospital leg alone is far below the deadline, but ambulance 0 is busy for 12 minutes: 12 + 15 + 10 = 37
+    assert p_to_h == {(0, 0)}
+    assert a_to_p == {(0, 0)}
+
+
+@pytest.mark.asyncio
+async def test_build_minutes_tables_refines_only_near_deadline(monkeypatch):
+    preferences = []
+
+    async def fake_compute(client, origins, destinations, travel_mode=None, routing_preference=None, **kwargs):
+        preferences.append((routing_preference, len(origins) * len(destinations)))
+        minutes = 12 if routing_preference == routes.routing_v2.RoutingPreference.TRAFFIC_AWARE_OPTIMAL else 10
+        return [
+            routes.RouteMatrixEntry(origin_index=o, destination_index=d, duration_minutes=minutes)
+            for o in range(len(origins))
+            for d in range(len(destinations))
+        ]
+
+    monkeypatch.setattr(routes, "_compute_route_matrix_minutes", fake_compute)
+
+    hospitals = [Hospital(bed_capacity=2, lat=0.0, lon=0.0)]
+    patients = [
+        Patient(lat=1.0, lon=1.0, time_to_hospital_minutes=90),
+        Patient(lat=2.0, lon=2.0, time_to_hospital_minutes=25),
+    ]
+    ambulances = [Ambulance(lat=3.0, lon=3.0)]
+    context = routes.RoutingContext(precision_tiers=routes.PrecisionTiers())
+
+    minutes_tables = await routes.build_minutes_tables(None, patients, hospitals, ambulances, context=context)
+
+    aware = routes.routing_v2.RoutingPreference.TRAFFIC_AWARE_OPTIMAL
+    assert sum(count for preference, count in preferences if preference == aware) == 2
+    assert minutes_tables.patient_to_hospital == {(0, 0): 10, (1, 0): 12}
+    assert minutes_tables.ambulance_to_patient == {(0, 0): 10, (0, 1): 12}
+
+
+class _CoordinateClient:
+    """Records requested origins and answers every element with minutes derived from the origin latitude."""
+
+    def __init__(self):
+        self.requests = []
+
+    async def compute_route_matrix(self, request, metadata=None):
+        origins = [o.waypoint.location.lat_lng.latitude for o in request.origins]
+        self.requests.append(origins)
+        return _async_gen(
+            [
+                _Element(o, d, duration=timedelta(minutes=round(lat * 1000) + 1), status_code=0)
+                for o, lat in enumerate(origins)
+                for d in range(len(request.destinations))
+            ]
+        )
+
+
+@pytest.mark.asyncio
+async def test_compute_route_matrix_minutes_routes_urgent_origins_first():
+    client = _CoordinateClient()
+    origins = [(i / 1000, 0.0) for i in range(250)]
+
+    result = await routes._compute_route_matrix_minutes(
+        client,
+        origins=origins,
+        destinations=[(1.0, 1.0)],
+        origin_priority=[60.0] * 249 + [5.0],
+    )
+
+    # the last origin is the most urgent, so the first request holds it
+    assert [len(request) for request in client.requests] == [100, 100, 50]
+    assert client.requests[0][0] == pytest.approx(0.249)
+    assert sorted((e.origin_index, e.duration_minutes) for e in result) == [(i, i + 1) for i in range(250)]
+
+
+def test_patient_urgency_subtracts_elapsed_time():
+    now = datetime.now(UTC)
+    patients = [
+        Patient(lat=0.0, lon=0.0, time_to_hospital_minutes=60, registered_at=now - timedelta(minutes=50)),
+        Patient(lat=0.0, lon=0.0, time_to_hospital_minutes=20, registered_at=now),
+    ]
+
+    assert routes.patient_urgency(patients, now) == [10.0, 20.0]
+
+
+@pytest.mark.asyncio
+async def test_request_hedger_duplicates_slow_request_and_cancels_loser():
+    hedger = routes.RequestHedger(min_samples=1, max_hedge_fraction=1.0, min_delay_seconds=0.01)
+    hedger._latencies.append(0.01)
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append("slow")
+            raise
+        return "slow"
+
+    async def fast():
+        return "fast"
+
+    assert await hedger.run(slow, fast) == "fast"
+    await asyncio.sleep(0)
+
+    assert cancelled == ["slow"]
+    assert (hedger.requests, hedger.hedged, hedger.hedge_wins) == (1, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_request_hedger_caps_duplicate_rate():
+    hedger = routes.RequestHedger(percentile=1, min_samples=1, max_hedge_fraction=0.5, min_delay_seconds=0.001)
+    hedger._latencies.append(0.001)
+
+    async def request():
+        await asyncio.sleep(0.01)
+        return 1
+
+    for _ in range(4):
+        assert await hedger.run(request) == 1
+
+    assert hedger.hedged == 2
+    assert hedger.hedge_rate == 0.5
+
+
+@pytest.mark.asyncio
+async def test_compute_route_matrix_minutes_accounts_usage():
+    elements = [
+        _Element(0, 0, duration=timedelta(minutes=12), status_code=0),
+        _Element(0, 1, duration=timedelta(minutes=20), status_code=3),
+    ]
+    usage = RoutingUsage()
+
+    await routes._compute_route_matrix_minutes(
+        _DummyClient(elements),
+        origins=[(0.0, 0.0), (0.0, 0.0)],
+        destinations=[(1.0, 1.0), (2.0, 2.0)],
+        usage=usage.counter("ambulance_to_patient"),
+    )
+
+    counters = usage.take()
+    assert counters == {
+        ("ambulance_to_patient", "TRAFFIC_AWARE_OPTIMAL"): ElementUsage(
+            requests=1, requested=4, skipped=2, billed=2, unroutable=1
+        )
+    }
+    assert RoutingUsage.total(counters).billed == 2
+    assert usage.take() == {}
+
+
+@pytest.mark.asyncio
+async def test_build_minutes_tables_accounts_usage_per_call():
+    provider = FakeRouteMatrixProvider(latency_seconds=0.01)
+    hospitals = [Hospital(bed_capacity=1, lat=0.0, lon=0.0)]
+    ambulances = [Ambulance(lat=0.2, lon=0.2)]
+    context = routes.RoutingContext()
+    first, second = RoutingUsage(), RoutingUsage()
+
+    # two cycles routing at the same time each keep their own usage
+    await asyncio.gather(
+        routes.build_minutes_tables(
+            provider,
+            [Patient(lat=0.1, lon=0.1, time_to_hospital_minutes=30)],
+            hospitals,
+            ambulances,
+            context=context,
+            usage=first,
+        ),
+        routes.build_minutes_tables(
+            provider,
+            [Patient(lat=0.1, lon=0.2 + i / 100, time_to_hospital_minutes=30) for i in range(2)],
+            hospitals,
+            ambulances,
+            context=context,
+            usage=second,
+        ),
+    )
+
+    assert RoutingUsage.total(first.take()).billed == 2
+    assert RoutingUsage.total(second.take()).billed == 4
+
+
+@pytest.mark.asyncio
+async def test_build_minutes_tables_routes_only_changed_rows_with_routed_legs():
+    provider = FakeRouteMatrixProvider()
+    patients = [Patient(lat=0.1, lon=0.1 + i / 100, time_to_hospital_minutes=30) for i in range(3)]
+    hospitals = [Hospital(bed_capacity=1, lat=0.0, lon=i / 100) for i in range(2)]
+    ambulances = [Ambulance(lat=0.2, lon=0.2 + i / 100) for i in range(2)]
+    context = routes.RoutingContext(routed_legs=routes.RoutedLegs())
+    await routes.build_minutes_tables(provider, patients, hospitals, ambulances, context=context, changed=None)
+
+    moved = patients[1].model_copy(update={"lat": 0.3})
+    patients = [patients[0], moved, patients[2]]
+    usage = RoutingUsage()
+    tables = await routes.build_minutes_tables(
+        provider, patients, hospitals, ambulances, context=context, usage=usage, changed={moved.id}
+    )
+
+    counters = usage.take()
+    assert counters[("patient_to_hospital", "TRAFFIC_AWARE_OPTIMAL")].requested == 2  # the moved row only
+    assert counters[("ambulance_to_patient", "TRAFFIC_AWARE_OPTIMAL")].requested == 2  # the moved column only
+    assert RoutingUsage.total(counters).cached == 8
+    fresh = await routes.build_minutes_tables(provider, patients, hospitals, ambulances)
+    assert tables.patient_to_hospital == fresh.patient_to_hospital
+    assert tables.ambulance_to_patient == fresh.ambulance_to_patient
+
+
+def test_routed_legs_route_every_row_again_once_expired_or_estimated(monkeypatch):
+    patients = [Patient(lat=0.1, lon=0.1, time_to_hospital_minutes=30)]
+    hospitals = [Hospital(bed_capacity=1, lat=0.0, lon=0.0)]
+    ambulances = [Ambulance(lat=0.2, lon=0.2)]
+    tables = routes.MinutesTables(
+        patient_to_hospital={(0, 0): 5},
+        ambulance_to_patient={(0, 0): 7},
+    )
+    legs = routes.RoutedLegs(max_age_seconds=60)
+    legs.remember(patients, hospitals, ambulances, tables, refreshed=True)
+
+    assert legs.carry_over(patients, hospitals, ambulances, set()) == tables
+    assert not legs.carry_over(patients, hospitals, ambulances, None).patient_to_hospital
+    assert not legs.carry_over(patients, hospitals, ambulances, {hospitals[0].id}).patient_to_hospital
+
+    now = routes.time.monotonic()
+    with monkeypatch.context() as patch:
+        patch.setattr(routes.time, "monotonic", lambda: now + 61)
+        assert not legs.carry_over(patients, hospitals, ambulances, set()).ambulance_to_patient
+    legs.forget()
+    assert not legs.carry_over(patients, hospitals, ambulances, set()).ambulance_to_patient
@@ -0,0 +1,93 @@
+import pytest
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from hospitopt_core.domain.models import Ambulance, Hospital, Patient
+from hospitopt_worker import routes
+from hospitopt_worker.cache import MatrixCache
+from hospitopt_worker.ingestion.base import DataIngestor
+from hospitopt_worker.ingestion.tracking import InputTracker
+from hospitopt_worker.providers import FakeRouteMatrixProvider
+
+
+@pytest.fixture(scope="module")
+def exporter():
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    return exporter
+
+
+@pytest.fixture
+def spans(exporter):
+    exporter.clear()
+    yield exporter
+    exporter.clear()
+
+
+class _FakeIngestor(DataIngestor):
+    async def get_hospitals(self):
+        return [Hospital(name="H", bed_capacity=1, lat=0.0, lon=0.0)]
+
+    async def get_patients(self):
+        return [Patient(lat=1.0, lon=1.0, time_to_hospital_minutes=20)]
+
+    async def get_ambulances(self):
+        return [Ambulance(lat=2.0, lon=2.0), Ambulance(lat=3.0, lon=3.0)]
+
+
+class _RevisionedIngestor(_FakeIngestor):
+    async def get_revisions(self):
+        return {"hospitals": (1, 1, 2), "patients": (1, 1, 2), "ambulances": (1, 1, 2)}
+
+
+@pytest.mark.asyncio
+async def test_input_refresh_is_traced_under_the_cycle_span(spans):
+    tracker = InputTracker(_FakeIngestor())
+
+    with trace.get_tracer(__name__).start_as_current_span("worker.cycle") as cycle:
+        await tracker.refresh()
+
+    finished = {span.name: span for span in spans.get_finished_spans()}
+    assert {"ingestion.revisions", "ingestion.snapshot", "ingestion.hash"} <= finished.keys()
+    assert all(
+        finished[name].parent.span_id == cycle.get_span_context().span_id
+        for name in ("ingestion.revisions", "ingestion.snapshot", "ingestion.hash")
+    )
+    assert finished["ingestion.hash"].attributes["hospitopt.ambulances"] == 2
+    assert finished["ingestion.hash"].attributes["hospitopt.ambulances.changed"] == 2
+
+
+@pytest.mark.asyncio
+async def test_route_matrix_requests_and_cache_hits_are_traced(spans):
+    hospitals = [Hospital(bed_capacity=1, lat=0.0, lon=0.0), Hospital(bed_capacity=1, lat=0.0, lon=0.1)]
+    patients = [Patient(lat=0.1, lon=0.1, time_to_hospital_minutes=30)]
+    ambulances = [Ambulance(lat=0.2, lon=0.2)]
+    context = routes.RoutingContext(matrix_cache=MatrixCache())
+    provider = FakeRouteMatrixProvider()
+
+    await routes.build_minutes_tables(provider, patients, hospitals, ambulances, context=context)
+    requests = [span for span in spans.get_finished_spans() if span.name == "routes.compute_route_matrix"]
+    assert len(requests) == provider.requests == 2
+    assert sum(span.attributes["hospitopt.answered"] for span in requests) == 3
+
+    spans.clear()
+    await routes.build_minutes_tables(provider, patients, hospitals, ambulances, context=context)
+    finished = spans.get_finished_spans()
+    assert not [span for span in finished if span.name == "routes.compute_route_matrix"]
+    matrices = {span.attributes["hospitopt.matrix"]: span for span in finished if span.name == "routes.matrix"}
+    assert matrices["patient_to_hospital"].attributes["hospitopt.cache_hit_ratio"] == 1.0
+    assert matrices["ambulance_to_patient"].attributes["hospitopt.cache_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_idle_polls_are_not_traced(spans):
+    tracker = InputTracker(_RevisionedIngestor())
+    await tracker.refresh()
+    spans.clear()
+
+    assert await tracker.poll() == set()
+    assert not spans.get_finished_spans()
@@ -0,0 +1,126 @@
+from uuid import uuid4
+
+import pytest
+
+from hospitopt_core.domain.models import Ambulance, Hospital, Patient
+from hospitopt_worker.ingestion.base import DataIngestor
+from hospitopt_worker.ingestion.tracking import EntityDelta, InputDelta, InputTracker
+
+
+class _FakeIngestor(DataIngestor):
+    def __init__(self, revisions):
+        self.revisions = revisions
+        self.loads = []
+        self.hospitals = [Hospital(name="H", bed_capacity=1, lat=0.0, lon=0.0)]
+        self.patients = [Patient(lat=1.0, lon=1.0, time_to_hospital_minutes=20)]
+        self.ambulances = [Ambulance(lat=2.0, lon=2.0)]
+
+    async def get_hospitals(self):
+        self.loads.append("hospitals")
+        return self.hospitals
+
+    async def get_patients(self):
+        self.loads.append("patients")
+        return self.patients
+
+    async def get_ambulances(self):
+        self.loads.append("ambulances")
+        return self.ambulances
+
+    async def get_revisions(self):
+        return None if self.revisions is None else dict(self.revisions)
+
+
+@pytest.mark.asyncio
+async def test_input_tracker_reloads_only_tables_with_new_revisions():
+    ingestor = _FakeIngestor({"hospitals": (1, 1, 2), "patients": (1, 1, 2), "ambulances": (1, 1, 2)})
+    tracker = InputTracker(ingestor)
+
+    assert await tracker.refresh() is True
+    assert sorted(ingestor.loads) == ["ambulances", "hospitals", "patients"]
+
+    ingestor.loads.clear()
+    assert await tracker.refresh() is False
+    assert ingestor.loads == []
+
+    ingestor.revisions["patients"] = (1, 2, 3)
+    ingestor.patients = [*ingestor.patients, Patient(lat=3.0, lon=3.0, time_to_hospital_minutes=30)]
+    assert await tracker.refresh() is True
+    assert ingestor.loads == ["patients"]
+    assert len(tracker.patients) == 2
+
+
+@pytest.mark.asyncio
+async def test_input_tracker_hashes_snapshots_without_revisions():
+    ingestor = _FakeIngestor(None)
+    tracker = InputTracker(ingestor)
+
+    assert await tracker.refresh() is True
+    assert await tracker.refresh() is False
+
+    ingestor.ambulances = [Ambulance(lat=4.0, lon=4.0)]
+    assert await tracker.refresh() is True
+
+
+@pytest.mark.asyncio
+async def test_input_tracker_reports_entity_deltas():
+    ingestor = _FakeIngestor(None)
+    tracker = InputTracker(ingestor)
+    await tracker.refresh()
+    assert tracker.delta.hospitals.added == {ingestor.hospitals[0].id}
+
+    kept, moved = ingestor.ambulances[0], Ambulance(lat=5.0, lon=5.0)
+    ingestor.ambulances = [kept, moved]
+    ingestor.hospitals = [ingestor.hospitals[0].model_copy(update={"used_beds": 1})]
+    removed = ingestor.patients[0]
+    ingestor.patients = []
+    assert await tracker.refresh() is True
+    assert tracker.delta.ambulances.added == {moved.id}
+    assert not tracker.delta.ambulances.changed
+    assert tracker.delta.hospitals.changed == {ingestor.hospitals[0].id}
+    assert tracker.delta.patients.removed == {removed.id}
+
+    # Fields that do not feed the optimization are not part of the fingerprint.
+    ingestor.hospitals = [ingestor.hospitals[0].model_copy(update={"name": "Renamed"})]
+    assert await tracker.refresh() is False
+    assert not tracker.delta
+
+
+@pytest.mark.asyncio
+async def test_input_tracker_keeps_revisions_of_tables_it_did_not_reload():
+    ingestor = _FakeIngestor({"hospitals": (1, 1, 2), "patients": (1, 1, 2), "ambulances": (1, 1, 2)})
+    tracker = InputTracker(ingestor)
+    await tracker.refresh()
+
+    # Ambulances move between the revision check and the snapshot, which only reloads patients.
+    ingestor.revisions["patients"] = (1, 2, 3)
+    original_get_snapshot = ingestor.get_snapshot
+
+    async def racing_get_snapshot(tables):
+        ingestor.revisions["ambulances"] = (1, 2, 3)
+        return await original_get_snapshot(tables)
+
+    ingestor.get_snapshot = racing_get_snapshot
+    ingestor.patients = [Patient(lat=3.0, lon=3.0, time_to_hospital_minutes=30)]
+    ingestor.loads.clear()
+    assert await tracker.refresh() is True
+    assert ingestor.loads == ["patients"]
+
+    ingestor.ambulances = [Ambulance(lat=6.0, lon=6.0)]
+    ingestor.loads.clear()
+    assert await tracker.refresh() is True
+    assert ingestor.loads == ["ambulances"]
+    assert tracker.ambulances == ingestor.ambulances
+
+
+def test_input_deltas_chain_across_refreshes():
+    a, b, c, d = (uuid4() for _ in range(4))
+    first = InputDelta(patients=EntityDelta(added=frozenset({a}), removed=frozenset({b, d}), changed=frozenset({c})))
+    second = InputDelta(patients=EntityDelta(removed=frozenset({a}), added=frozenset({b})))
+
+    chained = first.then(second)
+
+    # a came and went, b was replaced, c changed and d is gone
+    assert chained.patients == EntityDelta(removed=frozenset({d}), changed=frozenset({b, c}))
+    assert chained.touched() == {b, c}
+    assert not InputDelta().then(InputDelta())
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from hospitopt_worker.triggers import ChangeListener
+
+
+class _ConnectedListener(ChangeListener):
+    @property
+    def connected(self) -> bool:
+        return True
+
+
+@pytest.mark.asyncio
+async def test_change_listener_coalesces_bursts():
+    listener = _ConnectedListener("postgresql://unused", debounce_seconds=0.05, max_delay_seconds=1.0)
+
+    async def burst():
+        for table in ("patients", "patients", "ambulances"):
+            listener._on_notify(None, 1, listener.channel, table)
+            await asyncio.sleep(0.01)
+
+    waiting = asyncio.ensure_future(listener.wait(timeout=1.0))
+    await burst()
+
+    assert await waiting == {"patients", "ambulances"}
+    assert await listener.wait(timeout=0.05) == set()
+
+
+@pytest.mark.asyncio
+async def test_change_listener_bounds_debounce_delay():
+    listener = _ConnectedListener("postgresql://unused", debounce_seconds=0.05, max_delay_seconds=0.1)
+    stop = asyncio.Event()
+
+    async def storm():
+        while not stop.is_set():
+            listener._on_notify(None, 1, listener.channel, "patients")
+            await asyncio.sleep(0.01)
+
+    notifier = asyncio.ensure_future(storm())
+    started = asyncio.get_running_loop().time()
+    tables = await listener.wait(timeout=1.0)
+    stop.set()
+    await notifier
+
+    assert tables == {"patients"}
+    assert asyncio.get_running_loop().time() - started < 0.5
+
+
+@pytest.mark.asyncio
+async def test_change_listener_wakes_only_the_shard_of_the_changed_incident():
+    listener = _ConnectedListener("postgresql://unused", debounce_seconds=0.01, max_delay_seconds=0.1)
+    north = listener.for_incident("north")
+    south = listener.for_incident("south")
+
+    listener._on_notify(None, 1, listener.channel, '{"table": "patients", "incident": "north"}')
+
+    assert await north.wait(timeout=0.5) == {"patients"}
+    assert await south.wait(timeout=0.05) == set()
+    assert await listener.wait(timeout=0.5) == {"patients"}
+
+    listener._on_notify(None, 1, listener.channel, '{"table": "ambulances"}')  # a TRUNCATE concerns every shard
+
+    assert await south.wait(timeout=0.5) == {"ambulances"}
+    await south.close()
+    listener._on_notify(None, 1, listener.channel, '{"table": "hospitals", "incident": "south"}')
+    assert await south.wait(timeout=0.05) == set()